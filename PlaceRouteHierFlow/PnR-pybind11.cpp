@@ -2,14 +2,13 @@
 #include <pybind11/stl.h>
 #include <pybind11/stl_bind.h>
 #include <pybind11/iostream.h>
+#include <pybind11/numpy.h>
 
 namespace py = pybind11;
 using namespace pybind11::literals;
 
 #include "spdlog/spdlog.h"
-#include "spdlog/sinks/base_sink.h"
-#include <spdlog/details/null_mutex.h>
-#include <mutex>
+#include "spdlog/sinks/sink.h"
 
 #include "PnRDB/PnRdatabase.h"
 #include "cap_placer/CapPlacerIfc.h"
@@ -22,48 +21,150 @@ using namespace pybind11::literals;
 using namespace PnRDB;
 using std::string;
 
-template<typename Mutex>
-class align_sink : public spdlog::sinks::base_sink <Mutex>
+// Forwards spdlog records to python.logging. Messages may come from threads started in C++ (e.g. the
+// placer) or from calls that released the GIL, so the sink takes the GIL first and relies on it alone
+// for serialization: taking it under a sink mutex (as spdlog::sinks::base_sink would) deadlocks against
+// a thread that holds the GIL and waits for that mutex.
+class align_sink : public spdlog::sinks::sink
 {
-protected:
+public:
 
-    void sink_it_(const spdlog::details::log_msg& msg) override
+    void log(const spdlog::details::log_msg& msg) override
     {
+      py::gil_scoped_acquire acquire;
       auto pylogger = py::module_::import("logging").attr("getLogger")(
         std::string("PnR.") + fmt::to_string(msg.logger_name)
       );
-      spdlog::memory_buf_t formatted;
-      spdlog::sinks::base_sink<Mutex>::formatter_->format(msg, formatted);
       // HACK: python.logging log-level is currently 10x of sequivalent spdlog level
       //       May need to be changed if spdlog or python.logging changes
       pylogger.attr("log")(static_cast<int>(msg.level)*10, fmt::to_string(msg.payload));
     }
 
-    void flush_() override
+    void flush() override
     {
       std::cout << std::flush;
     }
-};
 
-using align_sink_mt = align_sink<std::mutex>;
-using align_sink_st = align_sink<spdlog::details::null_mutex>;
+    // Records are formatted by the python.logging handlers
+    void set_pattern(const std::string&) override {}
+    void set_formatter(std::unique_ptr<spdlog::formatter>) override {}
+};
 
 void _bind_spdlog_to_python_logger() {
   // Set up logging defaults before doing anything else
   int pylevel = py::cast<int>(py::module_::import("logging").attr("getLogger")().attr("level"));
-  spdlog::set_default_logger(std::make_shared<spdlog::logger>("default", std::make_shared<align_sink_mt>()));
+  spdlog::set_default_logger(std::make_shared<spdlog::logger>("default", std::make_shared<align_sink>()));
   spdlog::set_level(static_cast<spdlog::level::level_enum>(pylevel/ 10));
   spdlog::set_error_handler([](const std::string& msg) {
 		std::cerr << msg << std::endl;
 	});
 }
 
+// Bulk geometry export: one NumPy structured array per call instead of a Python object per contact
+
+struct RouteRect {
+  int net, layer, tag, llx, lly, urx, ury;
+};
+
+struct PinRect {
+  int pin, llx, lly, urx, ury;
+};
+
+// Values of RouteRect::tag, in order
+static const std::vector<string> route_rect_tags = {"blockPin", "path_metal", "path_via", "intervia", "power grid metal", "power grid via"};
+
+class RouteRectExport {
+ public:
+  int add_net(const string& name) {
+    nets.push_back(name);
+    return nets.size() - 1;
+  }
+
+  void add(int net, const contact& con, int tag) {
+    auto it = layer_ids.find(con.metal);
+    if (it == layer_ids.end()) {
+      it = layer_ids.emplace(con.metal, layers.size()).first;
+      layers.push_back(con.metal);
+    }
+    const bbox& b = con.placedBox;
+    rects.push_back({net, it->second, tag, b.LL.x, b.LL.y, b.UR.x, b.UR.y});
+  }
+
+  void add(int net, const Via& via, int tag) {
+    add(net, via.UpperMetalRect, tag);
+    add(net, via.LowerMetalRect, tag);
+    add(net, via.ViaRect, tag);
+  }
+
+  template <typename N>
+  void add_pins(const hierNode& hN, int net, const N& n) {
+    for (const auto& c : n.connected) {
+      if (c.type != Block) continue;
+      const auto& cblk = hN.Blocks.at(c.iter2);
+      for (const auto& con : cblk.instance.at(cblk.selectedInstance).blockPins.at(c.iter).pinContacts) add(net, con, 0);
+    }
+  }
+
+  py::dict result() const {
+    return py::dict("nets"_a = nets, "layers"_a = layers, "tags"_a = route_rect_tags,
+                    "rects"_a = py::array_t<RouteRect>(rects.size(), rects.data()));
+  }
+
+ private:
+  std::vector<string> nets, layers;
+  std::map<string, int> layer_ids;
+  std::vector<RouteRect> rects;
+};
+
+// All drawn rects of hN in the order gen_viewer_json visits them: for each of Nets and then PowerNets
+// the contacts of the connected block pins, path_metal, path_via (upper, lower, via) and interVias;
+// then the metals and vias of the Gnd and Vdd grids
+py::dict export_route_rects(const hierNode& hN) {
+  RouteRectExport e;
+  for (const auto& n : hN.Nets) {
+    int id = e.add_net(n.name);
+    e.add_pins(hN, id, n);
+    for (const auto& m : n.path_metal) e.add(id, m.MetalRect, 1);
+    for (const auto& v : n.path_via) e.add(id, v, 2);
+    for (const auto& con : n.interVias) e.add(id, con, 3);
+  }
+  for (const auto& n : hN.PowerNets) {
+    int id = e.add_net(n.name);
+    e.add_pins(hN, id, n);
+    for (const auto& m : n.path_metal) e.add(id, m.MetalRect, 1);
+    for (const auto& v : n.path_via) e.add(id, v, 2);
+  }
+  for (const PowerGrid* pg : {&hN.Gnd, &hN.Vdd}) {
+    int id = e.add_net(pg->name);
+    for (const auto& m : pg->metals) e.add(id, m.MetalRect, 4);
+    for (const auto& v : pg->vias) e.add(id, v, 5);
+  }
+  return e.result();
+}
+
+// originBox of the pin contacts of blk, pin being an index into the pin names
+py::dict export_pin_rects(const block& blk) {
+  std::vector<string> pins;
+  std::vector<PinRect> rects;
+  for (const auto& p : blk.blockPins) {
+    pins.push_back(p.name);
+    for (const auto& con : p.pinContacts) {
+      const bbox& b = con.originBox;
+      rects.push_back({int(pins.size()) - 1, b.LL.x, b.LL.y, b.UR.x, b.UR.y});
+    }
+  }
+  return py::dict("pins"_a = pins, "rects"_a = py::array_t<PinRect>(rects.size(), rects.data()));
+}
+
 PYBIND11_MODULE(PnR, m) {
 
   _bind_spdlog_to_python_logger();
 
   m.doc() = "pybind11 plugin for PnR";
 
+  PYBIND11_NUMPY_DTYPE(RouteRect, net, layer, tag, llx, lly, urx, ury);
+  PYBIND11_NUMPY_DTYPE(PinRect, pin, llx, lly, urx, ury);
+
   py::class_<point>( m, "point")
     .def( py::init<>())
     .def( py::init<int, int>())
@@ -183,7 +284,8 @@ PYBIND11_MODULE(PnR, m) {
     .def_readwrite("PowerNets", &block::PowerNets)
     .def_readwrite("blockPins", &block::blockPins)
     .def_readwrite("interMetals", &block::interMetals)
-    .def_readwrite("dummy_power_pin", &block::dummy_power_pin);
+    .def_readwrite("dummy_power_pin", &block::dummy_power_pin)
+    .def("export_pin_rects", &export_pin_rects);
   py::class_<terminal>( m, "terminal")
     .def( py::init<>())
     .def_readwrite("name", &terminal::name)
@@ -262,7 +364,8 @@ PYBIND11_MODULE(PnR, m) {
       .def_readonly("area_norm", &hierNode::area_norm)
       .def_readonly("cost", &hierNode::cost)
       .def_readonly("constraint_penalty", &hierNode::constraint_penalty)
-      .def_readwrite("GuardRings", &hierNode::GuardRings);
+      .def_readwrite("GuardRings", &hierNode::GuardRings)
+      .def("export_route_rects", &export_route_rects);
   py::class_<Guardring_Const>( m, "Guardring_Const")
     .def( py::init<>())
     .def_readwrite("block_name", &Guardring_Const::block_name)
@@ -437,6 +540,7 @@ PYBIND11_MODULE(PnR, m) {
 
   py::class_<PnRdatabase>( m, "PnRdatabase")
     .def( py::init<>())
+    .def( py::init<const PnRdatabase&>())
     .def( "semantic0", &PnRdatabase::semantic0)
     .def( "semantic1", &PnRdatabase::semantic1)
     .def( "semantic2", &PnRdatabase::semantic2)
@@ -485,6 +589,8 @@ PYBIND11_MODULE(PnR, m) {
     .def_readwrite("ALPHA", &PlacerHyperparameters::ALPHA)
     .def_readwrite("SEED", &PlacerHyperparameters::SEED)
     .def_readwrite("COUNT_LIMIT", &PlacerHyperparameters::COUNT_LIMIT)
+    .def_readwrite("adaptive_cooling", &PlacerHyperparameters::adaptive_cooling)
+    .def_readwrite("SA_STALL", &PlacerHyperparameters::SA_STALL)
     .def_readwrite("LAMBDA", &PlacerHyperparameters::LAMBDA)
     .def_readwrite("use_analytical_placer", &PlacerHyperparameters::use_analytical_placer)
     .def_readwrite("placement_info_json", &PlacerHyperparameters::placement_info_json)
@@ -496,12 +602,20 @@ PYBIND11_MODULE(PnR, m) {
     .def_readwrite("ilp_solver", &PlacerHyperparameters::ilp_solver) // choice of solver used in SA : 0 - SYMPHONY, 1 - LpSolve
     .def_readwrite("NUM_THREADS", &PlacerHyperparameters::NUM_THREADS)
     .def_readwrite("place_on_grid_constraints_json", &PlacerHyperparameters::place_on_grid_constraints_json)
+    .def_readwrite("use_sa_cache", &PlacerHyperparameters::use_sa_cache)
+    .def_readwrite("sa_cache", &PlacerHyperparameters::sa_cache)
     ;
 
   py::class_<PlacerIfc>( m, "PlacerIfc")
-    .def( py::init<hierNode&, int, string, int, Drc_info&, const PlacerHyperparameters&>())
+    // Release the GIL while placing so that independent hierarchy nodes can be placed from several Python threads
+    .def( py::init<hierNode&, int, string, int, Drc_info&, const PlacerHyperparameters&>(), py::call_guard<py::gil_scoped_release>())
     .def( "getNodeVecSize", &PlacerIfc::getNodeVecSize)
-    .def( "getNode", &PlacerIfc::getNode);
+    .def( "getNode", &PlacerIfc::getNode)
+    .def( "getNewEvaluations", &PlacerIfc::getNewEvaluations)
+    .def( "getCacheHits", &PlacerIfc::getCacheHits)
+    .def( "getCacheMisses", &PlacerIfc::getCacheMisses)
+    .def( "getSAIterations", &PlacerIfc::getSAIterations)
+    .def( "getSABudget", &PlacerIfc::getSABudget);
 
   py::class_<GuardRingIfc>( m, "GuardRingIfc")
     .def( py::init<hierNode&, const map<string, lefMacro>&, const Drc_info&, const string&>());
@@ -65,9 +65,9 @@ class PnRdatabase {
   void TraverseDFS(deque<int> &Q, vector<string> &color, int idx);  // DFS subfunc to traverse hierarchical tree
 
   public:
-  // Not implemented
-  PnRdatabase(const PnRdatabase &other);             // copy constructor
-  PnRdatabase &operator=(const PnRdatabase &other);  // copy assignment function
+  // Members are all values: copies are independent snapshots
+  PnRdatabase(const PnRdatabase &other) = default;             // copy constructor
+  PnRdatabase &operator=(const PnRdatabase &other) = default;  // copy assignment function
 
   public:
   int topidx;
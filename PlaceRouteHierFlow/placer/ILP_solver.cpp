@@ -4,6 +4,34 @@
 #include <malloc.h>
 #include <signal.h>
 #include "ILPSolverIf.h"
+#include <nlohmann/json.hpp>
+#include <mutex>
+
+namespace {
+// Sets the default SIGINT disposition while ILPs are being solved. Placers may solve from several
+// threads at once, so the handler is saved by the first solve to start and restored by the last
+// one to finish instead of being swapped by each of them.
+class SigintGuard {
+  static std::mutex _mutex;
+  static int _count;
+  static void (*_saved)(int);
+
+  public:
+  SigintGuard() {
+    std::lock_guard<std::mutex> lock(_mutex);
+    if (_count++ == 0) _saved = signal(SIGINT, SIG_DFL);
+  }
+  ~SigintGuard() {
+    std::lock_guard<std::mutex> lock(_mutex);
+    if (--_count == 0) signal(SIGINT, _saved);
+  }
+  SigintGuard(const SigintGuard&) = delete;
+  SigintGuard& operator=(const SigintGuard&) = delete;
+};
+std::mutex SigintGuard::_mutex;
+int SigintGuard::_count{0};
+void (*SigintGuard::_saved)(int){SIG_DFL};
+}  // namespace
 
 ExtremeBlocksOfNet::ExtremeBlocksOfNet(const SeqPair& sp, const int N)
 {
@@ -450,6 +478,7 @@ ILP_solver::ILP_solver(const ILP_solver& solver) {
   use_ilp_solver = solver.use_ilp_solver;
   memcpy(Aspect_Ratio, solver.Aspect_Ratio, sizeof(solver.Aspect_Ratio));
   memcpy(placement_box, solver.placement_box, sizeof(solver.placement_box));
+  InheritNetBoxes(solver);
 }
 
 ILP_solver& ILP_solver::operator=(const ILP_solver& solver) {
@@ -469,9 +498,83 @@ ILP_solver& ILP_solver::operator=(const ILP_solver& solver) {
   Aspect_Ratio_weight = solver.Aspect_Ratio_weight;
   memcpy(Aspect_Ratio, solver.Aspect_Ratio, sizeof(solver.Aspect_Ratio));
   memcpy(placement_box, solver.placement_box, sizeof(solver.placement_box));
+  InheritNetBoxes(solver);
   return *this;
 }
 
+void ILP_solver::UpdateNetBoxes(const design& mydesign, const SeqPair& curr_sp) {
+  // Only the nets of blocks that moved, flipped or changed variant since the last update are recomputed
+  vector<bool> dirty(mydesign.Nets.size(), false);
+  if (net_boxes.size() != mydesign.Nets.size() || boxed_blocks.size() != Blocks.size() || boxed_selected.size() != curr_sp.selected.size()) {
+    net_boxes.assign(mydesign.Nets.size(), NetBox());
+    dirty.assign(mydesign.Nets.size(), true);
+  } else {
+    for (unsigned i = 0; i < Blocks.size(); ++i) {
+      if (Blocks[i] != boxed_blocks[i] || curr_sp.selected[i] != boxed_selected[i]) {
+        for (const int n : mydesign.blockNets[i]) dirty[n] = true;
+      }
+    }
+  }
+  for (unsigned n = 0; n < mydesign.Nets.size(); ++n) {
+    if (!dirty[n]) continue;
+    NetBox nb;
+    for (const auto& nblk : mydesign.netBlocks[n]) {
+      const int i = nblk.block, sel = curr_sp.selected[i];
+      const auto& pb = nblk.boxes[sel];
+      const int w = mydesign.Blocks[i][sel].width, h = mydesign.Blocks[i][sel].height;
+      if (pb.cx0 <= pb.cx1) {
+        nb.cx0 = std::min(nb.cx0, (Blocks[i].H_flip ? w - pb.cx1 : pb.cx0) + Blocks[i].x);
+        nb.cx1 = std::max(nb.cx1, (Blocks[i].H_flip ? w - pb.cx0 : pb.cx1) + Blocks[i].x);
+        nb.cy0 = std::min(nb.cy0, (Blocks[i].V_flip ? h - pb.cy1 : pb.cy0) + Blocks[i].y);
+        nb.cy1 = std::max(nb.cy1, (Blocks[i].V_flip ? h - pb.cy0 : pb.cy1) + Blocks[i].y);
+      }
+      if (pb.bx0 <= pb.bx1) {
+        nb.bx0 = std::min(nb.bx0, (Blocks[i].H_flip ? w - pb.bx1 : pb.bx0) + Blocks[i].x);
+        nb.bx1 = std::max(nb.bx1, (Blocks[i].H_flip ? w - pb.bx0 : pb.bx1) + Blocks[i].x);
+        nb.by0 = std::min(nb.by0, (Blocks[i].V_flip ? h - pb.by1 : pb.by0) + Blocks[i].y);
+        nb.by1 = std::max(nb.by1, (Blocks[i].V_flip ? h - pb.by0 : pb.by1) + Blocks[i].y);
+      }
+    }
+    net_boxes[n] = nb;
+  }
+  boxed_blocks = Blocks;
+  boxed_selected = curr_sp.selected;
+}
+
+std::string ILP_solver::Serialize(const double ret) const {
+  nlohmann::json js;
+  js["ret"] = ret;
+  js["LL"] = {LL.x, LL.y};
+  js["UR"] = {UR.x, UR.y};
+  js["blocks"] = nlohmann::json::array();
+  for (const auto& b : Blocks) js["blocks"].push_back({b.x, b.y, b.H_flip, b.V_flip});
+  js["costs"] = {area, area_ilp, HPWL, HPWL_ILP, HPWL_extend, HPWL_extend_terminal, HPWL_extend_net_priority,
+                 ratio, linear_const, multi_linear_const, area_norm, HPWL_norm, cost, constraint_penalty};
+  return js.dump();
+}
+
+bool ILP_solver::Deserialize(const std::string& str, const size_t numBlocks, double& ret) {
+  auto js = nlohmann::json::parse(str, nullptr, false);
+  if (js.is_discarded() || !js.contains("blocks") || js["blocks"].size() != numBlocks || js["costs"].size() != 14) return false;
+  try {
+    // non-finite values are written as null and do not convert back: such entries are misses
+    ret = js["ret"];
+    LL.x = js["LL"][0]; LL.y = js["LL"][1];
+    UR.x = js["UR"][0]; UR.y = js["UR"][1];
+    Blocks.resize(numBlocks);
+    for (size_t i = 0; i < numBlocks; ++i) {
+      const auto& b = js["blocks"][i];
+      Blocks[i].x = b[0]; Blocks[i].y = b[1]; Blocks[i].H_flip = b[2]; Blocks[i].V_flip = b[3];
+    }
+    const auto& c = js["costs"];
+    area = c[0]; area_ilp = c[1]; HPWL = c[2]; HPWL_ILP = c[3]; HPWL_extend = c[4]; HPWL_extend_terminal = c[5]; HPWL_extend_net_priority = c[6];
+    ratio = c[7]; linear_const = c[8]; multi_linear_const = c[9]; area_norm = c[10]; HPWL_norm = c[11]; cost = c[12]; constraint_penalty = c[13];
+  } catch (const nlohmann::json::exception&) {
+    return false;
+  }
+  return true;
+}
+
 void ILP_solver::lpsolve_logger(lprec* lp, void* userhandle, char* buf) {
   auto logger = spdlog::default_logger()->clone("placer.ILP_solver.lpsolve_logger");
 
@@ -1733,7 +1836,7 @@ bool ILP_solver::FrameSolveILPSymphony(const design& mydesign, const SeqPair& cu
   TimeMeasure tm(const_cast<design&>(mydesign).ilp_runtime);
   auto logger = spdlog::default_logger()->clone("placer.ILP_solver.FrameSolveILPSymphony");
 
-  auto sighandler = signal(SIGINT, nullptr);
+  SigintGuard sigint_guard;
   int v_metal_index = -1;
   int h_metal_index = -1;
   for (unsigned int i = 0; i < drcInfo.Metal_info.size(); ++i) {
@@ -2489,11 +2592,9 @@ bool ILP_solver::FrameSolveILPSymphony(const design& mydesign, const SeqPair& cu
     }
     if (status != 0) {
       ++const_cast<design&>(mydesign)._infeasILPFail;
-      sighandler = signal(SIGINT, sighandler);
       return false;
     }
     const double* var = solverif.solution();
-    sighandler = signal(SIGINT, sighandler);
     int minx(INT_MAX), miny(INT_MAX);
     //for (unsigned i = 0; i < (mydesign.Blocks.size() * 4); ++i) {
     //  area_ilp += (objective[i] * var[i]);
@@ -2527,7 +2628,7 @@ bool ILP_solver::FrameSolveILPCbc(const design& mydesign, const SeqPair& curr_sp
   TimeMeasure tm(const_cast<design&>(mydesign).ilp_runtime);
   auto logger = spdlog::default_logger()->clone("placer.ILP_solver.FrameSolveILPCbc");
 
-  auto sighandler = signal(SIGINT, nullptr);
+  SigintGuard sigint_guard;
   int v_metal_index = -1;
   int h_metal_index = -1;
   for (unsigned int i = 0; i < drcInfo.Metal_info.size(); ++i) {
@@ -3300,10 +3401,8 @@ bool ILP_solver::FrameSolveILPCbc(const design& mydesign, const SeqPair& curr_sp
     const double* var = solverif.solution();
     if (status != 0 || var == nullptr) {
       ++const_cast<design&>(mydesign)._infeasILPFail;
-      sighandler = signal(SIGINT, sighandler);
       return false;
     }
-    sighandler = signal(SIGINT, sighandler);
     int minx(INT_MAX), miny(INT_MAX);
     //for (unsigned i = 0; i < (mydesign.Blocks.size() * 4); ++i) {
     //  area_ilp += (objective[i] * var[i]);
@@ -3512,86 +3611,21 @@ double ILP_solver::GenerateValidSolution(const design& mydesign, const SeqPair&
     return -1;
   }
   // calculate HPWL
+  UpdateNetBoxes(mydesign, curr_sp);
   HPWL = 0;
   HPWL_extend = 0;
   HPWL_extend_terminal = 0;
 
-  for (const auto& neti : mydesign.Nets) {
-    int HPWL_min_x = UR.x, HPWL_min_y = UR.y, HPWL_max_x = 0, HPWL_max_y = 0;
-    int HPWL_extend_min_x = UR.x, HPWL_extend_min_y = UR.y, HPWL_extend_max_x = 0, HPWL_extend_max_y = 0;
-    for (const auto& connectedj : neti.connected) {
-      if (connectedj.type == placerDB::Block) {
-        int iter2 = connectedj.iter2, iter = connectedj.iter;
-        for (const auto& centerk : mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].center) {
-          // calculate contact center
-          int pin_x = centerk.x;
-          int pin_y = centerk.y;
-          if (Blocks[iter2].H_flip) pin_x = mydesign.Blocks[iter2][curr_sp.selected[iter2]].width - pin_x;
-          if (Blocks[iter2].V_flip) pin_y = mydesign.Blocks[iter2][curr_sp.selected[iter2]].height - pin_y;
-          pin_x += Blocks[iter2].x;
-          pin_y += Blocks[iter2].y;
-          HPWL_min_x = std::min(HPWL_min_x, pin_x);
-          HPWL_max_x = std::max(HPWL_max_x, pin_x);
-          HPWL_min_y = std::min(HPWL_min_y, pin_y);
-          HPWL_max_y = std::max(HPWL_max_y, pin_y);
-        }
-        /*int pin_llx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.LL.x;
-        int pin_lly = mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.LL.y;
-        int pin_urx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.UR.x;
-        int pin_ury = mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.UR.y;
-        if (Blocks[iter2].H_flip) {
-          pin_llx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].width -
-            mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.UR.x;
-          pin_urx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].width -
-            mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.LL.x;
-        }
-        if (Blocks[iter2].V_flip) {
-          pin_lly = mydesign.Blocks[iter2][curr_sp.selected[iter2]].height -
-            mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.UR.y;
-          pin_ury = mydesign.Blocks[iter2][curr_sp.selected[iter2]].height -
-            mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].bbox.LL.y;
-        }
-        pin_llx += Blocks[iter2].x;
-        pin_urx += Blocks[iter2].x;
-        pin_lly += Blocks[iter2].y;
-        pin_ury += Blocks[iter2].y;
-        HPWL_extend_min_x = std::min(HPWL_extend_min_x, pin_llx);
-        HPWL_extend_max_x = std::max(HPWL_extend_max_x, pin_urx);
-        HPWL_extend_min_y = std::min(HPWL_extend_min_y, pin_lly);
-        HPWL_extend_max_y = std::max(HPWL_extend_max_y, pin_ury);*/
-        for (const auto& boundaryk : mydesign.Blocks[iter2][curr_sp.selected[iter2]].blockPins[iter].boundary) {
-          int pin_llx = boundaryk.polygon[0].x, pin_urx = boundaryk.polygon[2].x;
-          int pin_lly = boundaryk.polygon[0].y, pin_ury = boundaryk.polygon[2].y;
-          if (Blocks[iter2].H_flip) {
-            pin_llx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].width - boundaryk.polygon[2].x;
-            pin_urx = mydesign.Blocks[iter2][curr_sp.selected[iter2]].width - boundaryk.polygon[0].x;
-          }
-          if (Blocks[iter2].V_flip) {
-            pin_lly = mydesign.Blocks[iter2][curr_sp.selected[iter2]].height - boundaryk.polygon[2].y;
-            pin_ury = mydesign.Blocks[iter2][curr_sp.selected[iter2]].height - boundaryk.polygon[0].y;
-          }
-          pin_llx += Blocks[iter2].x;
-          pin_urx += Blocks[iter2].x;
-          pin_lly += Blocks[iter2].y;
-          pin_ury += Blocks[iter2].y;
-          HPWL_extend_min_x = std::min(HPWL_extend_min_x, pin_llx);
-          HPWL_extend_max_x = std::max(HPWL_extend_max_x, pin_urx);
-          HPWL_extend_min_y = std::min(HPWL_extend_min_y, pin_lly);
-          HPWL_extend_max_y = std::max(HPWL_extend_max_y, pin_ury);
-        }
-      }
-    }
-    HPWL += (HPWL_max_y - HPWL_min_y) + (HPWL_max_x - HPWL_min_x);
-    HPWL_extend += (HPWL_extend_max_y - HPWL_extend_min_y) + (HPWL_extend_max_x - HPWL_extend_min_x);
-    HPWL_extend_net_priority += ((HPWL_extend_max_y - HPWL_extend_min_y) + (HPWL_extend_max_x - HPWL_extend_min_x)) * neti.weight;
-    bool is_terminal_net = false;
-    for (const auto& c : neti.connected) {
-      if (c.type == placerDB::Terminal) {
-        is_terminal_net = true;
-        break;
-      }
-    }
-    if (is_terminal_net) HPWL_extend_terminal += (HPWL_extend_max_y - HPWL_extend_min_y) + (HPWL_extend_max_x - HPWL_extend_min_x);
+  for (unsigned n = 0; n < mydesign.Nets.size(); ++n) {
+    const auto& neti = mydesign.Nets[n];
+    const auto& nb = net_boxes[n];
+    // The bounds start from UR (min) and 0 (max); nets without pins keep them
+    int net_HPWL = (std::max(0, nb.cy1) - std::min(UR.y, nb.cy0)) + (std::max(0, nb.cx1) - std::min(UR.x, nb.cx0));
+    int net_HPWL_extend = (std::max(0, nb.by1) - std::min(UR.y, nb.by0)) + (std::max(0, nb.bx1) - std::min(UR.x, nb.bx0));
+    HPWL += net_HPWL;
+    HPWL_extend += net_HPWL_extend;
+    HPWL_extend_net_priority += net_HPWL_extend * neti.weight;
+    if (mydesign.netHasTerminal[n]) HPWL_extend_terminal += net_HPWL_extend;
     if (neti.floating_pin) HPWL = HPWL_extend = HPWL_extend_net_priority = HPWL_extend_terminal = 0;
   }
 
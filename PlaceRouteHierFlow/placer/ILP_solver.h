@@ -43,8 +43,19 @@ class ILP_solver {
   struct Block {
     int x = 0, y = 0;            // LL of each block
     int H_flip = 0, V_flip = 0;  // flip along V axis and H axis
+    bool operator!=(const Block& b) const { return x != b.x || y != b.y || H_flip != b.H_flip || V_flip != b.V_flip; }
   };
   vector<Block> Blocks;
+  // Bounding boxes of the placed pin centers and pin shapes of each net (see design::netBlocks), and the
+  // block placements and variants they are up to date with
+  struct NetBox {
+    int cx0 = INT_MAX, cy0 = INT_MAX, cx1 = INT_MIN, cy1 = INT_MIN;
+    int bx0 = INT_MAX, by0 = INT_MAX, bx1 = INT_MIN, by1 = INT_MIN;
+  };
+  vector<NetBox> net_boxes;
+  vector<Block> boxed_blocks;
+  vector<int> boxed_selected;
+  void UpdateNetBoxes(const design& mydesign, const SeqPair& curr_sp);
   placerDB::point LL, UR;
   double area = 0, area_ilp = 0., HPWL = 0, HPWL_ILP = 0., HPWL_extend = 0, HPWL_extend_terminal = 0, ratio = 0, linear_const = 0, multi_linear_const = 0;
   double HPWL_extend_net_priority = 0;
@@ -93,6 +104,12 @@ class ILP_solver {
   ILP_solver(design& mydesign, int ilps = SYMPHONY);
   ILP_solver(const ILP_solver& solver);
   ILP_solver& operator=(const ILP_solver& solver);
+  // Start from the net bounding boxes of solver, so that only the nets of the blocks that move are recomputed
+  void InheritNetBoxes(const ILP_solver& solver) {
+    net_boxes = solver.net_boxes;
+    boxed_blocks = solver.boxed_blocks;
+    boxed_selected = solver.boxed_selected;
+  }
   int xdim() const { return UR.x - LL.x; }
   int ydim() const { return UR.y - LL.y; }
   double GenerateValidSolutionAnalytical(design& mydesign, PnRDB::Drc_info& drcInfo, PnRDB::hierNode& node);
@@ -102,6 +119,9 @@ class ILP_solver {
   double UpdateAreaHPWLCost(const design& mydesign, const SeqPair& curr_sp);
   double CalculateCost(const design& mydesign) const;
   double CalculateCost(const design& mydesign, const SeqPair& curr_sp) ;
+  // Evaluation result (ret is the value GenerateValidSolution returned) as JSON, for the persistent SA cache
+  std::string Serialize(const double ret) const;
+  bool Deserialize(const std::string& str, const size_t numBlocks, double& ret);
   void WritePlacement(design& caseNL, SeqPair& curr_sp, string outfile);
   void PlotPlacement(design& mydesign, SeqPair& curr_sp, string outfile);
   //void PlotPlacementAnalytical(design& caseNL, string outfile, bool plot_pin, bool plot_terminal, bool plot_net);
@@ -134,17 +154,17 @@ class ExtremeBlocksOfNet {
 
 class TimeMeasure {
   private:
-    std::chrono::nanoseconds& _rt;
+    std::atomic<std::chrono::nanoseconds::rep>& _rt;
     std::chrono::high_resolution_clock::time_point _begin;
   public:
-    TimeMeasure(std::chrono::nanoseconds& rt) : _rt(rt)
+    TimeMeasure(std::atomic<std::chrono::nanoseconds::rep>& rt) : _rt(rt)
     {
       _begin = std::chrono::high_resolution_clock::now();
     }
     ~TimeMeasure()
     {
       auto _end = std::chrono::high_resolution_clock::now();
-      _rt += std::chrono::duration_cast<std::chrono::nanoseconds>(_end - _begin);
+      _rt += std::chrono::duration_cast<std::chrono::nanoseconds>(_end - _begin).count();
     }
 };
 
@@ -3,8 +3,6 @@
 
 #include "spdlog/spdlog.h"
 
-std::mt19937_64 Placer::_rng{0};
-
 Placer::Placer(std::vector<PnRDB::hierNode>& nodeVec, string opath, int effort, PnRDB::Drc_info& drcInfo, const PlacerHyperparameters& hyper_in)
     : hyper(hyper_in) {
   auto logger = spdlog::default_logger()->clone("placer.Placer");
@@ -212,6 +210,34 @@ void Placer::setPlacementInfoFromJson(std::vector<PnRDB::hierNode>& nodeVec, str
 
 
 
+static std::string SeqPairKey(const SeqPair& sp) {
+  std::string key;
+  for (const auto* seq : {&sp.posPair, &sp.negPair, &sp.selected}) {
+    for (const auto& i : *seq) key += std::to_string(i) + ',';
+    key += ';';
+  }
+  return key;
+}
+
+double Placer::EvaluateSeqPair(design& designData, SeqPair& sp, ILP_solver& sol, PnRDB::Drc_info& drcInfo, const int num_threads) {
+  // select_in_ILP changes the selected variants of sp, so its evaluations are not cached
+  if (hyper.select_in_ILP) return sol.GenerateValidSolution_select(designData, sp, drcInfo);
+  if (!hyper.use_sa_cache) return sol.GenerateValidSolution(designData, sp, drcInfo, num_threads);
+  const std::string key = SeqPairKey(sp);
+  double cost = 0;
+  auto it = hyper.sa_cache.find(key);
+  if (it != hyper.sa_cache.end() && sol.Deserialize(it->second, designData.Blocks.size(), cost)) {
+    ++_cacheHits;
+    return cost;
+  }
+  ++_cacheMisses;
+  cost = sol.GenerateValidSolution(designData, sp, drcInfo, num_threads);
+  std::string value = sol.Serialize(cost);
+  std::lock_guard<std::mutex> lock(_newEvaluationsMutex);
+  _newEvaluations.emplace(key, std::move(value));
+  return cost;
+}
+
 std::map<double, std::pair<SeqPair, ILP_solver>> Placer::PlacementCoreAspectRatio_ILP(design& designData, SeqPair& curr_sp, ILP_solver& curr_sol, int mode,
                                                                                       int nodeSize, int effort, PnRDB::Drc_info& drcInfo) {
   auto logger = spdlog::default_logger()->clone("placer.Placer.PlacementCoreAspectRatio_ILP");
@@ -234,20 +260,15 @@ std::map<double, std::pair<SeqPair, ILP_solver>> Placer::PlacementCoreAspectRati
     }
   }
 
-  unsigned int seed = 0;
   if (hyper.SEED > 0) {
-    seed = hyper.SEED;
-    srand(seed);
-    logger->debug("Random number generator seed={0}", seed);
+    designData.scrand(hyper.SEED);
+    logger->debug("Random number generator seed={0}", hyper.SEED);
   }
 
   while (++trial_count < hyper.max_init_trial_count) {
     // curr_cost negative means infeasible (do not satisfy placement constraints)
     // Only positive curr_cost value is accepted.
-    if (hyper.select_in_ILP)
-      curr_cost = curr_sol.GenerateValidSolution_select(designData, curr_sp, drcInfo);
-    else
-      curr_cost = curr_sol.GenerateValidSolution(designData, curr_sp, drcInfo, hyper.NUM_THREADS);
+    curr_cost = EvaluateSeqPair(designData, curr_sp, curr_sol, drcInfo, hyper.NUM_THREADS);
 
     curr_sp.cacheSeq(designData);
 
@@ -286,6 +307,12 @@ std::map<double, std::pair<SeqPair, ILP_solver>> Placer::PlacementCoreAspectRati
   // int updateThrd = 100;
   float total_update_number = log(hyper.T_MIN / hyper.T_INT) / log(hyper.ALPHA);
   bool exhausted(false);
+  bool converged(false);
+  // Moving average of the acceptance ratio, and trials since the best cost last improved (adaptive cooling)
+  double accept_rate = 0.5;
+  double best_cost = curr_cost;
+  int since_best = 0;
+  _saBudget = std::ceil(total_update_number);
   int total_candidates = 0;
   int total_candidates_infeasible = 0;
 
@@ -302,68 +329,112 @@ std::map<double, std::pair<SeqPair, ILP_solver>> Placer::PlacementCoreAspectRati
     while (i <= MAX_Iter) {
       // cout<<"T "<<T<<" i "<<i<<endl;
       // Trival moves
-      SeqPair trial_sp(curr_sp);
-      // cout<<"before per"<<endl; trial_sp.PrintSeqPair();
-      // SY: PerturbationNew honors order and symmetry. What could make the trial_sp infeasible? Aspect ratio, Align?
-      int trial_cached = 0;
-      while (++trial_cached < hyper.max_cache_hit_count) {
-        if (!trial_sp.PerturbationNew(designData)) continue;
-        if (!trial_sp.isSeqInCache(designData)) {
-          break;
+      // With NUM_THREADS > 1 a batch of trials is evaluated concurrently. Perturbation stays serial
+      // (it draws random numbers and updates the sequence pair cache in designData); the trials are
+      // then taken in order, and the first one accepted by the Metropolis rule becomes current. Every
+      // trial counts as an iteration, so a batch uses NUM_THREADS iterations of the budget (MAX_Iter per
+      // temperature) but makes at most one move. When enumerating, each trial continues from the
+      // previous one and all are accepted.
+      const int batch_size = std::max(1, hyper.NUM_THREADS);
+      std::vector<SeqPair> trial_sps;
+      std::vector<ILP_solver> trial_sols;
+      trial_sps.reserve(batch_size);
+      trial_sols.reserve(batch_size);
+      while (int(trial_sps.size()) < batch_size) {
+        SeqPair trial_sp(!trial_sps.empty() && curr_sp.Enumerate() ? trial_sps.back() : curr_sp);
+        // cout<<"before per"<<endl; trial_sp.PrintSeqPair();
+        // SY: PerturbationNew honors order and symmetry. What could make the trial_sp infeasible? Aspect ratio, Align?
+        int trial_cached = 0;
+        while (++trial_cached < hyper.max_cache_hit_count) {
+          if (!trial_sp.PerturbationNew(designData)) continue;
+          if (!trial_sp.isSeqInCache(designData)) {
+            break;
+          }
         }
+        mean_cache_miss += trial_cached;
+        ++num_perturb;
+        trial_sp.cacheSeq(designData);
+        // cout<<"after per"<<endl; trial_sp.PrintSeqPair();
+        trial_sps.push_back(trial_sp);
+        trial_sols.emplace_back(designData, hyper.ilp_solver);
+        trial_sols.back().InheritNetBoxes(curr_sol);
+        if (trial_sp.EnumExhausted()) break;
       }
-      mean_cache_miss += trial_cached;
-      ++num_perturb;
-      trial_sp.cacheSeq(designData);
-      // cout<<"after per"<<endl; trial_sp.PrintSeqPair();
-      ILP_solver trial_sol(designData, hyper.ilp_solver);
-      double trial_cost = 0;
-      if (hyper.select_in_ILP)
-        trial_cost = trial_sol.GenerateValidSolution_select(designData, trial_sp, drcInfo);
-      else
-        trial_cost = trial_sol.GenerateValidSolution(designData, trial_sp, drcInfo, hyper.NUM_THREADS);
-      /*if (designData._debugofs.is_open()) {
-              designData._debugofs << "sp__cost : " << trial_sp.getLexIndex(designData) << ' ' << trial_cost << '\n';
-      }*/
-      total_candidates += 1;
-      if (trial_cost >= 0) {
-        oData[trial_cost] = std::make_pair(trial_sp, trial_sol);
-        // Smark is true if search space is enumerated (no need to randomize)
-        bool Smark = trial_sp.Enumerate();
-        if (!Smark) {
-          delta_cost = trial_cost - curr_cost;
-          if (delta_cost < 0) {
-            Smark = true;
-            logger->debug("sa__accept_better T={0} delta_cost={1} ", T, delta_cost);
-          } else {
-            double r = (double)rand() / RAND_MAX;
-            // De-normalize the delta cost
-            delta_cost = exp(delta_cost);
-            if (r < exp((-1.0 * delta_cost) / T)) {
+      std::vector<double> trial_costs(trial_sps.size(), 0);
+      auto evaluate = [&](const int b, const int num_threads) {
+        trial_costs[b] = EvaluateSeqPair(designData, trial_sps[b], trial_sols[b], drcInfo, num_threads);
+      };
+      if (trial_sps.size() == 1) {
+        evaluate(0, hyper.NUM_THREADS);
+      } else {
+        // The threads are the parallelism: one thread per ILP
+        std::vector<std::thread> workers;
+        for (int b = 0; b < int(trial_sps.size()); ++b) workers.emplace_back(evaluate, b, 1);
+        for (auto& worker : workers) worker.join();
+      }
+      bool accepted = false;
+      for (int b = 0; b < int(trial_sps.size()); ++b) {
+        const SeqPair& trial_sp = trial_sps[b];
+        const double trial_cost = trial_costs[b];
+        /*if (designData._debugofs.is_open()) {
+                designData._debugofs << "sp__cost : " << trial_sp.getLexIndex(designData) << ' ' << trial_cost << '\n';
+        }*/
+        total_candidates += 1;
+        bool took = false;
+        if (trial_cost >= 0) {
+          oData[trial_cost] = std::make_pair(trial_sp, trial_sols[b]);
+          // Smark is true if search space is enumerated (no need to randomize)
+          bool Smark = trial_sp.Enumerate();
+          if (!Smark && !accepted) {
+            delta_cost = trial_cost - curr_cost;
+            if (delta_cost < 0) {
               Smark = true;
-              logger->debug("sa__climbing_up T={0} delta_cost={1}", T, delta_cost);
+              logger->debug("sa__accept_better T={0} delta_cost={1} ", T, delta_cost);
+            } else {
+              double r = (double)designData.crand() / RAND_MAX;
+              // De-normalize the delta cost
+              delta_cost = exp(delta_cost);
+              if (r < exp((-1.0 * delta_cost) / T)) {
+                Smark = true;
+                logger->debug("sa__climbing_up T={0} delta_cost={1}", T, delta_cost);
+              }
             }
           }
+          if (Smark) {
+            curr_cost = trial_cost;
+            curr_sp = trial_sp;
+            curr_sol = trial_sols[b];
+            curr_sol.cost = curr_cost;
+            accepted = true;
+            took = true;
+          }
+        } else {
+          ++total_candidates_infeasible;
+          // logger->debug("sa__infeasible_candidate i={1}/{2} T={0} ", T, i, MAX_Iter);
         }
-        if (Smark) {
-          curr_cost = trial_cost;
-          curr_sp = trial_sp;
-          curr_sol = trial_sol;
-          curr_sol.cost = curr_cost;
+        if (hyper.adaptive_cooling && !trial_sp.Enumerate()) {
+          accept_rate = 0.98 * accept_rate + (took ? 0.02 : 0.);
+          if (trial_cost >= 0 && trial_cost < best_cost) {
+            best_cost = trial_cost;
+            since_best = 0;
+          } else {
+            ++since_best;
+          }
         }
-      } else {
-        ++total_candidates_infeasible;
-        // logger->debug("sa__infeasible_candidate i={1}/{2} T={0} ", T, i, MAX_Iter);
+        ReshapeSeqPairMap(oData, nodeSize);
+        // logger->debug("sa__cost name={0} t_index={1} effort={2} cost={3} temp={4}", designData.name, T_index, i, curr_cost, T);
+        i++;
+        update_index++;
       }
-      ReshapeSeqPairMap(oData, nodeSize);
-      // logger->debug("sa__cost name={0} t_index={1} effort={2} cost={3} temp={4}", designData.name, T_index, i, curr_cost, T);
-      i++;
-      update_index++;
-      if (trial_sp.EnumExhausted()) {
+      if (trial_sps.back().EnumExhausted()) {
         logger->info("Exhausted all permutations of sequence pairs");
         exhausted = true;
         break;
       }
+      if (hyper.adaptive_cooling && since_best >= hyper.SA_STALL) {
+        converged = true;
+        break;
+      }
     }
     T_index++;
     if (total_update_number * per < T_index) {
@@ -371,13 +442,32 @@ std::map<double, std::pair<SeqPair, ILP_solver>> Placer::PlacementCoreAspectRati
       per = per + 0.1;
     }
     if (exhausted) break;
-    T *= hyper.ALPHA;
+    if (converged) {
+      logger->info("Best cost {0} did not improve in {1} trials; stopping after {2} of {3} temperature steps", best_cost, since_best, T_index,
+                   _saBudget);
+      break;
+    }
+    if (hyper.adaptive_cooling) {
+      // Cool faster while most moves are accepted (a random walk), reheat when the search is frozen.
+      // Reheating can keep T above T_MIN, so the number of steps is bounded by the fixed schedule's.
+      if (accept_rate > 0.5)
+        T *= hyper.ALPHA * hyper.ALPHA;
+      else if (accept_rate < 0.02)
+        T = std::min(hyper.T_INT, T / hyper.ALPHA);
+      else
+        T *= hyper.ALPHA;
+      if (T_index >= total_update_number) break;
+    } else {
+      T *= hyper.ALPHA;
+    }
     // logger->debug("sa__reducing_temp T={0}", T);
   }
 
+  _saIterations = T_index;
   if (num_perturb) mean_cache_miss /= num_perturb;
   logger->debug("sa__summary total_candidates={0} total_candidates_infeasible={1} mean_cache_miss={2}", total_candidates, total_candidates_infeasible,
                mean_cache_miss);
+  if (hyper.use_sa_cache) logger->debug("sa__cache hits={0} misses={1}", _cacheHits.load(), _cacheMisses.load());
 
   // Write out placement results
   // cout << endl << "Placer-Info: optimal cost = " << curr_cost << endl;
@@ -416,17 +506,18 @@ void Placer::PlacementRegularAspectRatio_ILP(std::vector<PnRDB::hierNode>& nodeV
   auto logger = spdlog::default_logger()->clone("placer.Placer.PlacementRegularAspectRatio_ILP");
   int nodeSize = nodeVec.size();
 // cout<<"Placer-Info: place "<<nodeVec.back().name<<" in aspect ratio mode "<<endl;
+  int mode = 0;
+  // Read design netlist and constraints
+  design designData(nodeVec.back(), drcInfo, hyper.SEED);
+  // Each placer draws from the generators of its own design, so placers running concurrently are reproducible
 #ifdef RFLAG
   // cout<<"Placer-Info: run in random mode..."<<endl;
-  srand(time(NULL));
+  designData.scrand(time(NULL));
 #endif
 #ifndef RFLAG
   // cout<<"Placer-Info: run in normal mode..."<<endl;
-  srand(0);
+  designData.scrand(0);
 #endif
-  int mode = 0;
-  // Read design netlist and constraints
-  design designData(nodeVec.back(), drcInfo, hyper.SEED);
   _rng.seed(hyper.SEED);
   //designData.PrintDesign();
   // Initialize simulate annealing with initial solution
@@ -4,7 +4,9 @@
 #include <stdlib.h> /* srand, rand */
 #include <time.h>   /* time */
 
+#include <atomic>
 #include <cmath>
+#include <mutex>
 #include <nlohmann/json.hpp>
 #include <thread>
 
@@ -38,12 +40,24 @@ class Placer {
   void PlacementRegularAspectRatio_ILP_Analytical(std::vector<PnRDB::hierNode>& nodeVec, string opath, int effort, PnRDB::Drc_info& drcInfo);
   void ReadPrimitiveOffsetPitch(std::vector<PnRDB::hierNode>& nodeVec, PnRDB::Drc_info& drcInfo, const string& jsonStr);
   void setPlacementInfoFromJson(std::vector<PnRDB::hierNode>& nodeVec, string opath, PnRDB::Drc_info& drcInfo);
+  double EvaluateSeqPair(design& designData, SeqPair& sp, ILP_solver& sol, PnRDB::Drc_info& drcInfo, const int num_threads);
   PlacerHyperparameters hyper;
+  std::map<std::string, std::string> _newEvaluations;
+  std::mutex _newEvaluationsMutex;
+  std::atomic<size_t> _cacheHits{0}, _cacheMisses{0};
+  size_t _saIterations = 0, _saBudget = 0;
   std::uniform_real_distribution<double> _rnd{0., 1.};
-  static std::mt19937_64 _rng;
+  std::mt19937_64 _rng{0};
 
   public:
   Placer(std::vector<PnRDB::hierNode>& nodeVec, string opath, int effort, PnRDB::Drc_info& drcInfo, const PlacerHyperparameters& hyper_in);
+  // Evaluations not found in hyper.sa_cache, and the number of SA trials looked up in it
+  const std::map<std::string, std::string>& NewEvaluations() const { return _newEvaluations; }
+  size_t CacheHits() const { return _cacheHits; }
+  size_t CacheMisses() const { return _cacheMisses; }
+  // Temperature steps of the last SA run, and the number the schedule allowed
+  size_t SAIterations() const { return _saIterations; }
+  size_t SABudget() const { return _saBudget; }
   // Placer(PnRDB::hierNode& input_node); // Constructor
   // PnRDB::hierNode CheckoutHierNode(); // Output hier Node after placement
 };
@@ -1,6 +1,7 @@
 #ifndef PLACERHYPERPARAMETERS_H_
 #define PLACERHYPERPARAMETERS_H_
 
+#include <map>
 #include <string>
 
 class PlacerHyperparameters {
@@ -10,6 +11,10 @@ class PlacerHyperparameters {
   double ALPHA = 0.995;
   int SEED = 0;
   int COUNT_LIMIT = 200;
+  // Adaptive annealing: cooling/reheating driven by the acceptance ratio, and a stop once the
+  // best cost has not improved in SA_STALL trials
+  bool adaptive_cooling = false;
+  int SA_STALL = 1000;
 
   // this needs to be connected to both the log-based cost funciton and the ILP formulation
   double LAMBDA=1.0;
@@ -25,6 +30,10 @@ class PlacerHyperparameters {
   bool use_ILP_placer = false;
 
   std::string place_on_grid_constraints_json;
+
+  // SA evaluations of earlier runs on the same node (sequence pair key -> ILP_solver::Serialize), see align/pnr/placer_cache.py
+  bool use_sa_cache = false;
+  std::map<std::string, std::string> sa_cache;
 };
 
 #endif
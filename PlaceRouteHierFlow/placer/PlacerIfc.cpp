@@ -5,6 +5,7 @@
 #include "Pdatatype.h"
 #include "../EA_placer/placement.h"
 #include <chrono>
+#include <mutex>
 
 double Pdatatype::LAMBDA=1.;
 double Pdatatype::GAMAR=30;
@@ -15,8 +16,11 @@ double Pdatatype::PI=0.05;
 double Pdatatype::PII=1;
 
 PlacerIfc::PlacerIfc(PnRDB::hierNode& currentNode, int numLayout, string opath, int effort, PnRDB::Drc_info& drcInfo, const PlacerHyperparameters& hyper) : _nodeVec( numLayout, currentNode) {
-  Pdatatype::LAMBDA = hyper.LAMBDA;
   if (hyper.use_analytical_placer) {
+    // The analytical placer keeps its parameters in Pdatatype statics and draws from std::rand, so one runs at a time
+    static std::mutex analytical_mutex;
+    std::lock_guard<std::mutex> lock(analytical_mutex);
+    Pdatatype::LAMBDA = hyper.LAMBDA;
     /*
      * From PR text
      * I don't know what these values should be:
@@ -58,6 +62,11 @@ PlacerIfc::PlacerIfc(PnRDB::hierNode& currentNode, int numLayout, string opath,
     auto placer_begin = std::chrono::high_resolution_clock::now();
     Placer curr_plc(_nodeVec, opath, effort, drcInfo, hyper);
     auto placer_end = std::chrono::high_resolution_clock::now();
+    _newEvaluations = curr_plc.NewEvaluations();
+    _cacheHits = curr_plc.CacheHits();
+    _cacheMisses = curr_plc.CacheMisses();
+    _saIterations = curr_plc.SAIterations();
+    _saBudget = curr_plc.SABudget();
     logger->debug("Block {0} placement runtime : {1}", _nodeVec.back().name, std::chrono::duration_cast<std::chrono::nanoseconds>(placer_end - placer_begin).count());
   }
 }
@@ -8,12 +8,22 @@ class Placer;
 class PlacerIfc {
   private:
   std::vector<PnRDB::hierNode> _nodeVec;
+  std::map<std::string, std::string> _newEvaluations;
+  size_t _cacheHits = 0, _cacheMisses = 0;
+  size_t _saIterations = 0, _saBudget = 0;
 
   public:
   PlacerIfc(PnRDB::hierNode& currentNode, int numLayout, string opath, int effort, PnRDB::Drc_info& drcInfo, const PlacerHyperparameters& hyper);
   std::vector<PnRDB::hierNode>& get() { return _nodeVec; }
   int getNodeVecSize() const { return _nodeVec.size(); }
   PnRDB::hierNode& getNode(int idx) { return _nodeVec.at(idx); }
+  // SA evaluations to add to the persistent cache (PlacerHyperparameters::sa_cache)
+  const std::map<std::string, std::string>& getNewEvaluations() const { return _newEvaluations; }
+  size_t getCacheHits() const { return _cacheHits; }
+  size_t getCacheMisses() const { return _cacheMisses; }
+  // Temperature steps the SA placer ran, and the number its schedule allowed
+  size_t getSAIterations() const { return _saIterations; }
+  size_t getSABudget() const { return _saBudget; }
 };
 
 #endif
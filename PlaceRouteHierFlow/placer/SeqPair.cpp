@@ -755,7 +755,7 @@ bool SeqPair::KeepOrdering(design& caseNL) {
       int v = q.front();
       q.pop();
       blockid_after_sort.push_back(v);
-      std::random_shuffle(adj[v].begin(), adj[v].end(), [](int i) { return std::rand() % i; });
+      std::random_shuffle(adj[v].begin(), adj[v].end(), [&caseNL](int i) { return caseNL.crand() % i; });
       for (auto& it : adj[v]) {
         ind[it]--;
         if (ind[it] == 0) q.push(it);
@@ -771,7 +771,7 @@ bool SeqPair::KeepOrdering(design& caseNL) {
         for (auto& pair : group.sympair) {
           if (find(blocks2sort.begin(), blocks2sort.end(), pair.first) == blocks2sort.end() &&
               find(blocks2sort.begin(), blocks2sort.end(), pair.second) == blocks2sort.end() && group.selfsym.size()) {
-            int pivot = std::rand() % group.selfsym.size();
+            int pivot = caseNL.crand() % group.selfsym.size();
             int it_pivot = find(posPair.begin(), posPair.end(), group.selfsym[pivot].first) - posPair.begin();
             int first_it = pair.first;
             int second_it = pair.second;
@@ -1175,7 +1175,7 @@ bool SeqPair::KeepOrdering(design& caseNL) {
       int v = q.front();
       q.pop();
       blockid_after_sort.push_back(v);
-      std::random_shuffle(adj[v].begin(), adj[v].end(), [](int i) { return std::rand() % i; });
+      std::random_shuffle(adj[v].begin(), adj[v].end(), [&caseNL](int i) { return caseNL.crand() % i; });
       for (auto& it : adj[v]) {
         ind[it]--;
         if (ind[it] == 0) q.push(it);
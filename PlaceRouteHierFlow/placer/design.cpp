@@ -4,8 +4,6 @@
 
 #include "spdlog/spdlog.h"
 
-std::mt19937_64 design::_rng{0};
-
 design::design() {
   bias_Hgraph = 92;
   bias_Vgraph = 92;
@@ -372,11 +370,52 @@ design::design(PnRDB::hierNode& node, PnRDB::Drc_info& drcInfo, const int seed)
     }
     maxBlockHPWLSum += (width + height);
   }
+  IndexNetPins();
+}
+
+void design::IndexNetPins() {
+  netBlocks.assign(Nets.size(), {});
+  blockNets.assign(Blocks.size(), {});
+  netHasTerminal.assign(Nets.size(), false);
+  for (unsigned n = 0; n < Nets.size(); ++n) {
+    std::map<int, int> index;  // block -> position in netBlocks[n]
+    for (const auto& c : Nets[n].connected) {
+      if (c.type == placerDB::Terminal) {
+        netHasTerminal[n] = true;
+        continue;
+      }
+      if (c.type != placerDB::Block) continue;
+      auto it = index.find(c.iter2);
+      if (it == index.end()) {
+        it = index.emplace(c.iter2, netBlocks[n].size()).first;
+        netBlocks[n].push_back({c.iter2, std::vector<PinBox>(Blocks[c.iter2].size())});
+        blockNets[c.iter2].push_back(n);
+      }
+      auto& boxes = netBlocks[n][it->second].boxes;
+      for (unsigned sel = 0; sel < Blocks[c.iter2].size(); ++sel) {
+        if (c.iter < 0 || c.iter >= int(Blocks[c.iter2][sel].blockPins.size())) continue;
+        const auto& pin = Blocks[c.iter2][sel].blockPins[c.iter];
+        auto& pb = boxes[sel];
+        for (const auto& p : pin.center) {
+          pb.cx0 = std::min(pb.cx0, p.x);
+          pb.cx1 = std::max(pb.cx1, p.x);
+          pb.cy0 = std::min(pb.cy0, p.y);
+          pb.cy1 = std::max(pb.cy1, p.y);
+        }
+        for (const auto& b : pin.boundary) {
+          pb.bx0 = std::min(pb.bx0, b.polygon[0].x);
+          pb.bx1 = std::max(pb.bx1, b.polygon[2].x);
+          pb.by0 = std::min(pb.by0, b.polygon[0].y);
+          pb.by1 = std::max(pb.by1, b.polygon[2].y);
+        }
+      }
+    }
+  }
 }
 
 int design::rand() {
   if (_rnd) return (*_rnd)(_rng);
-  return rand();
+  return std::uniform_int_distribution<int>()(_rng);
 }
 
 int design::GetSizeBlock4Move(int mode) {
@@ -2006,8 +2045,8 @@ design::~design() {
   // logger->debug("sa__seq {0} unique_cnt={1} seq_pair_hash={2} sel_hash={3}", name, _seqPairCache.size(), _seqPairHash.size(), _selHash.size());
   // logger->debug("sa__infeasible {0} aspect_ratio={1} ilp_fail={2} placement_boundary={3} total_calls={4}", name, _infeasAspRatio, _infeasILPFail,
   //               _infeasPlBound, _totalNumCostCalc);
-  // logger->debug("sa_cpp_runtime Block {0} total ILP runtime : {1}", name, ilp_runtime.count());
-  // logger->debug("sa_cpp_runtime Block {0} total ILPsolve runtime : {1}", name, ilp_solve_runtime.count());
-  // logger->debug("sa_cpp_runtime Block {0} total gen valid runtime : {1}", name, gen_valid_runtime.count());
+  // logger->debug("sa_cpp_runtime Block {0} total ILP runtime : {1}", name, ilp_runtime.load());
+  // logger->debug("sa_cpp_runtime Block {0} total ILPsolve runtime : {1}", name, ilp_solve_runtime.load());
+  // logger->debug("sa_cpp_runtime Block {0} total gen valid runtime : {1}", name, gen_valid_runtime.load());
   //_debugofs.close();
 }
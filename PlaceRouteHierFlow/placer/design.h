@@ -4,8 +4,11 @@
 #include <stdlib.h>
 
 #include <algorithm>
+#include <array>
+#include <atomic>
 #include <chrono>
 #include <climits>
+#include <cstdint>
 #include <fstream>
 #include <iostream>
 #include <queue>
@@ -29,6 +32,37 @@ using std::pair;
 using std::string;
 using std::vector;
 
+// The glibc rand() generator (TYPE_3 additive feedback, as seeded by srand) with its own state, so that
+// concurrent placers draw independently while a serial run draws the same numbers it drew from rand()
+class GlibcRand {
+  std::array<int32_t, 31> _state;
+  size_t _f{3}, _r{0};
+
+  public:
+  explicit GlibcRand(unsigned int s = 1) { seed(s); }
+  void seed(unsigned int s) {
+    if (s == 0) s = 1;
+    int32_t word = _state[0] = s;
+    for (size_t i = 1; i < _state.size(); ++i) {
+      const long int hi = word / 127773, lo = word % 127773;
+      word = 16807 * lo - 2836 * hi;
+      if (word < 0) word += 2147483647;
+      _state[i] = word;
+    }
+    _f = 3;
+    _r = 0;
+    for (size_t i = 0; i < 10 * _state.size(); ++i) (*this)();
+  }
+  // In [0, RAND_MAX] (2^31 - 1 with glibc)
+  int operator()() {
+    const uint32_t val = static_cast<uint32_t>(_state[_f]) + static_cast<uint32_t>(_state[_r]);
+    _state[_f] = static_cast<int32_t>(val);
+    _f = (_f + 1) % _state.size();
+    _r = (_r + 1) % _state.size();
+    return static_cast<int>(val >> 1);
+  }
+};
+
 class design {
   public:
   friend class SeqPair;
@@ -106,7 +140,9 @@ class design {
   //  vector< pair<int,Smark> > selfsym;
   //  int dnode;
   //};
-  static std::mt19937_64 _rng;
+  std::mt19937_64 _rng{0};
+  // Metropolis tests of the placer and KeepOrdering draw from this stream (they shared rand())
+  GlibcRand _crand;
   bool hasAsymBlock;
   bool hasSymGroup;
   int noBlock4Move;
@@ -208,12 +244,15 @@ class design {
   CompactStyle compact_style = CompactStyle::L;
 
   public:
-  std::chrono::nanoseconds ilp_runtime{0}, gen_valid_runtime{0}, ilp_solve_runtime{0};
+  // Statistics are updated by the concurrent ILP evaluations of the placer, hence atomic (ns)
+  std::atomic<std::chrono::nanoseconds::rep> ilp_runtime{0}, gen_valid_runtime{0}, ilp_solve_runtime{0};
   design();
   design(PnRDB::hierNode& node, PnRDB::Drc_info& drcInfo, const int seed = 0);
   design(string blockfile, string netfile);
   design(string blockfile, string netfile, string cfile);
   int rand();
+  int crand() { return _crand(); }
+  void scrand(unsigned int seed) { _crand.seed(seed); }
   bool leftAlign() const { return compact_style == CompactStyle::L; }
   bool rightAlign() const { return compact_style == CompactStyle::R; }
 
@@ -283,13 +322,28 @@ class design {
   double GetMaxBlockAreaSum() const { return maxBlockAreaSum; }
   double GetMaxBlockHPWLSum() const { return maxBlockHPWLSum; }
 
+  // Bounding boxes of the pin centers and of the pin shapes by which a net connects to a block, in the
+  // (unflipped) coordinates of each block variant. Empty boxes have x0 > x1.
+  struct PinBox {
+    int cx0 = INT_MAX, cy0 = INT_MAX, cx1 = INT_MIN, cy1 = INT_MIN;
+    int bx0 = INT_MAX, by0 = INT_MAX, bx1 = INT_MIN, by1 = INT_MIN;
+  };
+  struct NetBlock {
+    int block;
+    std::vector<PinBox> boxes;  // per block variant
+  };
+  std::vector<std::vector<NetBlock>> netBlocks;  // per net, the blocks it connects to
+  std::vector<std::vector<int>> blockNets;       // per block, the nets connected to it
+  std::vector<bool> netHasTerminal;
+  void IndexNetPins();
+
   ~design();
 
   size_t getSeqIndex(const vector<int>& seq) const;
   size_t getSelIndex(const vector<int>& sel) const;
   void cacheSeq(const vector<int>& p, const vector<int>& n, const vector<int>& sel);
   bool isSeqInCache(const vector<int>& p, const vector<int>& n, const vector<int>& sel) const;
-  size_t _infeasAspRatio{0}, _infeasILPFail{0}, _infeasPlBound{0}, _totalNumCostCalc{0};
+  std::atomic<size_t> _infeasAspRatio{0}, _infeasILPFail{0}, _infeasPlBound{0}, _totalNumCostCalc{0};
   // std::ofstream _debugofs;
 };
 
@@ -3,7 +3,11 @@
 #include <gtest/gtest.h>
 #include "SeqPair.h"
 #include "design.h"
+#include "ILPSolverIf.h"
 
+#include <atomic>
+#include <cmath>
+#include <thread>
 #include <vector>
 #include <set>
 #include <unordered_set>
@@ -316,3 +320,52 @@ TEST(SeqPairTest, DISABLED_KeepOrdering) {
 
 };
 
+
+TEST(PlacerTest, GlibcRandMatchesRand) {
+  for (unsigned int seed : {0u, 1u, 3u, 4294967295u}) {
+    srand(seed);
+    GlibcRand g(seed);
+    for (int i = 0; i < 1000; ++i) {
+      EXPECT_EQ(g(), rand());
+    }
+  }
+};
+
+// The SA placer solves the ILPs of a batch of trials on several threads, each with its own solver
+TEST(PlacerTest, ILPSolverIfConcurrentSolves) {
+  for (auto solver : {SOLVER_ENUM::SYMPHONY, SOLVER_ENUM::Cbc}) {
+    // min 2x + 3y  s.t.  x + 2y >= 3.5, 3x + y >= 2.5, x, y integer in [0, 10]: (2, 1)
+    auto solve = [solver]() {
+      ILPSolverIf solverif(solver);
+      const double infty = solverif.getInfinity();
+      std::vector<int> starts{0, 2, 4}, indices{0, 1, 0, 1};
+      std::vector<double> values{1, 3, 2, 1}, collb{0, 0}, colub{10, 10}, objective{2, 3};
+      std::vector<double> rhs{3.5, 2.5}, rhsub{infty, infty};
+      std::vector<char> intvars{1, 1}, sens{'G', 'G'};
+      if (solver == SOLVER_ENUM::SYMPHONY) {
+        solverif.loadProblemSym(2, 2, starts.data(), indices.data(), values.data(), collb.data(), colub.data(),
+                                intvars.data(), objective.data(), sens.data(), rhs.data());
+      } else {
+        solverif.loadProblem(2, 2, starts.data(), indices.data(), values.data(), collb.data(), colub.data(),
+                             objective.data(), rhs.data(), rhsub.data(), intvars.data());
+      }
+      const int status = solverif.solve(1);
+      const double* var = solverif.solution();
+      return (status == 0 && var != nullptr) ? std::vector<long>{std::lround(var[0]), std::lround(var[1])} : std::vector<long>{};
+    };
+    const auto expected = solve();
+    ASSERT_EQ(expected, (std::vector<long>{2, 1}));
+
+    std::atomic<int> mismatches{0};
+    std::vector<std::thread> workers;
+    for (int t = 0; t < 8; ++t) {
+      workers.emplace_back([&]() {
+        for (int i = 0; i < 50; ++i) {
+          if (solve() != expected) ++mismatches;
+        }
+      });
+    }
+    for (auto& worker : workers) worker.join();
+    EXPECT_EQ(mismatches, 0);
+  }
+};
@@ -0,0 +1,56 @@
+import concurrent.futures
+import time
+
+from .main import schematic2layout
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _run_job(job):
+    """Run schematic2layout for one job; return (results, elapsed seconds)"""
+    s = time.time()
+    results = schematic2layout(**job)
+    return results, time.time() - s
+
+
+def run_many(jobs, *, max_workers=None, executor='process'):
+    """Run several designs concurrently
+
+    Each job is a dict of schematic2layout keyword arguments (netlist_dir, pdk_dir, working_dir, ...).
+    Jobs must use distinct working directories. executor is 'process' (one design per worker process)
+    or 'thread' (all designs in this process).
+
+    Returns a dict with one entry per job, in job order, under 'jobs' ({'results', 'time'} or {'error'}),
+    and the aggregate 'wall_time' (seconds), 'completed', 'failed' and 'designs_per_hour'.
+    """
+    jobs = list(jobs)
+
+    working_dirs = [str(job.get('working_dir')) for job in jobs]
+    duplicates = {wd for wd in working_dirs if working_dirs.count(wd) > 1}
+    assert not duplicates, f'Jobs share working directories {sorted(duplicates)}'
+
+    executors = {'process': concurrent.futures.ProcessPoolExecutor,
+                 'thread': concurrent.futures.ThreadPoolExecutor}
+    if executor not in executors:
+        raise ValueError(f'Unknown executor {executor}; expected one of {list(executors)}')
+
+    s = time.time()
+    summary = []
+    with executors[executor](max_workers=max_workers) as pool:
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results, elapsed = future.result()
+                summary.append({'results': results, 'time': elapsed})
+            except Exception as e:
+                logger.error(f"Design in {job.get('netlist_dir')} failed: {e!r}")
+                summary.append({'error': e})
+    wall_time = time.time() - s
+
+    completed = sum(1 for r in summary if 'error' not in r)
+    designs_per_hour = 3600*completed/wall_time if wall_time > 0 else 0.0
+    logger.info(f'Completed {completed} of {len(jobs)} designs in {wall_time:.1f}s ({designs_per_hour:.1f} designs/hour)')
+
+    return {'jobs': summary, 'wall_time': wall_time, 'completed': completed, 'failed': len(jobs) - completed,
+            'designs_per_hour': designs_per_hour}
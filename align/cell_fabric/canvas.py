@@ -1,3 +1,4 @@
+import bisect
 import collections
 import json
 import io
@@ -7,6 +8,7 @@
 from .drc import DesignRuleCheck
 from .pex import ParasiticExtraction
 from .postprocess import PostProcessor
+from .terminal_table import TerminalTable
 from .pdk import Pdk
 from .generators import *
 from .grid import *
@@ -20,6 +22,9 @@ class Canvas:
     def computeBbox( self):
         """Set the bbox based on the extend of the included rectangles. You might not want to do this, instead setting it explicitly"""
         if self.bbox is None:
+            if isinstance(self.terminals, TerminalTable):
+                self.bbox = transformation.Rect( *self.terminals.bbox()) if len(self.terminals) > 0 else transformation.Rect(None,None,None,None)
+                return
             self.bbox = transformation.Rect(None,None,None,None)
             for term in self.terminals:
                 r = transformation.Rect( *term['rect'])
@@ -36,9 +41,40 @@ def setBboxFromBoundary( self):
         assert len(res) == 1
         self.bbox = transformation.Rect( *res[0]['rect'])
 
+    @property
+    def terminals( self):
+        """The rectangles on the canvas (list of dicts or TerminalTable)
+
+        Append to it or use remove_terminal(); assigning a new list (or table) makes the next
+        removeDuplicates step start over. Terminals must not be edited in place.
+        """
+        return self._terminals
+
+    @terminals.setter
+    def terminals( self, terminals):
+        self._terminals = terminals
+        self._version += 1
+
+    def remove_terminal( self, term):
+        """Remove term (the terminal object itself, or a row view of the TerminalTable) from the canvas
+
+        Removing a row copies the TerminalTable, so the next removeDuplicates step starts over.
+        """
+        if isinstance(self.terminals, TerminalTable):
+            assert term._table is self.terminals, term
+            self.terminals = self.terminals.take([i for i in range(len(self.terminals)) if i != term._row])
+            return
+        i = next(i for (i, d) in enumerate(self.terminals) if d is term)
+        del self.terminals[i]
+        if self._rd_synced is not None and i < self._rd_synced[2]:
+            (rd, version, n) = self._rd_synced
+            self._rd_synced = (rd, version, n-1)
+            self._rd_removed.append( term)
+
     def addGen( self, gen):
         assert gen.nm not in self.generators, gen.nm
         self.generators[gen.nm] = gen
+        self._version += 1
         return gen
 
     def transform_and_add( self, s):
@@ -114,7 +150,7 @@ def join_wires(self, wire, exclude_nets=None, include_nets=None, max_length=None
         if max_length is not None and max_length < max_l:
             max_l = max_length
 
-        self.terminals = self.removeDuplicates(allow_opens=True).copy()
+        self._sync_duplicates()
         m_lines = self.rd.store_scan_lines[wire.layer]
         iy = 1 if wire.direction.upper() == 'V' else 0
         ix = 0 if wire.direction.upper() == 'V' else 1
@@ -143,7 +179,32 @@ def join_wires(self, wire, exclude_nets=None, include_nets=None, max_length=None
                         new_length -= next_slr.rect[iy+2] - next_slr.rect[iy]
                     else:
                         new_length = 0
-        self.terminals = self.removeDuplicates(allow_opens=True).copy()
+        self._sync_duplicates()
+
+    def _sync_duplicates(self):
+        """Reset the terminals to removeDuplicates(allow_opens=True), see _update_duplicates"""
+        self._reset_terminals(self._update_duplicates(allow_opens=True))
+        self._rd_synced = (self.rd, self._version, len(self.terminals))
+
+    def _update_duplicates(self, *, nets_allowed_to_be_open=None, allow_opens=False):
+        """removeDuplicates, updating self.rd instead of rebuilding it when possible
+
+        That is when the terminals are still those checked by the last _sync_duplicates or gen_data (same object,
+        no generator added since), with some appended or removed with remove_terminal: self.rd is updated with these.
+        The layers changed since the last DRC run are collected for gen_data.
+        """
+        synced, self._rd_synced = self._rd_synced, None
+        removed, self._rd_removed = self._rd_removed, []
+        if synced is not None and synced[0] is self.rd and synced[1] == self._version:
+            n = synced[2]
+            self.rd.nets_allowed_to_be_open = set(nets_allowed_to_be_open or [])
+            self.rd.allow_opens = bool(allow_opens)
+            terminals = self.rd.update([self.terminals[i] for i in range(n, len(self.terminals))], removed)
+            if self._drc_dirty is not None:
+                self._drc_dirty |= self.rd.dirty_layers
+            return terminals
+        self._drc_dirty = None
+        return self.removeDuplicates(nets_allowed_to_be_open=nets_allowed_to_be_open, allow_opens=allow_opens)
 
     def drop_via(self, via, exclude_nets=None, include_nets=None):
 
@@ -155,7 +216,7 @@ def drop_via(self, via, exclude_nets=None, include_nets=None):
         if include_nets is not None:
             include_nets = set(include_nets)
 
-        self.terminals = self.removeDuplicates(allow_opens=True).copy()
+        self._sync_duplicates()
 
         [mb, ma] = self.pdk[via.layer]['Stack']
         assert mb is not None, f'Lower layer is not a metal'
@@ -173,6 +234,10 @@ def drop_via(self, via, exclude_nets=None, include_nets=None):
 
         via_matrix = self._construct_via_matrix(via)
 
+        # Scanlines are not in order: index them by centerline but visit them in their original order
+        mv_order = sorted((mv_cl, pos) for (pos, mv_cl) in enumerate(mv_lines))
+        mv_cls = [mv_cl for (mv_cl, _) in mv_order]
+
         for (mh_cl, mh_sl) in mh_lines.items():
             for (_, mh_slr) in enumerate(mh_sl.rects):
                 mh_name = mh_slr.netName
@@ -180,21 +245,16 @@ def drop_via(self, via, exclude_nets=None, include_nets=None):
                     continue
                 if include_nets is not None and mh_name not in include_nets:
                     continue
-                for (mv_cl, mv_sl) in mv_lines.items():
-                    # Check only the scan lines that can intersect with ml_slr
-                    if mv_cl < 2*mh_slr.rect[0]:
-                        continue
-                    if mv_cl > 2*mh_slr.rect[2]:
-                        continue  # Scanlines are not in order
-                    for (_, mv_slr) in enumerate(mv_sl.rects):
+                # Check only the scan lines that can intersect with mh_slr
+                lo = bisect.bisect_left(mv_cls, 2*mh_slr.rect[0])
+                hi = bisect.bisect_right(mv_cls, 2*mh_slr.rect[2])
+                for (mv_cl, _) in sorted(mv_order[lo:hi], key=lambda p: p[1]):
+                    mv_sl = mv_lines[mv_cl]
+                    # Check only the rectangles that overlap with the centerline
+                    for mv_slr in mv_sl.overlapping(-(-mh_cl//2), mh_cl//2):
                         mv_name = mv_slr.netName
                         if mv_name is None or mv_name != mh_name:
                             continue
-                        # Check only the rectangles that overlap with the centerline
-                        if mh_cl > 2*mv_slr.rect[3]:
-                            continue
-                        if mh_cl < 2*mv_slr.rect[1]:
-                            break
                         # Check if via exists
                         if mh_cl in via_matrix and mv_cl in via_matrix[mh_cl]:
                             continue
@@ -372,17 +432,27 @@ def _initialize_layer_stack(self):
         self.layer_stack = [(l, (pl, nl)) if self.pdk[nl]['Direction'] == 'h' else (l, (nl, pl)) \
             for l, (pl, nl) in self.pdk.get_via_stack() if l.startswith('V')]
 
-    def __init__( self, pdk=None, gds_layer_map=None):
+    def __init__( self, pdk=None, gds_layer_map=None, *, columnar=False):
+        """columnar=True stores the terminals in a TerminalTable instead of a list of dicts"""
         self.pdk = pdk
         self.subinsts = collections.defaultdict(
             lambda: LayoutDevice(
                 collections.defaultdict(None),
                 collections.defaultdict(set)))
-        self.terminals = []
+        # Bumped by changes _update_duplicates can't follow (new terminals object, new generator)
+        self._version = 0
+        self.terminals = TerminalTable() if columnar else []
         self.postprocessor = PostProcessor()
         self.generators = collections.OrderedDict()
         self.trStack = [transformation.Transformation()]
         self.rd = None
+        self._rd_synced = None
+        self._rd_removed = []
+        # Layers changed since self.drc last ran on self.rd (None: run it on everything)
+        self._drc_dirty = None
+        # Groups of (layer, rect) of the terminals that are connected by something not on the canvas
+        # (e.g. the contents of a cell instance that were checked on their own)
+        self.known_connections = []
         self.drc = None
         self.gds_layer_map = gds_layer_map
         self.bbox = None
@@ -391,6 +461,13 @@ def __init__( self, pdk=None, gds_layer_map=None):
         else:
             self._initialize_layer_stack()
 
+    def _reset_terminals( self, terminals):
+        """Replace the terminals keeping the current representation (list of dicts or TerminalTable)"""
+        if isinstance(self.terminals, TerminalTable):
+            self.terminals = TerminalTable(terminals)
+        else:
+            self.terminals = terminals.copy()
+
     def pushTr( self, tr):
         self.trStack.append( self.trStack[-1].postMult( tr))
 
@@ -412,7 +489,8 @@ def gen_data( self, *, draw_grid=False, run_drc=True, run_pex=True, nets_allowed
         data = { 'bbox' : self.bbox.toList(),
                  'globalRoutes' : [],
                  'globalRouteGrid' : [],
-                 'terminals' : self.removeDuplicates(nets_allowed_to_be_open=nets_allowed_to_be_open)}
+                 'terminals' : self._update_duplicates(nets_allowed_to_be_open=nets_allowed_to_be_open)}
+        self._rd_synced = (self.rd, self._version, len(self.terminals))
 
         if hasattr(self, 'metadata'):
             data['metadata'] = self.metadata
@@ -425,8 +503,12 @@ def gen_data( self, *, draw_grid=False, run_drc=True, run_pex=True, nets_allowed
                 self.draw_grid(data)
 
             if run_drc:
-                self.drc = DesignRuleCheck( self)
-                self.drc.run()
+                if self.drc is not None and self.drc.rd is self.rd and self._drc_dirty is not None:
+                    self.drc.run(layers=self._drc_dirty)
+                else:
+                    self.drc = DesignRuleCheck( self)
+                    self.drc.run()
+                self._drc_dirty = set()
             if run_pex:
                 self.pex = ParasiticExtraction( self)
                 self.pex.run()
@@ -1,32 +1,126 @@
+import copy
 import pprint
 import logging
 from collections import defaultdict
+
+import numpy as np
+
+from .terminal_table import TerminalTable
 logger = logging.getLogger(__name__)
 
 
 class RegionSet:
+    """Boundary regions, indexed for containment queries
+
+    Regions are binned in a grid (cell size: the median region extent) by the cells they overlap.
+    A region containing a rect contains its lower left corner, so only the regions binned with
+    that corner are tested. The few regions spanning more than MAX_CELLS cells are tested with NumPy.
+    """
+
+    MAX_CELLS = 64
+
     def __init__(self):
         self.rects = []
+        self._buckets = None
 
     def add_region(self, rect):
         self.rects.append(rect)
+        self._buckets = None
+
+    def build_index(self):
+        rects = np.array(self.rects).reshape(-1, 4)
+        self._cell = 1
+        if len(rects):
+            self._cell = max(1, int(np.median(rects[:, 2] - rects[:, 0])), int(np.median(rects[:, 3] - rects[:, 1])))
+        self._buckets = defaultdict(list)
+        large = []
+        for (i, (x0, y0, x1, y1)) in enumerate((rects // self._cell).astype(np.int64).tolist()):
+            if (x1 - x0 + 1)*(y1 - y0 + 1) > self.MAX_CELLS:
+                large.append(i)
+                continue
+            for gx in range(x0, x1 + 1):
+                for gy in range(y0, y1 + 1):
+                    self._buckets[(gx, gy)].append(self.rects[i])
+        self._large = rects[large]
 
     def contained_in(self, rect):
-        for r in self.rects:
+        if self._buckets is None:
+            self.build_index()
+        for r in self._buckets.get((int(rect[0] // self._cell), int(rect[1] // self._cell)), ()):
             if r[0] <= rect[0] and rect[2] <= r[2] and \
                r[1] <= rect[1] and rect[3] <= r[3]:
-                #logger.debug( f"Filtering rect {rect} inside {r}")
                 return True
-        #logger.debug( f"Did not filter rect {rect}: {self.rects}")
-        return False
+        r = self._large
+        return len(r) > 0 and bool(((r[:, 0] <= rect[0]) & (rect[2] <= r[:, 2]) & (r[:, 1] <= rect[1]) & (rect[3] <= r[:, 3])).any())
+
+
+class LayerArrays:
+    """The rects of all scanlines of a layer as one (n, 4) array, in scanline order
+
+    slrs holds the matching ScanlineRects and line the index of the scanline of each rect;
+    scanline k holds the rows offsets[k]:offsets[k+1].
+    """
+
+    def __init__(self, vv):
+        self.keys = list(vv.keys())
+        self.slrs = [slr for sl in vv.values() for slr in sl.rects]
+        self.rects = np.array([slr.rect for slr in self.slrs]).reshape(-1, 4)
+        counts = [len(sl.rects) for sl in vv.values()]
+        self.line = np.repeat(np.arange(len(counts)), counts)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(int).tolist()
+        self.dIndex = next(iter(vv.values())).dIndex if vv else 0
+
+    def __len__(self):
+        return len(self.slrs)
+
+    def same_line(self):
+        """Mask of the neighbouring pairs (i, i+1) that are on the same scanline"""
+        return self.line[1:] == self.line[:-1]
+
+    def rows(self):
+        """Order of the rects by horizontal row of (twice) center y, rows in order of first appearance, then by x
+
+        Returns the order and the row of each rect in that order.
+        """
+        _, first, inverse = np.unique(self.rects[:, 1] + self.rects[:, 3], return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=int)
+        rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+        row = rank[inverse.reshape(-1)]
+        order = np.argsort(self.rects[:, 0], kind='stable')
+        order = order[np.argsort(row[order], kind='stable')]
+        return order, row[order]
+
+
+def _adjacent_counts(idx, starts):
+    """Running count of adjacent (consecutive grid index) vias along a line
+
+    Counting starts at 1 at the beginning of a line (starts) and restarts at 0 after a gap.
+    """
+    n = len(idx)
+    cont = np.zeros(n, dtype=bool)
+    cont[1:] = (np.diff(idx) == 1) & ~starts[1:]
+    seg_start = np.flatnonzero(~cont)
+    seg = np.cumsum(~cont) - 1
+    base = np.where(starts[seg_start], 1, 0)
+    return base[seg] + np.arange(n) - seg_start[seg]
 
 
 class DesignRuleCheck():
     def __init__(self, canvas):
         self.canvas = canvas
         self.errors = []
+        self.layer_errors = {}
+        # The RemoveDuplicates result checked by the last run, and the pdk rules each layer was checked with
+        self.rd = None
+        self.layer_rules = {}
+        self._build_regions()
 
+    def _build_regions(self):
         self.r_regions = RegionSet()
+        if isinstance(self.canvas.terminals, TerminalTable):
+            for rect in self.canvas.terminals.rects[self.canvas.terminals.mask('layer', 'Boundary')].tolist():
+                self.r_regions.add_region(rect)
+            return
         for term in self.canvas.terminals:
             if term['layer'] == 'Boundary':
                 # logger.debug(f"Adding region {term['rect']} using 'Boundary' object")
@@ -36,23 +130,48 @@ def __init__(self, canvas):
     def num_errors(self):
         return len(self.errors)
 
-    def run(self):
+    def run(self, layers=None):
         '''
         Run DRC on self.canvas & report errors if any
 
         Note: self.canvas must already contain 'rd'
               (aka removeDuplicates has been run)
-        '''
 
-        for (layer, vv) in self.canvas.rd.store_scan_lines.items():
+        If layers is given (e.g. rd.dirty_layers after RemoveDuplicates.update), only these layers,
+        those whose pdk rules changed and the vias landing on them are checked again; the errors of
+        the other layers are kept.
+        '''
+        rd = self.rd = self.canvas.rd
+        pdk = self.canvas.pdk
+
+        recheck = None
+        if layers is not None and 'Boundary' in layers:
+            self._build_regions()
+        elif layers is not None:
+            recheck = set(layers)
+            recheck |= {layer for (layer, rules) in self.layer_rules.items() if layer not in pdk or pdk[layer] != rules}
+            recheck |= {layer for layer in rd.store_scan_lines
+                        if rd.layers.get(layer) == '*' and layer in pdk and set(pdk[layer]['Stack']) & recheck}
+
+        layer_errors = {}
+        for (layer, vv) in rd.store_scan_lines.items():
             if not (layer.startswith('V') or layer.startswith('M')) or layer not in self.canvas.pdk:
                 continue
+            if recheck is not None and layer not in recheck and layer in self.layer_errors:
+                layer_errors[layer] = self.layer_errors[layer]
+                continue
+            self.errors = layer_errors[layer] = []
+            self.layer_rules[layer] = copy.deepcopy(pdk[layer])
+            arrays = LayerArrays(vv)
             if self.canvas.rd.layers[layer] == '*':
-                self._check_via_rules(layer, vv)
+                self._check_via_rules(layer, vv, arrays)
                 self._check_via_enclosure_rules(layer, vv)
             else:
-                self._check_metal_rules(layer, vv)
-                self._check_adjacent_metals(layer, vv)
+                self._check_metal_rules(layer, vv, arrays)
+                self._check_adjacent_metals(layer, vv, arrays)
+
+        self.layer_errors = layer_errors
+        self.errors = [error for errors in layer_errors.values() for error in errors]
 
         # SMB Is it good enough to have the actual errors in the .errors file
         if True:
@@ -64,79 +183,49 @@ def run(self):
 
         return self.num_errors
 
-    def _check_via_rules(self, layer, vv):
+    def _check_via_rules(self, layer, vv, arrays=None):
         '''Simple rules related to vertical and horizontal spacing; need more work for diagonals'''
+        a = LayerArrays(vv) if arrays is None else arrays
+        if len(a) == 0:
+            return
+        rects = a.rects
 
         space_y = self.canvas.pdk[layer].get('SpaceY', None)
         if space_y is not None:
             # Since vias are stored as vertical wires in the scan lines, this is the easy case
             # find closest via with same X centerline with higher Y value
             # if this one violates there may be more that we are ignoring
-            for (_, sl0) in vv.items():
-                for idx, slr0 in enumerate(sl0.rects):
-                    if idx+1 < len(sl0.rects):
-                        slr1 = sl0.rects[idx+1]
-                        if slr0.rect[3] < slr1.rect[1]:
-                            if slr0.rect[3] + space_y > slr1.rect[1]:
-                                self.errors.append(f"Vertical space violation on {layer}: {slr0} {slr1} {space_y}")
+            y1, y0 = rects[:-1, 3], rects[1:, 1]
+            for idx in np.flatnonzero(a.same_line() & (y1 < y0) & (y1 + space_y > y0)).tolist():
+                self.errors.append(f"Vertical space violation on {layer}: {a.slrs[idx]} {a.slrs[idx+1]} {space_y}")
 
         space_x = self.canvas.pdk[layer].get('SpaceX', None)
+        max_adjacent_x = self.canvas.pdk[layer].get('MaxAdjacentX', None)
+        if space_x is not None or max_adjacent_x is not None:
+            (order, row) = a.rows()
+            same_row = row[1:] == row[:-1]
+
         if space_x is not None:
-            horizontal_bins = defaultdict(list)
-            for cx, sl in vv.items():
-                for slr in sl.rects:
-                    cy = slr.rect[1] + slr.rect[3]
-                    horizontal_bins[cy].append(slr.rect)
-            for cy, bins in horizontal_bins.items():
-                bins.sort(key=lambda slr: slr[0])
-                for idx, slr0 in enumerate(bins):
-                    if idx+1 < len(bins):
-                        slr1 = bins[idx+1]
-                        if slr0[2] < slr1[0]:
-                            if slr0[2] + space_x > slr1[0]:
-                                self.errors.append(f"Horizontal space violation on {layer}: {slr0} {slr1} {space_x}")
+            x1, x0 = rects[order[:-1], 2], rects[order[1:], 0]
+            for idx in np.flatnonzero(same_row & (x1 < x0) & (x1 + space_x > x0)).tolist():
+                self.errors.append(f"Horizontal space violation on {layer}: {a.slrs[order[idx]].rect} {a.slrs[order[idx+1]].rect} {space_x}")
 
         max_adjacent_y = self.canvas.pdk[layer].get('MaxAdjacentY', None)
         if max_adjacent_y is not None:
             via = getattr(self.canvas, layer)
-            for (_, sl) in vv.items():
-                idx_prev = None
-                for slr in sl.rects:
-                    idx = via.h_clg.inverseBounds((slr.rect[1]+slr.rect[3])//2)[0][0]
-                    if idx_prev is None:
-                        count = 1
-                    elif idx - idx_prev == 1:
-                        count += 1
-                    else:
-                        count = 0
-                    idx_prev = idx
-                    if count > max_adjacent_y:
-                        self.errors.append(f"Vertical max adjacent via violation on {layer}: {slr}")
+            (lb, _) = via.h_clg.inverseBounds_many((rects[:, 1] + rects[:, 3])//2)
+            starts = np.ones(len(a), dtype=bool)
+            starts[1:] = ~a.same_line()
+            for idx in np.flatnonzero(_adjacent_counts(lb[:, 0], starts) > max_adjacent_y).tolist():
+                self.errors.append(f"Vertical max adjacent via violation on {layer}: {a.slrs[idx]}")
 
-        max_adjacent_x = self.canvas.pdk[layer].get('MaxAdjacentX', None)
         if max_adjacent_x is not None:
             via = getattr(self.canvas, layer)
-
-            # Build horizontal scanlines
-            vv_h = defaultdict(list)
-            for (_, sl) in vv.items():
-                for slr in sl.rects:
-                    vv_h[slr.rect[1] + slr.rect[3]].append(slr.rect)
-
-            for (_, sl) in vv_h.items():
-                sl.sort(key=lambda slr: slr[0])
-                idy_prev = None
-                for r in sl:
-                    idy = via.v_clg.inverseBounds((r[0]+r[2])//2)[0][0]
-                    if idy_prev is None:
-                        count = 1
-                    elif idy - idy_prev == 1:
-                        count += 1
-                    else:
-                        count = 0
-                    idy_prev = idy
-                    if count > max_adjacent_x:
-                        self.errors.append(f"Horizontal max adjacent via violation on {layer}: {slr}")
+            (lb, _) = via.v_clg.inverseBounds_many((rects[order, 0] + rects[order, 2])//2)
+            starts = np.ones(len(a), dtype=bool)
+            starts[1:] = ~same_row
+            for idx in np.flatnonzero(_adjacent_counts(lb[:, 0], starts) > max_adjacent_x).tolist():
+                self.errors.append(f"Horizontal max adjacent via violation on {layer}: {a.slrs[order[idx]]}")
 
     def _check_via_enclosure_rules(self, layer, vv):
         '''Check via enclosures.'''
@@ -168,7 +257,7 @@ def check_single_metal(r, ly, metal_dir, enclosure_value):
                 if ly_u is not None:
                     check_single_metal(r, ly_u, mu_dir, v['VencA_H'])
 
-    def _check_adjacent_metals(self, layer, vv):
+    def _check_adjacent_metals(self, layer, vv, arrays=None):
         m = self.canvas.pdk[layer]
         if 'AdjacentAttacker' not in m:
             return
@@ -180,76 +269,69 @@ def _check_adjacent_metals(self, layer, vv):
 
         o = 0 if dr == 'H' else 1
 
-        for cx0, v0 in vv.items():
+        a = LayerArrays(vv) if arrays is None else arrays
+        line_of = {cx: k for (k, cx) in enumerate(a.keys)}
+        for (k0, cx0) in enumerate(a.keys):
             for cx1 in [cx0-2*m['Pitch'], cx0+2*m['Pitch']]:
-                if cx1 in vv:
-                    v1 = vv[cx1]
-                    for slr0 in v0.rects:
-                        for slr1 in v1.rects:
-                            if 0 < slr1.rect[o+0] - slr0.rect[o+2] <= dist:
-                                self.errors.append(f"Adjacent metal attacker {layer}: {slr0.rect} too close to {slr1.rect} dist: {dist}")
+                if cx1 in line_of:
+                    k1 = line_of[cx1]
+                    (b0, e0), (b1, e1) = a.offsets[k0:k0+2], a.offsets[k1:k1+2]
+                    # rects on a scanline are sorted by start: the attackers of each rect are a contiguous range
+                    ends0 = a.rects[b0:e0, o+2]
+                    starts1 = a.rects[b1:e1, o]
+                    lo = np.searchsorted(starts1, ends0, side='right').tolist()
+                    hi = np.searchsorted(starts1, ends0 + dist, side='right').tolist()
+                    for (i, j0, j1) in zip(range(b0, e0), lo, hi):
+                        for j in range(b1 + j0, b1 + j1):
+                            self.errors.append(f"Adjacent metal attacker {layer}: {a.slrs[i].rect} too close to {a.slrs[j].rect} dist: {dist}")
 
     def _find_rect_covering_via(self, r, ly, metal_dir):
         cx2 = r.rect[0]+r.rect[2]
         cy2 = r.rect[1]+r.rect[3]
-        c2a, c2p, o = (cx2, cy2, 0) if metal_dir == 'H' else (cy2, cx2, 1)
+        c2a, c2p = (cx2, cy2) if metal_dir == 'H' else (cy2, cx2)
         sl = self.canvas.rd.store_scan_lines[ly][c2p]
 
-        def binary_search(l, u, v):
-            if l == u:
-                return None
-            elif l+1 == u:
-                if sl.rects[l].rect[o+0] <= v <= sl.rects[l].rect[o+2]:
-                    return sl.rects[l].rect
-                else:
-                    return None
-            else:
-                m = (l+u+1)//2
-                if sl.rects[m].rect[o+0] <= v:
-                    return binary_search(m, u, v)
-                else:
-                    return binary_search(l, m, v)
-
-        result = binary_search(0, len(sl.rects), c2a//2)
-        if result is not None:
-            return result
+        slr = sl.find_covering(c2a//2)
+        if slr is not None:
+            return slr.rect
         else:
             #assert False, f"No rectangle on {ly} covering via at {r.rect}"
-            return result
+            return None
 
-    def _check_metal_rules(self, layer, vv):
+    def _check_metal_rules(self, layer, vv, arrays=None):
         '''Check metal min-length / min-spacing rules'''
-        for v in vv.values():
-            self._check_min_length(
-                layer, v.rects, v.dIndex)
-            self._check_min_spacing(
-                layer, v.rects, v.dIndex)
-
-    def _check_min_length(self, layer, slrects, dIndex):
+        a = LayerArrays(vv) if arrays is None else arrays
+        if len(a) == 0:
+            return
         min_length = self.canvas.pdk[layer]['MinL']
-        (start, end) = (dIndex, dIndex + 2)
-        for slr in slrects:
-            rect = slr.rect
-            if rect[end] - rect[start] < min_length:
-                root = slr.root()
-                if self.r_regions.contained_in(rect):
-                    logger.debug(f"Skipping: MinLength violation on {layer}: {root.netName}{rect}")
-                else:
-                    self.errors.append(
-                        f"MinLength violation on {layer}: {root.netName}{rect}")
-
-    def _check_min_spacing(self, layer, slrects, dIndex):
         min_space = self.canvas.pdk[layer]['EndToEnd']
-        (start, end) = (dIndex, dIndex + 2)
-        prev_slr = None
-        for slr in slrects:
-            if prev_slr is not None and \
-               0 < slr.rect[start] - prev_slr.rect[end] < min_space:
-                if self.r_regions.contained_in(slr.rect):
-                    logger.debug(
-                        f"Skipping: MinSpace violation on {layer}: {prev_slr.root().netName}{prev_slr.rect} x {slr.root().netName}{slr.rect}")
-                else:
-                    self.errors.append(
-                        f"MinSpace violation on {layer}: {prev_slr.root().netName}{prev_slr.rect} x {slr.root().netName}{slr.rect}")
-            prev_slr = slr
-        return
+        (start, end) = (a.rects[:, a.dIndex], a.rects[:, a.dIndex+2])
+
+        short = np.flatnonzero(end - start < min_length).tolist()
+        gap = start[1:] - end[:-1]
+        close = (np.flatnonzero(a.same_line() & (0 < gap) & (gap < min_space)) + 1).tolist()
+
+        # Report scanline by scanline, min-length before min-spacing violations
+        line = a.line.tolist()
+        for (_, kind, idx) in sorted([(line[i], 0, i) for i in short] + [(line[i], 1, i) for i in close]):
+            if kind == 0:
+                self._report_min_length(layer, a.slrs[idx])
+            else:
+                self._report_min_spacing(layer, a.slrs[idx-1], a.slrs[idx])
+
+    def _report_min_length(self, layer, slr):
+        rect = slr.rect
+        root = slr.root()
+        if self.r_regions.contained_in(rect):
+            logger.debug(f"Skipping: MinLength violation on {layer}: {root.netName}{rect}")
+        else:
+            self.errors.append(
+                f"MinLength violation on {layer}: {root.netName}{rect}")
+
+    def _report_min_spacing(self, layer, prev_slr, slr):
+        if self.r_regions.contained_in(slr.rect):
+            logger.debug(
+                f"Skipping: MinSpace violation on {layer}: {prev_slr.root().netName}{prev_slr.rect} x {slr.root().netName}{slr.rect}")
+        else:
+            self.errors.append(
+                f"MinSpace violation on {layer}: {prev_slr.root().netName}{prev_slr.rect} x {slr.root().netName}{slr.rect}")
@@ -3,10 +3,12 @@
 import json
 import datetime
 from . import pdk
+from ..gdsconv.gds_writer import write_gds
 import logging
 logger = logging.getLogger(__name__)
 
-def translate_data( macro_name, exclude_pattern, pdkfile, pinSwitch, data, via_gen_tbl, timestamp=None):
+def gen_library( macro_name, exclude_pattern, pdkfile, pinSwitch, data, via_gen_tbl, timestamp=None):
+  """gds.json style top level dict whose structures (and the macro's elements) are generated lazily"""
   j = pdk.Pdk().load(pdkfile)
   with open(pdkfile, "rt") as fp1:
     j1 = json.load(fp1)
@@ -31,10 +33,6 @@ def flat_rect_to_boundary( r):
   lib = {"time" : tme, "libname" : "pcell", "units" : [ units_user, units_meter ]}
   libraries.append (lib)
 
-  structures = []
-  lib["bgnstr"] = structures
-
-
   def createViaSref(via, nm, layers):
 
     strct = {"time" : tme, "strname" : nm, "elements" : []}
@@ -45,12 +43,6 @@ def createViaSref(via, nm, layers):
 
     return strct
 
-  for via, (gen_name, layers) in via_gen_tbl.items():
-    structures.append( createViaSref(via, gen_name, layers) )
-
-  strct = {"time" : tme, "strname" : macro_name, "elements" : []}
-  structures.append (strct)
-
   def scale(x):
 
       result = x
@@ -70,41 +62,52 @@ def scale(x):
   def exclude_based_on_name( nm):
     return pat and nm is not None and pat.match( nm)
 
-  # non-vias
-  for obj in data['terminals']:
+  def elements():
+    yield from non_via_elements()
+    yield from via_elements()
+    yield {"type": "boundary", "layer" : j['Bbox']['GdsLayerNo'], "datatype" : j['Bbox']['GdsDatatype']['Draw'],
+           "xy" : flat_rect_to_boundary( list(map(scale,data['bbox'])))}
+
+  def structures():
+    for via, (gen_name, layers) in via_gen_tbl.items():
+      yield createViaSref(via, gen_name, layers)
+    yield {"time" : tme, "strname" : macro_name, "elements" : elements()}
+
+  def non_via_elements():
+    for obj in data['terminals']:
       k = obj['layer']
       if k in via_gen_tbl: continue
-      if exclude_based_on_name( obj['netName']): continue    
+      if exclude_based_on_name( obj['netName']): continue
       r = list(map( scale, obj['rect']))
 
       if k == "V0" and (r[2]-r[0]) > scale(10*j['V0']['WidthX']):
           for NumX in range(j['GuardRing']['viaArray']):
               new_rect = [r[0]+NumX*(j['GuardRing']['v0WidthX']+j['GuardRing']['v0SpaceX']), r[1],
                           r[0]+NumX*(j['GuardRing']['v0WidthX']+j['GuardRing']['v0SpaceX'])+j['GuardRing']['v0WidthX'], r[3]]
-              strct["elements"].append ({"type": "boundary", "layer" : j[k]['GdsLayerNo'],
-                            "datatype" : j[k]['GdsDatatype']['Draw'],
-                            "xy" : flat_rect_to_boundary( new_rect)})
+              yield {"type": "boundary", "layer" : j[k]['GdsLayerNo'],
+                     "datatype" : j[k]['GdsDatatype']['Draw'],
+                     "xy" : flat_rect_to_boundary( new_rect)}
       elif pinSwitch != 0 and 'netType' in obj and obj['netType'] == 'pin':
-          strct["elements"].append ({"type": "boundary", "layer" : j[k]['GdsLayerNo'],
-                        "datatype" : j[k]['GdsDatatype']['Pin'],
-                        "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))})
+          yield {"type": "boundary", "layer" : j[k]['GdsLayerNo'],
+                 "datatype" : j[k]['GdsDatatype']['Pin'],
+                 "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))}
           if 'Label' in j[k]['GdsDatatype']:
               bbox = list(map(scale, obj['rect']))
               xy = [int((bbox[0] + bbox[2])/ 2), int((bbox[1] + bbox[3]) /2)]
-              strct["elements"].append ({"layer" : j[k]['GdsLayerNo'], "type": "text",
-                           "texttype" : j[k]['GdsDatatype']['Label'], "string" : obj["netName"],
-                           "xy" : xy})
+              yield {"layer" : j[k]['GdsLayerNo'], "type": "text",
+                     "texttype" : j[k]['GdsDatatype']['Label'], "string" : obj["netName"],
+                     "xy" : xy}
       else:
-          strct["elements"].append ({"type": "boundary", "layer" : j[k]['GdsLayerNo'],
-                        "datatype" : j[k]['GdsDatatype']['Draw'],
-                        "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))})
+          yield {"type": "boundary", "layer" : j[k]['GdsLayerNo'],
+                 "datatype" : j[k]['GdsDatatype']['Draw'],
+                 "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))}
       if ('color' in obj):
-          strct["elements"].append ({"type": "boundary", "layer" : j[k]['GdsLayerNo'],
-                        "datatype" : j[k]['GdsDatatype'][obj['color']],
-                        "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))})
+          yield {"type": "boundary", "layer" : j[k]['GdsLayerNo'],
+                 "datatype" : j[k]['GdsDatatype'][obj['color']],
+                 "xy" : flat_rect_to_boundary( list(map(scale,obj['rect'])))}
 
-  # vias
-  for obj in data['terminals']:
+  def via_elements():
+    for obj in data['terminals']:
       k = obj['layer']
       if k not in via_gen_tbl: continue
       if exclude_based_on_name( obj['netName']): continue
@@ -112,13 +115,22 @@ def exclude_based_on_name( nm):
       r = list(map( scale, obj['rect']))
       xc = (r[0]+r[2])//2
       yc = (r[1]+r[3])//2
-      
-      strct["elements"].append ({"type": "sref", "sname" : via_gen_tbl[k][0], "xy" : [xc, yc]})
 
-  strct["elements"].append ({"type": "boundary", "layer" : j['Bbox']['GdsLayerNo'], "datatype" : j['Bbox']['GdsDatatype']['Draw'],
-                    "xy" : flat_rect_to_boundary( list(map(scale,data['bbox'])))})
+      yield {"type": "sref", "sname" : via_gen_tbl[k][0], "xy" : [xc, yc]}
+
+  lib["bgnstr"] = structures()
+
+  return top
 
+def translate_data( macro_name, exclude_pattern, pdkfile, pinSwitch, data, via_gen_tbl, timestamp=None):
+  top = gen_library( macro_name, exclude_pattern, pdkfile, pinSwitch, data, via_gen_tbl, timestamp)
+  for lib in top['bgnlib']:
+    lib['bgnstr'] = [ dict( strct, elements=list(strct['elements'])) for strct in lib['bgnstr']]
   return top
 
 def translate( macro_name, exclude_pattern, pinSwitch, fp, ofile, timestamp=None, p=None):
   json.dump(translate_data( macro_name, exclude_pattern, p.layerfile, pinSwitch, json.load(fp), {}, timestamp), ofile, indent=4)
+
+def translate_gds( macro_name, exclude_pattern, pinSwitch, data, ofile, timestamp=None, p=None):
+  """Stream the layout dict data straight to binary GDS ofile, without the gds.json intermediate"""
+  write_gds(gen_library( macro_name, exclude_pattern, p.layerfile, pinSwitch, data, {}, timestamp), ofile)
@@ -1,5 +1,7 @@
+import bisect
 import copy
 import operator
+import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 
@@ -7,25 +9,40 @@
 class Grid:
     def __init__( self):
         """
-        grid is a list of pairs: the grid coord and associated attributes (e.g., width, color)
+        grid is a tuple of pairs: the grid coord and associated attributes (e.g., width, color)
         """
-        self.grid = []
+        self._grid = ()
         self.legalIndices = set()
+        # grid lines sorted by physical coordinate (ties in index order) for inverseBounds
+        self._sorted_values = []
+        self._sorted_indices = []
+
+    @property
+    def grid( self):
+        """Read-only, so that the sorted table kept by addGridLine and copyShift can't go stale"""
+        return self._grid
 
     def semantic( self):
         assert self.n > 0
 
     def addGridLine( self, value, isLegal, attrs=None):
-        self.grid.append( (value, attrs))
+        self._grid += ((value, attrs),)
         if isLegal:
             self.legalIndices.add( len(self.grid)-1)
+        i = bisect.bisect_right( self._sorted_values, value)
+        self._sorted_values.insert( i, value)
+        self._sorted_indices.insert( i, len(self.grid)-1)
+
+    def _build_sorted_table( self):
+        monotonic_grid = sorted( enumerate(c for (c,_) in self.grid), key=lambda x: x[1])
+        self._sorted_values = [val for (_, val) in monotonic_grid]
+        self._sorted_indices = [idx for (idx, _) in monotonic_grid]
 
     def copyShift( self, shift=None):
         result = copy.copy( self)
         if shift is not None:
-            result.grid = []
-            for (c,attrs) in self.grid:
-                result.grid.append( (c+shift,attrs))
+            result._grid = tuple( (c+shift,attrs) for (c,attrs) in self.grid)
+        result._build_sorted_table()
         return result
 
     @property
@@ -39,14 +56,30 @@ def period( self):
     def inverseBounds(self, physical):
         offset = self.grid[0][0]
         (q, r) = divmod(physical - offset, self.period)
-        monotonic_grid = [(i, v[0]) for i, v in enumerate(self.grid)]
-        monotonic_grid.sort(key=lambda x: x[1])
-        for i, (idx, val) in enumerate(monotonic_grid):
-            if val - offset == r:
-                return ((q, idx), (q, idx))
-            elif val - offset > r:
-                idx_prev = monotonic_grid[i-1][0]
-                return ((q, idx_prev), (q, idx))
+        i = bisect.bisect_left(self._sorted_values, r + offset)
+        if i == len(self._sorted_values):
+            return None
+        idx = self._sorted_indices[i]
+        if self._sorted_values[i] - offset == r:
+            return ((q, idx), (q, idx))
+        else:
+            return ((q, self._sorted_indices[i-1]), (q, idx))
+
+    def inverseBounds_many(self, physical):
+        """Vectorized inverseBounds
+
+        Returns a pair of (n, 2) integer arrays holding the lower and upper bound (q, idx) for each physical coordinate.
+        """
+        values = np.asarray(self._sorted_values)
+        indices = np.asarray(self._sorted_indices)
+        offset = self.grid[0][0]
+        q, r = np.divmod(np.asarray(physical) - offset, self.period)
+        i = np.searchsorted(values, r + offset, side='left')
+        assert (i < len(values)).all()
+        hit = values[i] - offset == r
+        ub = indices[i]
+        lb = np.where(hit, ub, indices[i-1])
+        return np.stack((q, lb), axis=-1), np.stack((q, ub), axis=-1)
 
     def snapToLegal(self, idx, direction):
         assert len(idx) == 2
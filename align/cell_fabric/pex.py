@@ -2,14 +2,18 @@
 import math
 import re
 
+import numpy as np
+
 class ParasiticExtraction():
     def __init__(self, canvas):
         self.canvas = canvas
+        self._ports = collections.defaultdict(lambda: collections.defaultdict(set)) # layer: {scanline: {p1...pn}}
         self._terms = collections.defaultdict(lambda: collections.defaultdict(list)) # layer: {scanline: [p1...pn]}
         self._c_count = 0
         self._r_count = 0
         self.netCells = collections.OrderedDict() # (node1, node2) : (layer, rect)
         self.components = []
+        self.vianodes = set() # nodes at via (and device terminal) connections
 
     def run(self):
         '''
@@ -25,9 +29,9 @@ def run(self):
                 self._compute_via_intersections(layer, vv)
 
         # Topological sort of stoppoints
-        for vv in self._terms.values():
-            for x in vv.values():
-                x.sort()
+        for (layer, vv) in self._ports.items():
+            for (twice_center, x) in vv.items():
+                self._terms[layer][twice_center] = sorted(x)
 
         # Create OrderedDict with NodeName -> layer, rect mappings
         for (layer, vv) in self.canvas.rd.store_scan_lines.items():
@@ -50,6 +54,7 @@ def run(self):
                 (self.pi if mode == "Pi" else self.tee)( t0, t1, self.canvas.pdk[ly]['UnitR']['Mean']*dist, self.canvas.pdk[ly]['UnitC']['Mean']*dist )
             elif ly.startswith('V'):
                 self.components.append( (self.resistor(), t0, t1, self.canvas.pdk[ly]['R']['Mean']))
+                self.vianodes.update((t0, t1))
             else:
                assert False, ly
 
@@ -57,11 +62,9 @@ def _stamp_port(self, layer, x0, x1):
         if layer is None:
             return
         if self.canvas.rd.layers[layer] == 'h':
-            if x1 not in self._terms[layer][x0 * 2]:
-                self._terms[layer][x0 * 2].append(x1)
+            self._ports[layer][x0 * 2].add(x1)
         else:
-            if x0 not in self._terms[layer][x1 * 2]:
-                self._terms[layer][x1 * 2].append(x0)
+            self._ports[layer][x1 * 2].add(x0)
 
     def _compute_via_intersections(self, layer, vv):
         for twice_center, v in vv.items():
@@ -81,8 +84,8 @@ def _extract_via_parasitics(self, layer, vv):
     def _create_via_netcells(self, net, terminal, layer, rect):
         x = ( rect[0] + rect[2] ) // 2
         y = ( rect[1] + rect[3] ) // 2
-        assert x*2 in self._terms[layer], (x, y, self._terms[layer])
-        assert y in self._terms[layer][x*2], (x, y, self._terms[layer])
+        assert x*2 in self._ports[layer], (x, y, self._terms[layer])
+        assert y in self._ports[layer][x*2], (x, y, self._terms[layer])
         if terminal is None:
             node1 = self._gen_netcell_node_name(net, self.canvas.pdk[layer]['Stack'][0], x, y)
             node2 = self._gen_netcell_node_name(net, self.canvas.pdk[layer]['Stack'][1], x, y)
@@ -187,17 +190,141 @@ def getSummaryCaps( self):
 
         return tbl
 
-    def writePex(self, fp):
-        for tup in self.components:
-            if tup[0][0] == 'r':
-                (nm, t0, t1, v) = tup
-                fp.write( f"{nm} {t0} {t1} {v}\n")
-            elif tup[0][0] == 'c':
-                (nm, t0, t1, v) = tup
-                fp.write( f"{nm} {t0} {t1} {v}f\n")
+    def rc_network(self):
+        '''
+        Assemble the extracted components into sparse matrices
+
+        Returns (nodes, G, C): G is the nodal conductance matrix and C the diagonal matrix
+        of capacitances to ground (in fF), both scipy.sparse CSR matrices indexed like nodes.
+        Nets are not connected to each other, so G is block diagonal with one block per net.
+        '''
+        import scipy.sparse
+
+        index = {}
+        (rows, cols, g, cnodes, c) = ([], [], [], [], [])
+        for (nm, t0, t1, v) in self.components:
+            i = index.setdefault(t0, len(index))
+            if nm[0] == 'r':
+                assert v > 0, f'Resistor {nm} ({t0}, {t1}) has non-positive value {v}'
+                j = index.setdefault(t1, len(index))
+                rows.extend((i, j, i, j))
+                cols.extend((i, j, j, i))
+                g.extend((1/v, 1/v, -1/v, -1/v))
+            elif nm[0] == 'c':
+                assert t1 == 0
+                cnodes.append(i)
+                c.append(v)
             else:
                 assert False
 
+        n = len(index)
+        # duplicates (parallel resistors, capacitors on the same node) are summed
+        G = scipy.sparse.coo_matrix((g, (rows, cols)), shape=(n, n)).tocsr()
+        C = scipy.sparse.diags(np.bincount(np.array(cnodes, dtype=int), weights=c, minlength=n), format='csr')
+        return list(index), G, C
+
+    def reduce_network(self, keep=None):
+        '''
+        Eliminate the internal nodes of the RC network that connect at most two resistors
+
+        keep adds node names to the ports that are never eliminated (the via and device
+        terminal nodes). A node between two resistors R1 (to a) and R2 (to b) becomes the
+        resistor R1+R2 between a and b, and its capacitance is split between a and b in the
+        ratio R2:R1; a dangling node gives its capacitance to its neighbor. This preserves the
+        resistance between the remaining nodes and, on tree networks, their Elmore delays.
+
+        Returns (nodes, G, C) like rc_network
+        '''
+        import scipy.sparse
+
+        (nodes, G, C) = self.rc_network()
+        ports = self.vianodes if keep is None else self.vianodes | set(keep)
+
+        G = G.tocoo()
+        adj = [{} for _ in nodes]
+        for (i, j, v) in zip(G.row.tolist(), G.col.tolist(), G.data.tolist()):
+            if i != j and v != 0:
+                adj[i][j] = -v
+        cap = C.diagonal().tolist()
+
+        alive = [True] * len(nodes)
+        todo = [i for (i, nm) in enumerate(nodes) if nm not in ports]
+        candidates = set(todo)
+        while todo:
+            m = todo.pop()
+            candidates.discard(m)
+            nbrs = adj[m]
+            if len(nbrs) == 0 or len(nbrs) > 2:
+                continue
+            if len(nbrs) == 1:
+                ((a, ga),) = nbrs.items()
+                cap[a] += cap[m]
+                del adj[a][m]
+            else:
+                ((a, ga), (b, gb)) = nbrs.items()
+                cap[a] += cap[m] * ga / (ga + gb)
+                cap[b] += cap[m] * gb / (ga + gb)
+                del adj[a][m]
+                del adj[b][m]
+                g = ga * gb / (ga + gb)
+                adj[a][b] = adj[a].get(b, 0) + g
+                adj[b][a] = adj[b].get(a, 0) + g
+            alive[m] = False
+            adj[m] = {}
+            for k in nbrs:
+                if k not in candidates and nodes[k] not in ports:
+                    candidates.add(k)
+                    todo.append(k)
+
+        remaining = [i for i in range(len(nodes)) if alive[i]]
+        renumber = {i: k for (k, i) in enumerate(remaining)}
+        (rows, cols, g) = ([], [], [])
+        for i in remaining:
+            rows.append(renumber[i])
+            cols.append(renumber[i])
+            g.append(sum(adj[i].values()))
+            for (j, v) in adj[i].items():
+                rows.append(renumber[i])
+                cols.append(renumber[j])
+                g.append(-v)
+        n = len(remaining)
+        G = scipy.sparse.coo_matrix((g, (rows, cols)), shape=(n, n)).tocsr()
+        C = scipy.sparse.diags([cap[i] for i in remaining], format='csr')
+        return [nodes[i] for i in remaining], G, C
+
+    @staticmethod
+    def _write_network(fp, nodes, G, C):
+        import scipy.sparse
+
+        G = scipy.sparse.triu(G, k=1, format='coo')
+        for (k, (i, j, v)) in enumerate(zip(G.row.tolist(), G.col.tolist(), G.data.tolist())):
+            fp.write( f"r{k} {nodes[i]} {nodes[j]} {-1/v}\n")
+        k = 0
+        for (i, v) in enumerate(C.diagonal().tolist()):
+            if v != 0:
+                fp.write( f"c{k} {nodes[i]} 0 {v}f\n")
+                k += 1
+
+    def writePex(self, fp, reduce=False):
+        '''
+        Write the extracted netlist
+
+        With reduce set, the RC network is written after reduce_network, with one
+        capacitor per remaining node instead of one per segment end.
+        '''
+        if reduce:
+            self._write_network(fp, *self.reduce_network())
+        else:
+            for tup in self.components:
+                if tup[0][0] == 'r':
+                    (nm, t0, t1, v) = tup
+                    fp.write( f"{nm} {t0} {t1} {v}\n")
+                elif tup[0][0] == 'c':
+                    (nm, t0, t1, v) = tup
+                    fp.write( f"{nm} {t0} {t1} {v}f\n")
+                else:
+                    assert False
+
         for inst, v in self.canvas.rd.subinsts.items():
             inst = inst.replace("/", "_")
             model = v.parameters.pop('model')
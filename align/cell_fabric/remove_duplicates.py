@@ -1,8 +1,10 @@
 
 from collections import defaultdict, OrderedDict
+from bisect import bisect_left, bisect_right
 import pprint
 
 from .generators import *
+from .terminal_table import TerminalTable
 
 import logging
 logger = logging.getLogger(__name__)
@@ -34,16 +36,24 @@ def __init__(self):
         self.netType = None
         self.terminal = None
         self.isPorted = False
+        # Scanline and position in it, set once the scanline is built
+        self.line = None
+        self.pos = None
 
     def __repr__(self):
         return str( (self.rect, self.netName, self.netType))
 
 class Scanline:
-    def __init__(self, indices, dIndex):
+    def __init__(self, indices, dIndex, layer=None):
         self.indices = indices
         self.dIndex = dIndex
+        self.layer = layer
+        self.rank = None
         self.rects = []
         self.dad = None
+        self._starts = None
+        self._ends = None
+        self._max_ends = None
 
     def isEmpty(self):
         return len(self.rects) == 0
@@ -63,29 +73,63 @@ def new_slr_no_add( rect, netName, netType, *, isPorted=False):
 
     def add_slr(self, slr):
         self.rects.append(slr)
+        self._starts = None
         return slr
 
     def new_slr(self, rect, netName, netType, *, isPorted=False):
-        self.add_slr( self.new_slr_no_add( rect, netName, netType, isPorted=isPorted))
+        slr = self.add_slr( self.new_slr_no_add( rect, netName, netType, isPorted=isPorted))
         return slr
 
     def merge_slr(self, base_slr, new_slr):
         base_slr.rect[self.dIndex+2] = max(base_slr.rect[self.dIndex+2], new_slr.rect[self.dIndex+2])
         base_slr.isPorted = base_slr.isPorted or new_slr.isPorted
+        self._starts = None
 
     def __repr__( self):
         return 'Scanline( rects=' + str(self.rects) + ')'
 
-    def find_touching(self, via_rect):
-        #
-        # Linear search --- could improve performance by binary search since rects are sorted
-        #
-        result = None
-        for metal_rect in self.rects:
+    def build_index(self):
+        """Build the sorted interval index along the scanline direction.
+
+        Rects are stored sorted by start coordinate but may overlap (shorts, different widths),
+        so we keep the running maximum of the end coordinates next to the starts.
+        Both arrays are monotonic and can be searched with bisect.
+        """
+        self._starts = [slr.rect[self.dIndex] for slr in self.rects]
+        self._ends = [slr.rect[self.dIndex+2] for slr in self.rects]
+        self._max_ends = []
+        mx = None
+        for e in self._ends:
+            mx = e if mx is None or e > mx else mx
+            self._max_ends.append(mx)
+
+    def overlapping(self, lo, hi):
+        """Generate (in scanline order) the rects whose extent along the scanline intersects [lo, hi]"""
+        if self._starts is None:
+            self.build_index()
+        stop = bisect_right(self._starts, hi)
+        for i in range(bisect_left(self._max_ends, lo), stop):
+            if self._ends[i] >= lo:
+                yield self.rects[i]
+
+    def find_covering(self, v):
+        """Return the last rect (in scanline order) starting at or before v, if it covers v"""
+        if self._starts is None:
+            self.build_index()
+        i = bisect_right(self._starts, v) - 1
+        if i >= 0 and v <= self._ends[i]:
+            return self.rects[i]
+        return None
+
+    def first_touching(self, via_rect):
+        """Return the first rect (in scanline order) touching via_rect, None if there is none"""
+        for metal_rect in self.overlapping(via_rect.rect[self.dIndex], via_rect.rect[self.dIndex+2]):
             if RemoveDuplicates.touching( via_rect.rect, metal_rect.rect):
-                result = metal_rect
-                break
+                return metal_rect
+        return None
 
+    def find_touching(self, via_rect):
+        result = self.first_touching(via_rect)
         assert result is not None, (via_rect, self.rects)
         return result
 
@@ -104,22 +148,47 @@ def dump(self):
 
     def check_opens(self):
 
-        tbl = defaultdict(lambda: defaultdict(list))
+        # Rects and components of each net, kept so update() can recheck just the nets it touches
+        self.net_members = defaultdict(dict)
+        self.net_roots = defaultdict(set)
+        self.terminal_opens = []
+        # Whether every rect carries the net name of its component, as after a rebuild from generate_rectangles()
+        self.normalized = True
 
         for (layer,v) in self.store_scan_lines.items():
             for vv in v.values():
                 for slr in vv.rects:
                     root = slr.root()
                     nm = root.netName
+                    if slr.netName != nm:
+                        self.normalized = False
                     if nm is not None:
-                        tbl[nm][id(root)].append( (layer, slr.rect))
+                        self.net_members[nm][slr] = None
+                        self.net_roots[nm].add( root)
                     elif slr.terminal is not None:
                         self.subinsts[slr.terminal[0]].pins[slr.terminal[1]].add( None)
-                        self.set_open( slr.terminal, slr.terminal)
+                        self.terminal_opens.append( slr.terminal)
+
+        self.net_opens = {nm: self.net_open( nm) for (nm, roots) in self.net_roots.items() if len(roots) > 1}
+        self.collect_opens()
 
-        for (nm,s) in tbl.items():
-            if len(s) > 1:
-                self.set_open( nm, (nm,list(s.values())))
+    def scan_order( self, slr):
+        return (self.layer_rank[slr.line.layer], slr.line.rank, slr.pos)
+
+    def net_open( self, nm):
+        """(scan order of its first rect, open) of a net with more than one component"""
+        members = sorted(self.net_members[nm], key=self.scan_order)
+        s = defaultdict(list)
+        for slr in members:
+            s[id(slr.root())].append( (slr.line.layer, slr.rect))
+        return (self.scan_order( members[0]), (nm, list(s.values())))
+
+    def collect_opens( self):
+        self.opens = []
+        for terminal in self.terminal_opens:
+            self.set_open( terminal, terminal)
+        for (_, (nm, opn)) in sorted(self.net_opens.values(), key=lambda p: p[0]):
+            self.set_open( nm, (nm, opn))
 
 
     @staticmethod
@@ -139,9 +208,18 @@ def __init__( self, canvas, *, nets_allowed_to_be_open=None, allow_opens=False):
         self.different_widths = []
         self.shorts = []
         self.opens = []
+        self.via_metals = {}
+        self.via_landings = defaultdict(list)
+        self.unlanded = False
+        self.known_count = 0
+        self.regions = []
+        self.stale = []
+        self.normalized = False
+        self.dirty_layers = set()
         self.subinsts = canvas.subinsts
 
         self.setup_layer_structures()
+        self.layer_rank = {layer: k for (k, layer) in enumerate(self.layers)}
 
         if nets_allowed_to_be_open is None:
             self.nets_allowed_to_be_open = set([])
@@ -178,9 +256,14 @@ def setup_layer_structures( self):
         self.indicesTbl = {'h': ([1, 3], 0), 'v': ([0, 2], 1), '*': ([0, 2], 1)}
 
 
-    def build_centerline_tbl( self):
+    def build_centerline_tbl( self, terminals=None):
+        if terminals is None:
+            if isinstance(self.canvas.terminals, TerminalTable):
+                return self.build_centerline_tbl_columnar()
+            terminals = self.canvas.terminals
+
         tbl = defaultdict(lambda: defaultdict(list))
-        for d in self.canvas.terminals:
+        for d in terminals:
             layer = d['layer']
             rect = d['rect']
             netName = d['netName']
@@ -198,78 +281,184 @@ def build_centerline_tbl( self):
 
         return tbl
 
+    def build_centerline_tbl_columnar( self):
+        terminals = self.canvas.terminals
 
-    def build_scan_lines( self, tbl):
-        skip_layers_for_different_widths = ['Active']
+        for layer in terminals.interners['layer'].values:
+            if layer not in self.skip_layers and layer not in self.layers:
+                for _ in range(int(terminals.mask('layer', layer).sum())):
+                    logger.warning( f"Layer {layer} not in {self.layers}")
 
+        layer_indices = {layer: self.indicesTbl[dir][0] for (layer, dir) in self.layers.items() if layer not in self.skip_layers}
+        buckets = terminals.centerline_buckets(layer_indices)
+
+        rects = terminals.rects.tolist()
+        nets = terminals.interners['netName'].values
+        types = terminals.interners['netType'].values
+        net_codes = terminals.codes('netName').tolist()
+        type_codes = terminals.codes('netType').tolist()
+
+        tbl = defaultdict(lambda: defaultdict(list))
+        for (layer, v) in buckets.items():
+            for (twice_center, rows) in v.items():
+                for row in rows:
+                    if type_codes[row] < 0:
+                        raise KeyError('netType')
+                    netName = nets[net_codes[row]] if net_codes[row] >= 0 else None
+                    netType = types[type_codes[row]]
+                    isPorted = 'pin' in netType
+                    if isPorted:
+                        assert netName != None, f'netName for pin rectange {rects[row]} on layer {layer} is None'
+                    tbl[layer][twice_center].append((rects[row], netName, netType, isPorted))
+
+        return tbl
+
+    def build_scan_lines( self, tbl):
         self.store_scan_lines = defaultdict(dict)
+        self.line_errors = {}
+        self.linked_lines = set()
+        self.stale = []
 
         for (layer, dir) in self.layers.items():
             if layer not in tbl: continue
 
-            (indices, dIndex) = self.indicesTbl[dir]
-
             for (twice_center, v) in tbl[layer].items():
+                self.build_scan_line( layer, twice_center, v)
 
-                different_widths_in_bin = False
-
-                (rect0, _, _, _) = v[0]
-                for (rect, _, _, _) in v[1:]:
-                    if not all(rect[i] == rect0[i] for i in indices):
-                        widths = set()
-                        for (r, _, _, _) in v:
-                            widths.add( r[indices[1]]-r[indices[0]])
-                        if layer not in skip_layers_for_different_widths:
-                            different_widths_in_bin = True
-                            tup = (f"Rectangles on layer {layer} with the same 2x centerline {twice_center} but different widths {widths}:", (indices,v))
-                            #logger.warning( f"{tup}")
-                            self.different_widths.append( tup)
-
-                sl = self.store_scan_lines[layer][twice_center] = Scanline( indices, dIndex)
-
-                current_slr = None
-                for (rect, netName, netType, isPorted) in sorted(v, key=lambda p: p[0][dIndex]):
-                    potential_slr = sl.new_slr_no_add(rect, netName, netType, isPorted=isPorted)
-                    if not sl.isEmpty() and \
-                        rect[dIndex] <= current_slr.rect[dIndex+2] and \
-                        all(rect[i] == current_slr.rect[i] for i in indices):  # continuation
-                        if self.connectPair(layer,current_slr, potential_slr):
-                            if (potential_slr.netType not in ['blockage'] and current_slr.netType not in ['blockage']):
-                                sl.merge_slr(current_slr, potential_slr)
-                            else:
-                                current_slr = sl.add_slr( potential_slr)
-                        else:
-                            current_slr = sl.add_slr( potential_slr)
-                    else:  # empty or gap or different width
-                        current_slr = sl.add_slr( potential_slr)
+    def build_scan_line( self, layer, twice_center, v):
+        self.install_scan_line( layer, twice_center, *self.merge_scan_line( layer, twice_center, v))
 
-                    # invariant (can probably remove current_slr)
-                    assert current_slr == sl.rects[-1]
+    def merge_scan_line( self, layer, twice_center, v):
+        """Merge the (rect, netName, netType, isPorted) tuples v on one scanline, without storing it
 
-                if different_widths_in_bin:
-                    pass
-                    #logger.warning( f"Different widths: {layer} {sl}")
+        Returns the scanline, the scanline rect each of v ended up in, the shorts and different widths
+        found (also added to self.shorts and self.different_widths) and whether rects were connected
+        without being merged (blockages, terminals).
+        """
+        skip_layers_for_different_widths = ['Active']
+
+        (indices, dIndex) = self.indicesTbl[self.layers[layer]]
+
+        (num_shorts, num_different_widths) = (len(self.shorts), len(self.different_widths))
+
+        different_widths_in_bin = False
+
+        (rect0, _, _, _) = v[0]
+        for (rect, _, _, _) in v[1:]:
+            if not all(rect[i] == rect0[i] for i in indices):
+                widths = set()
+                for (r, _, _, _) in v:
+                    widths.add( r[indices[1]]-r[indices[0]])
+                if layer not in skip_layers_for_different_widths:
+                    different_widths_in_bin = True
+                    tup = (f"Rectangles on layer {layer} with the same 2x centerline {twice_center} but different widths {widths}:", (indices,v))
+                    #logger.warning( f"{tup}")
+                    self.different_widths.append( tup)
+
+        sl = Scanline( indices, dIndex, layer)
+
+        into = [None]*len(v)
+        linked = False
+        current_slr = None
+        for k in sorted(range(len(v)), key=lambda k: v[k][0][dIndex]):
+            (rect, netName, netType, isPorted) = v[k]
+            potential_slr = sl.new_slr_no_add(rect, netName, netType, isPorted=isPorted)
+            if not sl.isEmpty() and \
+                rect[dIndex] <= current_slr.rect[dIndex+2] and \
+                all(rect[i] == current_slr.rect[i] for i in indices):  # continuation
+                if self.connectPair(layer,current_slr, potential_slr):
+                    if (potential_slr.netType not in ['blockage'] and current_slr.netType not in ['blockage']):
+                        sl.merge_slr(current_slr, potential_slr)
+                    else:
+                        current_slr = sl.add_slr( potential_slr)
+                        linked = True
+                else:
+                    current_slr = sl.add_slr( potential_slr)
+                    linked = True
+            else:  # empty or gap or different width
+                current_slr = sl.add_slr( potential_slr)
+
+            # invariant (can probably remove current_slr)
+            assert current_slr == sl.rects[-1]
+            into[k] = current_slr
+
+        for (pos, slr) in enumerate(sl.rects):
+            slr.line = sl
+            slr.pos = pos
+        sl.build_index()
+
+        if different_widths_in_bin:
+            pass
+            #logger.warning( f"Different widths: {layer} {sl}")
+
+        return (sl, into, (self.shorts[num_shorts:], self.different_widths[num_different_widths:]), linked)
+
+    def install_scan_line( self, layer, twice_center, sl, into, errors, linked):
+        """Store (or replace) a scanline from merge_scan_line, with what update() needs to know about it"""
+        lines = self.store_scan_lines[layer]
+        old = lines.get(twice_center)
+        sl.rank = len(lines) if old is None else old.rank
+        lines[twice_center] = sl
+
+        # Shorts and different widths found while merging, kept per scanline for incremental updates
+        self.line_errors[(layer, twice_center)] = errors
+        if linked:
+            self.linked_lines.add( (layer, twice_center))
+        else:
+            self.linked_lines.discard( (layer, twice_center))
+
+        # Merged pins keep the netType of the rect they were merged into; generate_rectangles writes 'pin'
+        self.stale.extend( slr for slr in sl.rects if slr.isPorted and slr.netType != 'pin')
 
     def check_shorts_induced_by_vias( self):
 
+        # (vertical scanline, metal, horizontal scanline, metal) touching each via; reused by update()
+        # as long as both scanlines are the same (not rebuilt) objects
+        via_metals = {}
+        self.via_landings = defaultdict(list)
+        self.unlanded = False
         for (via, (mv,mh)) in self.canvas.layer_stack:
             if via in self.store_scan_lines:
                 for (twice_center, via_scan_line) in self.store_scan_lines[via].items():
                     assert mv is not None, "PLEASE IMPLEMENT ME !"
                     if twice_center not in self.store_scan_lines[mv]:
                         logger.warning( f"{twice_center} not in self.store_scan_lines[{mv}]. Skipping...")
+                        self.unlanded = True
                         continue
                     metal_scan_line_vertical = self.store_scan_lines[mv][twice_center]
                     for via_rect in via_scan_line.rects:
-                        metal_rect_v = metal_scan_line_vertical.find_touching(via_rect)
                         twice_center_y = via_rect.rect[1] + via_rect.rect[3]
+                        metal_scan_line_horizontal = self.store_scan_lines[mh][twice_center_y] if mh is not None else None
+                        cached = self.via_metals.get(via_rect)
+                        if cached is not None and cached[0] is metal_scan_line_vertical and cached[2] is metal_scan_line_horizontal:
+                            (_, metal_rect_v, _, metal_rect_h) = cached
+                        else:
+                            metal_rect_v = metal_scan_line_vertical.find_touching(via_rect)
+                            metal_rect_h = metal_scan_line_horizontal.find_touching(via_rect) if mh is not None else None
+                        via_metals[via_rect] = (metal_scan_line_vertical, metal_rect_v, metal_scan_line_horizontal, metal_rect_h)
+                        self.via_landings[(mv, twice_center)].append( via_rect)
+                        if mh is not None:
+                            self.via_landings[(mh, twice_center_y)].append( via_rect)
                         if mh is not None:
-                            metal_scan_line_horizontal = self.store_scan_lines[mh][twice_center_y]
-                            metal_rect_h = metal_scan_line_horizontal.find_touching(via_rect)
                             self.connectPair( via, metal_rect_v.root(), via_rect.root())
                             self.connectPair( via, via_rect.root(), metal_rect_h.root())
                         else:
                             self.connectPair( via, metal_rect_v.root(), via_rect.root())
+        self.via_metals = via_metals
+
+    def find_slr( self, layer, rect):
+        """The scanline rect that rect (one of the canvas terminals) ended up in"""
+        (indices, dIndex) = self.indicesTbl[self.layers[layer]]
+        sl = self.store_scan_lines[layer].get(rect[indices[0]] + rect[indices[1]])
+        return None if sl is None else sl.find_covering(rect[dIndex])
+
+    def connect_known( self):
+        self.known_count = len(self.canvas.known_connections)
+        for group in self.canvas.known_connections:
+            slrs = [(layer, self.find_slr( layer, rect)) for (layer, rect) in group if layer in self.layers]
+            for ((la, a), (lb, b)) in zip(slrs, slrs[1:]):
+                assert a is not None and b is not None, (la, lb)
+                self.connectPair( f'{la}/{lb}', a.root(), b.root())
 
     def check_shorts_induced_by_terminals( self):
         for instance, v in self.subinsts.items():
@@ -303,9 +492,7 @@ def generate_rectangles( self):
         #
         # Write out regions
         #
-        for d in self.canvas.terminals:
-            if d['layer'] in self.skip_layers:
-                terminals.append( d)
+        terminals.extend( self.regions)
         #
         # Write out the rectangles stored in the scan line data structure
         #
@@ -323,11 +510,244 @@ def generate_rectangles( self):
 
     def remove_duplicates( self, silence_errors=False):
 
+        self.regions = [d if isinstance(d, dict) else dict(d) for d in self.canvas.terminals if d['layer'] in self.skip_layers]
         self.build_scan_lines( self.build_centerline_tbl())
+        self.dirty_layers = set(self.store_scan_lines) | {d['layer'] for d in self.regions}
+
+        return self.check_connectivity(silence_errors=silence_errors)
+
+    def update( self, terminals, removed=(), silence_errors=False):
+        """Add terminals (already appended to the canvas) and drop removed ones without rebuilding everything
+
+        Equivalent to running remove_duplicates again on the rectangles generated last time plus the
+        new terminals, minus the removed ones (which must be among the generated rectangles). Only the
+        scanlines they fall on are merged again. dirty_layers is set to the layers that changed.
+
+        If the last result has no shorts, different widths or terminals and the new terminals are
+        named, the new rects are connected to the existing components and only their nets are checked
+        for opens (merge_connected). Otherwise the connectivity of all scanlines is reset and checked
+        again (update_all).
+        """
+        regions = [d if isinstance(d, dict) else dict(d) for d in terminals if d['layer'] in self.skip_layers]
+        tbl = self.build_centerline_tbl(terminals)
+
+        self.dirty_layers = {d['layer'] for d in terminals} | {d['layer'] for d in removed}
+        for slr in self.stale:
+            slr.netType = 'pin'
+            self.dirty_layers.add( slr.line.layer)
+        self.stale = []
+
+        self.regions.extend( regions)
+        for d in removed:
+            if d['layer'] in self.skip_layers:
+                k = next((k for (k, r) in enumerate(self.regions) if r is d), None)
+                if k is None:
+                    k = self.regions.index( d if isinstance(d, dict) else dict(d))
+                del self.regions[k]
+
+        if not removed and self.merge_connected( tbl):
+            self.log_errors(silence_errors=silence_errors)
+            return self.generate_rectangles()
+
+        return self.update_all( tbl, removed, silence_errors=silence_errors)
+
+    def update_all( self, tbl, removed, silence_errors=False):
+        rm = defaultdict(list)
+        for (layer, v) in self.build_centerline_tbl(removed).items():
+            for (twice_center, rects) in v.items():
+                rm[(layer, twice_center)].extend( (rect, netName, netType) for (rect, netName, netType, _) in rects)
+
+        # Reset the connectivity as a rebuild from generate_rectangles() output would
+        slrs = [slr for vv in self.store_scan_lines.values() for sl in vv.values() for slr in sl.rects]
+        names = [(slr.netName, slr.root().netName) for slr in slrs]
+        for (slr, (_, netName)) in zip(slrs, names):
+            slr.dad = slr
+            slr.netName = netName
+            slr.terminal = None
+            if slr.isPorted:
+                slr.netType = 'pin'
+
+        # Scanlines that had shorts, different widths or unmerged connections are merged again too, so their errors are up to date
+        dirty = {(layer, twice_center): None for (layer, v) in tbl.items() for twice_center in v}
+        dirty.update( (key, None) for key in rm)
+        dirty.update( (key, None) for (key, errors) in self.line_errors.items() if any(errors))
+        dirty.update( (key, None) for key in self.linked_lines)
+        for (layer, twice_center) in dirty:
+            sl = self.store_scan_lines[layer].get(twice_center)
+            old = [] if sl is None else [(slr.rect, slr.netName, slr.netType, 'pin' in slr.netType) for slr in sl.rects]
+            for d in rm.get((layer, twice_center), ()):
+                # The generated rects share their rect lists with the scanline rects: equal ones can be told apart
+                k = next((k for (k, t) in enumerate(old) if t[0] is d[0]), None)
+                if k is None:
+                    k = next((k for (k, t) in enumerate(old) if t[:3] == (list(d[0]), d[1], d[2])), None)
+                assert k is not None, f'Removed rect {d} on layer {layer} is not in the last result'
+                del old[k]
+            if sl is not None and not old:
+                # A rebuild would add it after the scanlines that are left, if anything is added to it
+                del self.store_scan_lines[layer][twice_center]
+                del self.line_errors[(layer, twice_center)]
+                self.linked_lines.discard( (layer, twice_center))
+            v = old + tbl.get(layer, {}).get(twice_center, [])
+            if v:
+                self.build_scan_line( layer, twice_center, v)
+
+        # Keep the layer and scanline order of a full rebuild
+        order = [layer for layer in self.layers if self.store_scan_lines.get(layer)]
+        order += [layer for layer in self.store_scan_lines if layer not in order]
+        self.store_scan_lines = defaultdict(dict, ((layer, self.store_scan_lines[layer]) for layer in order))
+        for vv in self.store_scan_lines.values():
+            for (rank, sl) in enumerate(vv.values()):
+                sl.rank = rank
+
+        self.shorts = []
+        self.different_widths = []
+        for (layer, vv) in self.store_scan_lines.items():
+            for twice_center in vv:
+                (shorts, different_widths) = self.line_errors[(layer, twice_center)]
+                self.shorts.extend(shorts)
+                self.different_widths.extend(different_widths)
+
+        rects = self.check_connectivity(silence_errors=silence_errors)
+
+        self.dirty_layers.update( layer for (layer, _) in dirty)
+        self.dirty_layers.update( slr.line.layer for (slr, names) in zip(slrs, names) if (slr.netName, slr.root().netName) != names)
+        return rects
+
+    def merge_connected( self, tbl):
+        """update() keeping the connectivity, when the last result is clean and the new terminals are named
+
+        The rects of the scanlines merged again stay in the union-find structure, connected to the
+        rects they ended up in; new vias are connected to their metals and the nets on these
+        scanlines are checked for opens. Returns False, changing nothing, if that wouldn't give the
+        result of update_all (e.g. a new short or a via landing elsewhere).
+        """
+        if not self.normalized or self.shorts or self.different_widths or self.linked_lines or self.unlanded or \
+           self.known_count != len(self.canvas.known_connections) or any(v.pins for v in self.subinsts.values()):
+            return False
+        if any(netName is None or ':' in netName or netType == 'blockage'
+               for v in tbl.values() for vv in v.values() for (_, netName, netType, _) in vv):
+            return False
+
+        lines = []
+        for (layer, v) in tbl.items():
+            for (twice_center, new) in v.items():
+                sl = self.store_scan_lines.get(layer, {}).get(twice_center)
+                old = [] if sl is None else sl.rects
+                merged = self.merge_scan_line( layer, twice_center, [(slr.rect, slr.netName, slr.netType, slr.isPorted) for slr in old] + new)
+                lines.append( (layer, twice_center, sl, merged))
+
+        if self.shorts or self.different_widths or any(linked for (_, _, _, (_, _, _, linked)) in lines):
+            self.shorts = []
+            self.different_widths = []
+            return False
+
+        # The rects merged again, by the rect they ended up in; they must not rename their components
+        successors = {}
+        for (_, _, sl, (_, into, _, _)) in lines:
+            if sl is not None:
+                for (slr, successor) in zip(sl.rects, into):
+                    if slr.root().netName != successor.netName:
+                        return False
+                    successors[slr] = successor
+
+        new_lines = {(layer, twice_center): merged[0] for (layer, twice_center, _, merged) in lines}
+        def scan_line( layer, twice_center):
+            sl = new_lines.get((layer, twice_center))
+            return self.store_scan_lines.get(layer, {}).get(twice_center) if sl is None else sl
+
+        # Vias on the scanlines merged again land as they would after a reset
+        layer_stack = dict(self.canvas.layer_stack)
+        via_metals = {}
+        for (layer, twice_center, _, (sl, _, _, _)) in lines:
+            if layer not in layer_stack:
+                continue
+            (mv, mh) = layer_stack[layer]
+            metal_scan_line_vertical = scan_line( mv, twice_center) if mv is not None else None
+            if metal_scan_line_vertical is None:
+                return False
+            for via_rect in sl.rects:
+                metal_scan_line_horizontal = scan_line( mh, via_rect.rect[1] + via_rect.rect[3]) if mh is not None else None
+                if mh is not None and metal_scan_line_horizontal is None:
+                    return False
+                metal_rect_v = metal_scan_line_vertical.first_touching( via_rect)
+                metal_rect_h = metal_scan_line_horizontal.first_touching( via_rect) if mh is not None else None
+                if metal_rect_v is None or (mh is not None and metal_rect_h is None):
+                    return False
+                if any(m.root().netName != via_rect.netName for m in (metal_rect_v, metal_rect_h) if m is not None):
+                    return False
+                via_metals[via_rect] = (metal_scan_line_vertical, metal_rect_v, metal_scan_line_horizontal, metal_rect_h)
+
+        # Vias landing on the scanlines merged again must still land on the rects their metals ended up in
+        for (layer, twice_center, sl, (new_sl, _, _, _)) in lines:
+            if sl is None:
+                continue
+            for via_rect in self.via_landings.get((layer, twice_center), ()):
+                if via_rect not in self.via_metals or via_rect in successors:
+                    continue
+                (msv, mrv, msh, mrh) = via_metals.get(via_rect, self.via_metals[via_rect])
+                if msv is sl:
+                    (msv, mrv) = (new_sl, successors[mrv])
+                    landed = mrv
+                else:
+                    (msh, mrh) = (new_sl, successors[mrh])
+                    landed = mrh
+                if new_sl.first_touching( via_rect) is not landed:
+                    return False
+                via_metals[via_rect] = (msv, mrv, msh, mrh)
+
+        for (layer, twice_center, sl, merged) in lines:
+            self.install_scan_line( layer, twice_center, *merged)
+        for (slr, successor) in successors.items():
+            successor.connect( slr)
+            self.via_metals.pop( slr, None)
+        for (via_rect, (msv, mrv, msh, mrh)) in via_metals.items():
+            if via_rect not in self.via_metals:
+                via_rect.connect( mrv)
+                self.via_landings[(msv.layer, via_rect.rect[0] + via_rect.rect[2])].append( via_rect)
+                if mrh is not None:
+                    via_rect.connect( mrh)
+                    self.via_landings[(msh.layer, via_rect.rect[1] + via_rect.rect[3])].append( via_rect)
+            self.via_metals[via_rect] = (msv, mrv, msh, mrh)
+
+        if any(layer not in self.layer_rank for layer in self.store_scan_lines) or \
+           list(self.store_scan_lines) != sorted(self.store_scan_lines, key=self.layer_rank.get):
+            order = [layer for layer in self.layers if self.store_scan_lines.get(layer)]
+            order += [layer for layer in self.store_scan_lines if layer not in order]
+            self.store_scan_lines = defaultdict(dict, ((layer, self.store_scan_lines[layer]) for layer in order))
+
+        # Only the nets on the scanlines merged again can have fewer components
+        nets = set()
+        for (_, _, sl, (new_sl, _, _, _)) in lines:
+            for slr in ([] if sl is None else sl.rects):
+                if slr.netName is not None:
+                    del self.net_members[slr.netName][slr]
+            for slr in new_sl.rects:
+                if slr.netName is not None:
+                    self.net_members[slr.netName][slr] = None
+                    self.net_roots[slr.netName].add( slr)
+                    nets.add( slr.netName)
+        for nm in nets:
+            roots = self.net_roots[nm] = {root.root() for root in self.net_roots[nm]}
+            if len(roots) > 1:
+                self.net_opens[nm] = self.net_open( nm)
+            else:
+                self.net_opens.pop( nm, None)
+        self.collect_opens()
+
+        self.dirty_layers.update( layer for (layer, _, _, _) in lines)
+        return True
+
+    def check_connectivity( self, silence_errors=False):
 
         self.check_shorts_induced_by_vias()
+        self.connect_known()
         self.check_shorts_induced_by_terminals()
         self.check_opens()
+        self.log_errors(silence_errors=silence_errors)
+
+        return self.generate_rectangles()
+
+    def log_errors( self, silence_errors=False):
 
         # Trying fewer error messages
         if True:
@@ -346,6 +766,3 @@ def remove_duplicates( self, silence_errors=False):
 
         for subinst in self.subinsts:
             logger.debug("SUBINST" + pprint.pformat(subinst))
-
-        return self.generate_rectangles()
-
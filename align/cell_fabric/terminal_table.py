@@ -0,0 +1,282 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Interner:
+    """Map hashable values (layer names, net names, net types) to dense integer codes"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def __len__(self):
+        return len(self.values)
+
+    def copy(self):
+        result = Interner()
+        result.values = self.values.copy()
+        result.codes = self.codes.copy()
+        return result
+
+
+class RectRef(list):
+    """A rect list that writes element assignments through to its TerminalTable row"""
+
+    def __init__(self, table, row):
+        super().__init__(table._rects[row].tolist())
+        self._table = table
+        self._row = row
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._table._rects[self._row] = list(self)
+
+
+class TerminalView(MutableMapping):
+    """List-of-dicts compatible view of a single row of a TerminalTable"""
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        t = self._table
+        if key == 'rect':
+            return RectRef(t, self._row)
+        if key in TerminalTable.CODED_KEYS:
+            c = t._codes[key][self._row]
+            if c < 0:
+                raise KeyError(key)
+            return t.interners[key].values[c]
+        return t._extras[self._row][key]
+
+    def __setitem__(self, key, value):
+        t = self._table
+        if key == 'rect':
+            t._rects[self._row] = value
+        elif key in TerminalTable.CODED_KEYS:
+            t._codes[key][self._row] = t.interners[key].code(value)
+        else:
+            t._extras.setdefault(self._row, {})[key] = value
+
+    def __delitem__(self, key):
+        t = self._table
+        if key == 'rect':
+            raise KeyError('Cannot delete rect of a TerminalTable row')
+        if key in TerminalTable.CODED_KEYS:
+            if t._codes[key][self._row] < 0:
+                raise KeyError(key)
+            t._codes[key][self._row] = -1
+        else:
+            del t._extras[self._row][key]
+
+    def __iter__(self):
+        t = self._table
+        for key in TerminalTable.CODED_KEYS:
+            if t._codes[key][self._row] >= 0:
+                yield key
+        yield 'rect'
+        yield from t._extras.get(self._row, {})
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TerminalTable:
+    """Columnar store for Canvas terminals
+
+    Rects are kept in an (n, 4) int64 array and layer / netName / netType in interned int32 code
+    arrays (-1 marks a missing key); any other keys (terminal, color, pin, ...) are kept per row.
+    Iterating (or indexing) returns TerminalView objects that behave like the usual terminal dicts,
+    so code written against the list-of-dicts representation keeps working.
+    """
+
+    CODED_KEYS = ('layer', 'netName', 'netType')
+
+    def __init__(self, terminals=None):
+        self._n = 0
+        self._rects = np.zeros((0, 4), dtype=np.int64)
+        self._codes = {key: np.zeros(0, dtype=np.int32) for key in self.CODED_KEYS}
+        self._extras = {}
+        self.interners = {key: Interner() for key in self.CODED_KEYS}
+        if terminals is not None:
+            self.extend(terminals)
+
+    @classmethod
+    def from_list(cls, terminals):
+        return cls(terminals)
+
+    def to_list(self):
+        return [dict(v) for v in self]
+
+    def _reserve(self, n):
+        capacity = self._rects.shape[0]
+        if n <= capacity:
+            return
+        capacity = max(n, 2*capacity, 16)
+        rects = np.zeros((capacity, 4), dtype=np.int64)
+        rects[:self._n] = self._rects[:self._n]
+        self._rects = rects
+        for key in self.CODED_KEYS:
+            codes = np.full(capacity, -1, dtype=np.int32)
+            codes[:self._n] = self._codes[key][:self._n]
+            self._codes[key] = codes
+
+    def append(self, d):
+        self._reserve(self._n+1)
+        row = self._n
+        self._n += 1
+        rect = d['rect']
+        if not all(float(c).is_integer() for c in rect):
+            raise ValueError(f'Terminal rect {rect} is not integral')
+        self._rects[row] = rect
+        for key in self.CODED_KEYS:
+            self._codes[key][row] = self.interners[key].code(d[key]) if key in d else -1
+        extras = {k: v for k, v in d.items() if k != 'rect' and k not in self.CODED_KEYS}
+        if extras:
+            self._extras[row] = extras
+
+    def extend(self, terminals):
+        if isinstance(terminals, TerminalTable):
+            terminals = terminals.to_list()
+        else:
+            terminals = list(terminals)
+        self._reserve(self._n+len(terminals))
+        for d in terminals:
+            self.append(d)
+
+    def copy(self):
+        return self.take()
+
+    def freeze(self):
+        """Make the arrays read-only, for a table that is shared (users take() a copy to modify)"""
+        self._rects.setflags(write=False)
+        for key in self.CODED_KEYS:
+            self._codes[key].setflags(write=False)
+
+    def take(self, rows=None):
+        """New table with the given rows (indices or boolean mask; all rows if None), in that order
+
+        The arrays are copied; the per row dicts of the other keys are copied shallowly.
+        """
+        rows = np.arange(self._n) if rows is None else np.arange(self._n)[rows]
+        result = TerminalTable()
+        result._n = len(rows)
+        result._rects = self.rects[rows].copy()
+        for key in self.CODED_KEYS:
+            result._codes[key] = self.codes(key)[rows].copy()
+            result.interners[key] = self.interners[key].copy()
+        result._extras = {k: dict(self._extras[i]) for (k, i) in enumerate(rows.tolist()) if i in self._extras}
+        return result
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [TerminalView(self, i) for i in range(*idx.indices(self._n))]
+        if idx < 0:
+            idx += self._n
+        if not 0 <= idx < self._n:
+            raise IndexError(idx)
+        return TerminalView(self, idx)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield TerminalView(self, i)
+
+    @property
+    def rects(self):
+        return self._rects[:self._n]
+
+    def codes(self, key):
+        return self._codes[key][:self._n]
+
+    def mask(self, key, value):
+        """Boolean mask of the rows whose key equals value"""
+        c = self.interners[key].codes.get(value)
+        if c is None:
+            return np.zeros(self._n, dtype=bool)
+        return self.codes(key) == c
+
+    def bbox(self):
+        if self._n == 0:
+            return None
+        r = self.rects
+        return [int(r[:, 0].min()), int(r[:, 1].min()), int(r[:, 2].max()), int(r[:, 3].max())]
+
+    def off_grid(self, *, mul=1, div=1):
+        """Indices of the rows whose rect scaled by mul isn't a multiple of div"""
+        return np.nonzero(((mul*self.rects) % div != 0).any(axis=1))[0]
+
+    def scale(self, *, mul=1, div=1):
+        """Scale all rects by mul/div (floor division)"""
+        r = self.rects
+        r *= mul
+        r //= div
+
+    def transform(self, tr):
+        """Apply transformation.Transformation tr to all rects, keeping them canonical"""
+        r = self.rects
+        r[:, 0::2] = tr.sX*r[:, 0::2] + tr.oX
+        r[:, 1::2] = tr.sY*r[:, 1::2] + tr.oY
+        lo = np.minimum(r[:, 0:2], r[:, 2:4])
+        hi = np.maximum(r[:, 0:2], r[:, 2:4])
+        r[:, 0:2] = lo
+        r[:, 2:4] = hi
+
+    def rename(self, key, func):
+        """Replace every interned value v of key by func(v) (once per distinct value, not per row)"""
+        old = self.interners[key]
+        new = Interner()
+        remap = np.array([new.code(func(v)) for v in old.values] + [-1], dtype=np.int32)
+        codes = self.codes(key)
+        codes[:] = remap[codes]
+        self.interners[key] = new
+
+    def centerline_buckets(self, layer_indices):
+        """Bucket rows by (layer, twice centerline)
+
+        layer_indices maps layer name to the pair of rect indices whose sum is the twice centerline.
+        Returns {layer: {twice_center: [row, ...]}} with layers, centerlines and rows all in order of
+        first appearance, i.e. exactly what a sequential walk over the terminals would produce.
+        """
+        layer_codes = self.codes('layer')
+        i0 = np.zeros(len(self.interners['layer']), dtype=np.int64)
+        i1 = np.zeros(len(self.interners['layer']), dtype=np.int64)
+        known = np.zeros(len(self.interners['layer'])+1, dtype=bool)
+        for layer, (a, b) in layer_indices.items():
+            c = self.interners['layer'].codes.get(layer)
+            if c is not None:
+                i0[c], i1[c], known[c] = a, b, True
+
+        rows = np.nonzero(known[layer_codes])[0]
+        lc = layer_codes[rows]
+        tc = self.rects[rows, i0[lc]] + self.rects[rows, i1[lc]]
+
+        order = np.lexsort((rows, tc, lc))
+        lc, tc, rows = lc[order], tc[order], rows[order]
+        starts = np.nonzero(np.r_[True, (lc[1:] != lc[:-1]) | (tc[1:] != tc[:-1])])[0]
+        ends = np.r_[starts[1:], len(rows)]
+
+        result = {}
+        for s, e in sorted(zip(starts.tolist(), ends.tolist()), key=lambda p: rows[p[0]]):
+            layer = self.interners['layer'].values[lc[s]]
+            result.setdefault(layer, {})[int(tc[s])] = rows[s:e].tolist()
+        return result
@@ -63,6 +63,12 @@ def __init__(self, *args, **kwargs):
                             "--extract",
                             action='store_true',
                             help='Set to true to extract post-layout netlist')
+        parser.add_argument("--pex_reduce",
+                            action='store_true',
+                            help='With -x, write the extracted netlist as a reduced RC network (series resistors merged, one capacitor per node)')
+        parser.add_argument("--hierarchical_check",
+                            action='store_true',
+                            help='Check only the interactions of placed blocks with the routes of each level instead of the flattened layout (not with -x)')
         # parser.add_argument( "-g", "--generate",
         #                     action='store_true',
         #                     help="Set the true to generate png")
@@ -114,6 +120,15 @@ def __init__(self, *args, **kwargs):
                             action='store_true',
                             help='Don\'t generate GDS files.')
 
+        parser.add_argument('--no_python_gds_json',
+                            dest='python_gds_json',
+                            action='store_false',
+                            help='Don\'t write the <variant>.python.gds.json files; the python GDS is written directly from the layout.')
+
+        parser.add_argument('--gdsii',
+                            action='store_true',
+                            help='Convert the gds.json files to GDS with python-gdsii (the previous, slower converter) instead of the streaming writer.')
+
         parser.add_argument('--lambda_coeff',
                             type=float,
                             default=1.0,
@@ -145,6 +160,65 @@ def __init__(self, *args, **kwargs):
                             default=10000,
                             help="Iterations used by the placer's SA algorithm.")
 
+        parser.add_argument('--placer_jobs',
+                            type=int,
+                            default=1,
+                            help='Number of independent hierarchy nodes placed concurrently.')
+
+        parser.add_argument('--placer_seeds',
+                            type=int,
+                            default=1,
+                            help='Number of SA placer runs per hierarchy node, with seeds seed, seed+1, ...; the best layouts by cost are kept. The runs share a thread pool, so they only overlap while the C++ placer releases the GIL (the analytical placer runs one at a time).')
+
+        parser.add_argument('--placer_threads',
+                            type=int,
+                            default=1,
+                            help="Number of SA trials of the placer evaluated concurrently at each step (threads per placer run). Each trial of a batch uses one iteration of the annealing budget, but a batch accepts at most one move.")
+
+        parser.add_argument('--placer_sa_adaptive',
+                            action='store_true',
+                            help='Drive the SA cooling of the placer by the acceptance ratio and stop once the best cost stops improving (see --placer_sa_stall).')
+
+        parser.add_argument('--placer_sa_stall',
+                            type=int,
+                            default=1000,
+                            help='With --placer_sa_adaptive, number of SA trials without improvement of the best cost after which the placer stops.')
+
+        parser.add_argument('--placer_sa_block_iterations',
+                            type=int,
+                            default=None,
+                            help='SA iterations per block of a hierarchy node; the budget of a node is the smaller of this times its blocks and --placer_sa_iterations.')
+
+        parser.add_argument('--placer_cache',
+                            type=str,
+                            default=None,
+                            help='SQLite file caching the SA evaluations of the placer, shared by runs (and processes) placing the same hierarchy nodes with the same ILP settings (including --lambda_coeff, which changes the ILP solutions).')
+
+        parser.add_argument('--placer_cache_size',
+                            type=int,
+                            default=None,
+                            help='Size limit (in MB) of the placer cache; evaluations of the least recently placed nodes are evicted beyond it.')
+
+        parser.add_argument('--router_jobs',
+                            type=int,
+                            default=1,
+                            help='Number of placements routed concurrently, each in its own process and directory (allows --nroutings > 1).')
+
+        parser.add_argument('--primitive_jobs',
+                            type=int,
+                            default=1,
+                            help='Number of processes used to generate primitives in parallel.')
+
+        parser.add_argument('--primitive_cache',
+                            type=str,
+                            default=None,
+                            help='Directory of a cache of generated primitives, reused when the parameters, PDK and generators are unchanged.')
+
+        parser.add_argument('--primitive_cache_size',
+                            type=int,
+                            default=None,
+                            help='Size limit (in MB) of the primitive cache; least recently used entries are evicted beyond it.')
+
         parser.add_argument('--seed',
                             type=int,
                             default=0,
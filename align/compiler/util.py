@@ -12,9 +12,12 @@
 from flatdict import FlatDict
 import importlib
 import sys
+import threading
 
 logger = logging.getLogger(__name__)
 
+_generator_lock = threading.RLock()
+
 
 def get_next_level(subckt, G, tree_l1):
     """get_next_level traverse graph and get next connected element
@@ -232,19 +235,22 @@ def _find_generator_class(module, name):
             res = getattr(module, name, False) or getattr(module, name.lower(), False)
             return res
 
-    try:  # is pdk an installed module
-        module = importlib.import_module(pdk_dir_stem)
-        return _find_generator_class(module, name)
-    except ImportError:
-        init_file = pdk_dir_path / '__init__.py'
-        if init_file.is_file():  # is pdk a package
-            spec = importlib.util.spec_from_file_location(pdk_dir_stem, pdk_dir_path / '__init__.py')
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[pdk_dir_stem] = module
-            spec.loader.exec_module(module)
+    # The module is registered in sys.modules before it is executed;
+    # don't let another thread pick it up half initialized
+    with _generator_lock:
+        try:  # is pdk an installed module
+            module = importlib.import_module(pdk_dir_stem)
             return _find_generator_class(module, name)
-        else:  # is pdk old school (backward compatibility)
-            spec = importlib.util.spec_from_file_location("primitive", pdkdir / 'primitive.py')
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            return getattr(module, name, False) or getattr(module, name.lower(), False)
+        except ImportError:
+            init_file = pdk_dir_path / '__init__.py'
+            if init_file.is_file():  # is pdk a package
+                spec = importlib.util.spec_from_file_location(pdk_dir_stem, pdk_dir_path / '__init__.py')
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[pdk_dir_stem] = module
+                spec.loader.exec_module(module)
+                return _find_generator_class(module, name)
+            else:  # is pdk old school (backward compatibility)
+                spec = importlib.util.spec_from_file_location("primitive", pdkdir / 'primitive.py')
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                return getattr(module, name, False) or getattr(module, name.lower(), False)
@@ -1,20 +1,21 @@
 #!/usr/bin/env python
 
 import gdspy
+import io
 import json
 import argparse
 import os
 import shutil
 
 from align.gdsconv.gds2json import convert_GDS_GDSjson
+from align.gdsconv.gds_reader import GDSReader
 
 
 class GDS2_LEF_JSON:
     def __init__(self, layerfile, gdsfile, name):
         (self._layers, self._layernames) = self.readLayerInfo(layerfile)
-        self._cell     = self.readGDS(gdsfile)
+        self._cell     = self.readGDS(gdsfile, name)
         self._cellname = name if name else (self._cell.name if self._cell else gdsfile[(gdsfile.find('/') + 1):gdsfile.find('.gds')])
-        self._units    = gdspy.get_gds_units(gdsfile)[1]
         self._gdsfile  = gdsfile
 
     def readLayerInfo(self, layerfile):
@@ -35,13 +36,19 @@ def readLayerInfo(self, layerfile):
                         layers[layer] = glno2
         return (layers, layernames)
     
-    def readGDS(self, gdsfile):
+    def readGDS(self, gdsfile, name=None):
         cell = None
         if not os.path.isfile(gdsfile):
             print(f'leaf {gdsfile} not found')
             exit()
-        lib = gdspy.GdsLibrary(infile=gdsfile)
-        cell = lib.top_level()[0]
+        # Only the cell (named name, else the first top level cell) and the cells below it are handed to gdspy
+        with GDSReader(gdsfile) as reader:
+            self._units = reader.units[1]
+            tops = reader.top_level()
+            self._top = name if name in reader else (tops[0] if tops else None)
+            if self._top is None: return cell
+            lib = gdspy.GdsLibrary(infile=io.BytesIO(reader.extract(self._top)))
+        cell = lib.cells[self._top]
         cell.flatten()
         return cell
     
@@ -129,7 +136,7 @@ def writeLEFJSON(self, outdir):
          #print(f'Writing PLACEMENT_LEF file : {plleffile}')
         shutil.copy(outdir + leffile, outdir + plleffile)
          #print(f'Writing GDS.JSON file : {self._cellname}.gds.json')
-        convert_GDS_GDSjson(self._gdsfile, outdir + self._cellname + '.gds.json')
+        convert_GDS_GDSjson(self._gdsfile, outdir + self._cellname + '.gds.json', top=self._top)
          #print('--')
 
 if __name__ == '__main__':
@@ -0,0 +1,243 @@
+"""Memory mapped GDSII reader
+
+Opening a library only walks the record headers to build an index of the structures (byte range
+and referenced cells of each STRNAME); elements are decoded when a cell is asked for, with XY as
+NumPy int32 arrays of shape (n, 2). Reading one cell of a large library therefore does not pay
+for decoding (or holding) the others. to_json() gives the same dict as gds2json produced with
+python-gdsii.
+"""
+
+import math
+import mmap
+import struct
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+_names = ['HEADER', 'BGNLIB', 'LIBNAME', 'UNITS', 'ENDLIB', 'BGNSTR', 'STRNAME', 'ENDSTR',
+          'BOUNDARY', 'PATH', 'SREF', 'AREF', 'TEXT', 'LAYER', 'DATATYPE', 'WIDTH',
+          'XY', 'ENDEL', 'SNAME', 'COLROW', 'TEXTNODE', 'NODE', 'TEXTTYPE', 'PRESENTATION',
+          'SPACING', 'STRING', 'STRANS', 'MAG', 'ANGLE', 'UINTEGER', 'USTRING', 'REFLIBS',
+          'FONTS', 'PATHTYPE', 'GENERATIONS', 'ATTRTABLE', 'STYPTABLE', 'STRTYPE', 'ELFLAGS', 'ELKEY',
+          'LINKTYPE', 'LINKKEYS', 'NODETYPE', 'PROPATTR', 'PROPVALUE', 'BOX', 'BOXTYPE', 'PLEX',
+          'BGNEXTN', 'ENDEXTN', 'TAPENUM', 'TAPECODE', 'STRCLASS', 'RESERVED', 'FORMAT', 'MASK',
+          'ENDMASKS', 'LIBDIRSIZE', 'SRFNAME', 'LIBSECUR']
+
+_ELEMENTS = {'BOUNDARY', 'PATH', 'SREF', 'AREF', 'TEXT', 'NODE', 'BOX'}
+
+# record numbers (high byte of the tag)
+_ENDLIB = 0x04
+_BGNSTR = 0x05
+_STRNAME = 0x06
+_ENDSTR = 0x07
+_XY = 0x10
+_ENDEL = 0x11
+_SNAME = 0x12
+
+# data types (low byte of the tag)
+_NODATA = 0x00
+_BITARRAY = 0x01
+_INT2 = 0x02
+_INT4 = 0x03
+_REAL8 = 0x05
+_ASCII = 0x06
+
+_header = struct.Struct('>HH')
+
+
+def record_name(rectype):
+    return _names[rectype] if rectype < len(_names) else f'0x{rectype:02x}'
+
+
+def real8_to_float(num):
+    """Python float of a GDSII excess-64, base-16 REAL8 given as an unsigned 64 bit int"""
+    sign = -1 if num & 0x8000000000000000 else 1
+    exp = (num >> 56) & 0x7f
+    mant = num & 0x00ffffffffffffff
+    return math.ldexp(sign * mant, 4 * (exp - 64) - 56)
+
+
+def _ascii(data):
+    if data[-1:] == b'\0':
+        data = data[:-1]
+    return data.decode()
+
+
+def _value(data_type, data):
+    """gds.json value of a record: a scalar for a single number, a list for several"""
+    if data_type == _ASCII:
+        return _ascii(data)
+    elif data_type == _BITARRAY:
+        return struct.unpack('>H', data)[0]
+    elif data_type == _INT2:
+        values = struct.unpack(f'>{len(data) // 2}h', data)
+    elif data_type == _INT4:
+        values = struct.unpack(f'>{len(data) // 4}l', data)
+    elif data_type == _REAL8:
+        values = [real8_to_float(v) for v in struct.unpack(f'>{len(data) // 8}Q', data)]
+    else:
+        raise ValueError(f'Unsupported GDS data type {data_type:#04x}')
+    return list(values) if len(values) > 1 else values[0]
+
+
+class GDSReader:
+    """Lazily decoded GDSII library
+
+    structures maps each STRNAME to the (begin, end) byte range of its BGNSTR ... ENDSTR records;
+    references maps it to the cells it instantiates (SREF/AREF) in order of first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self.structures = {}
+        self.references = {}
+        try:
+            self._index()
+        except ValueError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def __contains__(self, name):
+        return name in self.structures
+
+    def _records(self, begin, end):
+        """(rectype, data type, payload begin, payload end) of the records in [begin, end)"""
+        mm = self._mm
+        pos = begin
+        while pos < end:
+            length, tag = _header.unpack_from(mm, pos)
+            if length < 4:
+                raise ValueError(f'Corrupt GDS record at offset {pos} of {self.path}')
+            yield tag >> 8, tag & 0xff, pos + 4, pos + length
+            pos += length
+
+    def _index(self):
+        # the hot loop of opening a library: only record headers, STRNAME and SNAME are looked at
+        mm = self._mm
+        unpack_from = _header.unpack_from
+        self._lib_end = None
+        name = begin = refs = None
+        pos, size = 0, len(mm)
+        while pos < size:
+            length, tag = unpack_from(mm, pos)
+            if length < 4:
+                raise ValueError(f'Corrupt GDS record at offset {pos} of {self.path}')
+            rectype = tag >> 8
+            if rectype == _SNAME:
+                sname = _ascii(mm[pos + 4:pos + length])
+                if refs is None:
+                    raise ValueError(f'SNAME outside structure at offset {pos} of {self.path}')
+                if sname not in refs:
+                    refs.append(sname)
+            elif rectype == _BGNSTR:
+                begin = pos
+                if self._lib_end is None:
+                    self._lib_end = begin
+            elif rectype == _STRNAME:
+                name = _ascii(mm[pos + 4:pos + length])
+                refs = self.references[name] = []
+            elif rectype == _ENDSTR:
+                self.structures[name] = (begin, pos + length)
+            elif rectype == _ENDLIB:
+                self._endlib = (pos, pos + length)
+                if self._lib_end is None:
+                    self._lib_end = pos
+                break
+            pos += length
+        else:
+            raise ValueError(f'No ENDLIB record in {self.path}')
+        logger.debug(f'Indexed {len(self.structures)} structures in {self.path}')
+
+    def library(self):
+        """gds.json top level dict (header and library records) without the structures"""
+        top = {}
+        lib = top
+        for rectype, data_type, p0, p1 in self._records(0, self._lib_end):
+            name = record_name(rectype)
+            if name == 'BGNLIB':
+                lib = {'time': _value(data_type, self._mm[p0:p1])}
+                top.setdefault('bgnlib', []).append(lib)
+            elif data_type != _NODATA:
+                lib[name.lower()] = _value(data_type, self._mm[p0:p1])
+        return top
+
+    @property
+    def units(self):
+        """UNITS record: [user units per database unit, database unit in meters]"""
+        return self.library()['bgnlib'][0]['units']
+
+    def top_level(self):
+        """Cells that no other cell references, in file order"""
+        referenced = {ref for refs in self.references.values() for ref in refs}
+        return [name for name in self.structures if name not in referenced]
+
+    def hierarchy(self, top):
+        """top and all the cells below it, in file order"""
+        cells = set()
+        stack = [top]
+        while stack:
+            name = stack.pop()
+            if name not in cells and name in self.structures:
+                cells.add(name)
+                stack.extend(self.references[name])
+        return [name for name in self.structures if name in cells]
+
+    def cell(self, name, arrays=True):
+        """Decode one structure into a gds.json style dict
+
+        With arrays set, XY is an int32 array of shape (n, 2); otherwise a flat list as in gds.json.
+        """
+        mm = self._mm
+        strct = {}
+        elem = None
+        for rectype, data_type, p0, p1 in self._records(*self.structures[name]):
+            rname = record_name(rectype)
+            if rname in _ELEMENTS:
+                elem = {'type': rname.lower()}
+                strct.setdefault('elements', []).append(elem)
+            elif rectype == _ENDEL:
+                elem = None
+            elif data_type == _NODATA:
+                continue
+            elif rectype == _BGNSTR:
+                strct['time'] = _value(data_type, mm[p0:p1])
+            elif elem is None:
+                strct[rname.lower()] = _value(data_type, mm[p0:p1])
+            elif rectype == _XY:
+                xy = np.frombuffer(mm[p0:p1], dtype='>i4').astype(np.int32)
+                elem['xy'] = xy.reshape(-1, 2) if arrays else xy.tolist()
+            else:
+                elem[rname.lower()] = _value(data_type, mm[p0:p1])
+        return strct
+
+    def to_json(self, top=None):
+        """gds.json dict of the library, or only of top and the cells below it"""
+        data = self.library()
+        names = self.structures if top is None else self.hierarchy(top)
+        if names:
+            data['bgnlib'][0]['bgnstr'] = [self.cell(name, arrays=False) for name in names]
+        return data
+
+    def extract(self, top):
+        """GDSII bytes of a library holding only top and the cells below it
+
+        Structures are copied without being decoded.
+        """
+        mm = self._mm
+        chunks = [mm[0:self._lib_end]]
+        chunks.extend(mm[slice(*self.structures[name])] for name in self.hierarchy(top))
+        chunks.append(mm[slice(*self._endlib)])
+        return b''.join(chunks)
@@ -0,0 +1,178 @@
+"""Streaming GDSII writer
+
+Records are packed with struct into a buffer that is flushed to the (binary) output file in large
+chunks, so a layout can be written element by element without building the gds.json structure
+(or python-gdsii Record objects) in memory. The output is byte for byte what json2gds produces
+from the equivalent gds.json.
+"""
+
+import struct
+
+import logging
+logger = logging.getLogger(__name__)
+
+# (record tag, data type) of the records used by gds.json
+HEADER = 0x0002
+BGNLIB = 0x0102
+LIBNAME = 0x0206
+UNITS = 0x0305
+ENDLIB = 0x0400
+BGNSTR = 0x0502
+STRNAME = 0x0606
+ENDSTR = 0x0700
+BOUNDARY = 0x0800
+PATH = 0x0900
+SREF = 0x0A00
+TEXT = 0x0C00
+LAYER = 0x0D02
+DATATYPE = 0x0E02
+WIDTH = 0x0F03
+XY = 0x1003
+ENDEL = 0x1100
+SNAME = 0x1206
+TEXTTYPE = 0x1602
+PRESENTATION = 0x1701
+STRING = 0x1906
+STRANS = 0x1A01
+MAG = 0x1B05
+ANGLE = 0x1C05
+PATHTYPE = 0x2102
+PROPATTR = 0x2B02
+PROPVALUE = 0x2C06
+BGNEXTN = 0x3003
+ENDEXTN = 0x3103
+
+_header = struct.Struct('>HH')
+_int2 = struct.Struct('>h')
+_bitarray = struct.Struct('>H')
+_int4 = struct.Struct('>l')
+_real8 = struct.Struct('>Q')
+_nodata = {tag: _header.pack(4, tag) for tag in (ENDLIB, ENDSTR, BOUNDARY, PATH, SREF, TEXT, ENDEL)}
+
+# (gds.json key, tag) of the optional element records, in output order
+_element_records = {
+    'boundary': (BOUNDARY, [('layer', LAYER), ('datatype', DATATYPE), ('xy', XY), ('propattr', PROPATTR),
+                            ('propvalue', PROPVALUE)]),
+    'path': (PATH, [('layer', LAYER), ('datatype', DATATYPE), ('pathtype', PATHTYPE), ('width', WIDTH),
+                    ('bgnextn', BGNEXTN), ('endextn', ENDEXTN), ('xy', XY)]),
+    'text': (TEXT, [('layer', LAYER), ('texttype', TEXTTYPE), ('presentation', PRESENTATION), ('strans', STRANS),
+                    ('mag', MAG), ('angle', ANGLE), ('xy', XY), ('string', STRING)]),
+    'sref': (SREF, [('sname', SNAME), ('strans', STRANS), ('angle', ANGLE), ('xy', XY)]),
+}
+
+
+def real8(x):
+    """GDSII excess-64, base-16 representation of x as an unsigned 64 bit int"""
+    (ieee,) = struct.unpack('=Q', struct.pack('=d', x))
+    sign = ieee & 0x8000000000000000
+    ieee_exp = (ieee >> 52) & 0x7ff
+    if ieee_exp == 0:
+        return 0
+    mant = ((ieee & 0xfffffffffffff) + 0x10000000000000) << 3
+    exp16, rest = divmod(ieee_exp - 1023 + 1, 4)
+    if rest:
+        rest = 4 - rest
+        exp16 += 1
+    mant >>= rest
+    exp16 += 64
+    if exp16 < -14:
+        return 0
+    elif exp16 < 0:
+        mant >>= exp16 * 4
+        exp16 = 0
+    elif exp16 > 0x7f:
+        raise ValueError(f'{x} is too big for REAL8')
+    return sign | (exp16 << 56) | mant
+
+
+class GDSWriter:
+    """Write GDSII records to a binary file"""
+
+    def __init__(self, ofile, buffer_size=1 << 20):
+        self.ofile = ofile
+        self.buffer_size = buffer_size
+        self.buf = bytearray()
+
+    def _record(self, tag, data):
+        if len(data) + 4 > 0xFFFF:
+            raise ValueError(f'GDS record {tag:#06x} too big ({len(data)} bytes)')
+        self.buf += _header.pack(len(data) + 4, tag)
+        self.buf += data
+        if len(self.buf) >= self.buffer_size:
+            self.flush()
+
+    def nodata(self, tag):
+        self.buf += _nodata[tag]
+
+    def int2(self, tag, values):
+        self._record(tag, struct.pack(f'>{len(values)}h', *values))
+
+    def int4(self, tag, values):
+        self._record(tag, struct.pack(f'>{len(values)}l', *values))
+
+    def real8(self, tag, values):
+        self._record(tag, struct.pack(f'>{len(values)}Q', *map(real8, values)))
+
+    def ascii(self, tag, s):
+        data = s.encode()
+        if len(data) % 2:
+            data += b'\0'
+        self._record(tag, data)
+
+    def _value(self, tag, value):
+        data_type = tag & 0xff
+        if data_type == 0x02:
+            self.int2(tag, value if isinstance(value, (list, tuple)) else [value])
+        elif data_type == 0x03:
+            self.int4(tag, value if isinstance(value, (list, tuple)) else [value])
+        elif data_type == 0x05:
+            self.real8(tag, value if isinstance(value, (list, tuple)) else [value])
+        elif data_type == 0x06:
+            self.ascii(tag, value)
+        elif data_type == 0x01:
+            self._record(tag, _bitarray.pack(value))
+        else:
+            raise ValueError(f'Unsupported GDS data type {data_type}')
+
+    def element(self, elem):
+        """Write a gds.json style element dict"""
+        t = elem['type']
+        if t in _element_records:
+            tag, records = _element_records[t]
+            self.nodata(tag)
+            for key, rtag in records:
+                if key in elem:
+                    self._value(rtag, elem[key])
+        self.nodata(ENDEL)
+
+    def structure(self, strct):
+        """Write a gds.json style structure dict; its elements may be any iterable"""
+        self.int2(BGNSTR, strct['time'])
+        self.ascii(STRNAME, strct['strname'])
+        for elem in strct.get('elements', ()):
+            self.element(elem)
+        self.nodata(ENDSTR)
+
+    def library(self, lib):
+        """Write a gds.json style library dict; bgnstr may be any iterable of structures"""
+        self.int2(BGNLIB, lib['time'])
+        self.ascii(LIBNAME, lib['libname'])
+        self.real8(UNITS, lib['units'])
+        for strct in lib['bgnstr']:
+            self.structure(strct)
+        self.nodata(ENDLIB)
+
+    def write(self, top):
+        """Write a gds.json style top level dict"""
+        self.int2(HEADER, [top['header']])
+        for lib in top['bgnlib']:
+            self.library(lib)
+        self.flush()
+
+    def flush(self):
+        self.ofile.write(self.buf)
+        self.buf = bytearray()
+
+
+def write_gds(top, ofile):
+    GDSWriter(ofile).write(top)
@@ -13,13 +13,15 @@
 
 from gdsii import tags, types
 from gdsii.record import Record
+from .gds_writer import write_gds
 import sys
 
 def unbracket (l):    return str(l)[1:-1]
 
 def quote (s):        return '\"' + s + '\"'
 
-def convert_GDSjson_GDS_fps( ifile, ofile):
+def convert_GDSjson_GDS_fps_gdsii( ifile, ofile):
+    """python-gdsii writer, record by record (slower than convert_GDSjson_GDS_fps; same bytes)"""
 
     def store_data (tag_name, idata):
         tag = tags.DICT[tag_name]
@@ -89,16 +91,24 @@ def store_data (tag_name, idata):
             store_data ("ENDSTR", None)
         store_data ("ENDLIB", None)
 
-def convert_GDSjson_GDS (name, oname):
+def convert_GDSjson_GDS_fps( ifile, ofile):
+    write_gds(json.load(ifile), ofile)
+
+def convert_GDSjson_GDS (name, oname, gdsii=False):
     with open (name, 'rt') as ifile, \
          open (oname, 'wb') as ofile:
-        convert_GDSjson_GDS_fps( ifile, ofile)
+        if gdsii:
+            convert_GDSjson_GDS_fps_gdsii( ifile, ofile)
+        else:
+            convert_GDSjson_GDS_fps( ifile, ofile)
 
 def usage(prog):
-    print('Usage: %s <file.json> <file.gds>' % prog)
+    print('Usage: %s [--gdsii] <file.json> <file.gds>' % prog)
 
 if __name__ == '__main__':
-    if (len(sys.argv) == 3):
+    if (len(sys.argv) == 4 and sys.argv[1] == '--gdsii'):
+        convert_GDSjson_GDS (sys.argv[2], sys.argv[3], gdsii=True)
+    elif (len(sys.argv) == 3):
         convert_GDSjson_GDS (sys.argv[1], sys.argv[2])
     else:
         usage(sys.argv[0])
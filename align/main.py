@@ -1,7 +1,6 @@
 import pathlib
 import shutil
 import os
-import json
 import sys
 import http.server
 import socketserver
@@ -9,11 +8,12 @@
 
 from .compiler import generate_hierarchy
 from align.schema.library import read_lib_json
-from .primitive import generate_primitives
-from .pnr import generate_pnr
+from .primitive import generate_primitives, PrimitiveCache
+from .pnr import generate_pnr, PlacerCache
 from .gdsconv.json2gds import convert_GDSjson_GDS
 from .utils.gds2png import generate_png
 from .utils import logmanager
+from .utils.artifacts import ArtifactStore
 
 import logging
 logger = logging.getLogger(__name__)
@@ -123,7 +123,7 @@ def schematic2layout(netlist_dir, pdk_dir, netlist_file=None, subckt=None, worki
                      log_level=None, verbosity=None, generate=False, regression=False, uniform_height=False, PDN_mode=False, flow_start=None,
                      flow_stop=None, router_mode='top_down', gui=False, skipGDS=False, lambda_coeff=1.0,
                      nroutings=1, viewer=False, select_in_ILP=False, place_using_ILP=False, seed=0, use_analytical_placer=False, ilp_solver='symphony',
-                     placer_sa_iterations=10000):
+                     placer_sa_iterations=10000, primitive_jobs=1, primitive_cache=None, primitive_cache_size=None, placer_jobs=1, placer_seeds=1, placer_threads=1, placer_cache=None, placer_cache_size=None, placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None, router_jobs=1, python_gds_json=True, gdsii=False, pex_reduce=False, hierarchical_check=False):
 
     steps_to_run = build_steps(flow_start, flow_stop)
 
@@ -147,100 +147,118 @@ def schematic2layout(netlist_dir, pdk_dir, netlist_file=None, subckt=None, worki
         regression_dir = working_dir / 'regression'
         regression_dir.mkdir(exist_ok=True)
 
-    results = []
-    # Generate hierarchy
-    topology_dir = working_dir / '1_topology'
-    if '1_topology' in steps_to_run:
-        netlist = extract_netlist_files(netlist_dir, netlist_file)
-        if subckt is None:
-            subckt = netlist.stem.upper()
-        else:
-            subckt = subckt.upper()
+    # Hand-off between the steps; checkpoint files are written in the background
+    store = ArtifactStore(asynchronous=True)
 
-        logger.info(f"Reading netlist: {netlist} subckt={subckt}, flat={flatten}")
+    try:
+        results = []
+        # Generate hierarchy
+        topology_dir = working_dir / '1_topology'
+        if '1_topology' in steps_to_run:
+            netlist = extract_netlist_files(netlist_dir, netlist_file)
+            if subckt is None:
+                subckt = netlist.stem.upper()
+            else:
+                subckt = subckt.upper()
 
-        topology_dir.mkdir(exist_ok=True)
-        primitive_lib = generate_hierarchy(netlist, subckt, topology_dir, flatten, pdk_dir)
-    else:
-        if subckt is None:
-            subckt = extract_netlist_files(netlist_dir, netlist_file).stem
-        primitive_lib = read_lib_json(topology_dir / '__primitives_library__.json')
-
-    # Generate primitives
-    primitive_dir = (working_dir / '2_primitives')
-
-    sub_steps = [step for step in steps_to_run if '3_pnr:' in step]
-
-    if '2_primitives' in steps_to_run:
-        primitive_dir.mkdir(exist_ok=True)
-        primitives = generate_primitives(primitive_lib, pdk_dir, primitive_dir, netlist_dir)
-        with (primitive_dir / '__primitives__.json').open('wt') as fp:
-            json.dump(primitives, fp=fp, indent=2)
-    elif sub_steps:
-        with (primitive_dir / '__primitives__.json').open('rt') as fp:
-            primitives = json.load(fp)
-
-    # run PNR tool
-    if sub_steps:
-        pnr_dir = working_dir / '3_pnr'
-        pnr_dir.mkdir(exist_ok=True)
-        variants = generate_pnr(topology_dir, primitive_dir, pdk_dir, pnr_dir, subckt, primitives=primitives, nvariants=nvariants, effort=effort,
-                                extract=extract, gds_json=not skipGDS, PDN_mode=PDN_mode, router_mode=router_mode, gui=gui, skipGDS=skipGDS,
-                                steps_to_run=sub_steps, lambda_coeff=lambda_coeff,
-                                nroutings=nroutings, select_in_ILP=select_in_ILP,
-                                place_using_ILP=place_using_ILP, seed=seed,
-                                use_analytical_placer=use_analytical_placer,
-                                ilp_solver=ilp_solver,
-                                placer_sa_iterations=placer_sa_iterations)
-
-        results.append((subckt, variants))
-
-        assert gui or router_mode == 'no_op' or '3_pnr:route' not in sub_steps or len(variants) > 0, \
-            f"No layouts were generated for {subckt}. Cannot proceed further. See LOG/align.log for last error."
-
-        # Generate necessary output collateral into current directory
-        for variant, filemap in variants.items():
-            if filemap['errors'] > 0:
-                (working_dir / filemap['errfile'].name).write_text(filemap['errfile'].read_text())
-
-            if viewer:
-                start_viewer(working_dir, pnr_dir, variant)
-            elif os.getenv('ALIGN_HOME', False):
-                shutil.copy(pnr_dir/f'{variant}.json',
-                            pathlib.Path(os.getenv('ALIGN_HOME'))/'Viewer'/'INPUT'/f'{variant}.json')
-
-            assert skipGDS or 'gdsjson' in filemap
-            if 'gdsjson' in filemap:
-                convert_GDSjson_GDS(filemap['gdsjson'], working_dir / f'{variant}.gds')
-                print("Use KLayout to visualize the generated GDS:", working_dir / f'{variant}.gds')
-
-            assert skipGDS or 'python_gds_json' in filemap
-            if 'python_gds_json' in filemap:
-                convert_GDSjson_GDS(filemap['python_gds_json'], working_dir / f'{variant}.python.gds')
-                print("Use KLayout to visualize the python generated GDS:", working_dir / f'{variant}.python.gds')
-
-            assert skipGDS or 'lef' in filemap
-            if 'lef' in filemap:
-                (working_dir / filemap['lef'].name).write_text(filemap['lef'].read_text())
-
-            if extract:
-                (working_dir / filemap['cir'].name).write_text(filemap['cir'].read_text())
-
-            # Generate PNG
-            if generate:
-                generate_png(working_dir, variant)
-
-            # Copy regression results in one dir
-            # SMB: Do we use this; let's get rid of it
-            if regression:
-                (regression_dir / filemap['gdsjson'].name).write_text(filemap['gdsjson'].read_text())
-                (regression_dir / filemap['python_gds_json'].name).write_text(filemap['python_gds_json'].read_text())
-                convert_GDSjson_GDS(filemap['python_gds_json'], regression_dir / f'{variant}.python.gds')
-                convert_GDSjson_GDS(filemap['gdsjson'], regression_dir / f'{variant}.gds')
-                (regression_dir / filemap['lef'].name).write_text(filemap['lef'].read_text())
-                (regression_dir / f'{subckt}.v').write_text((topology_dir / f'{subckt}.v').read_text())
-                for file_ in topology_dir.iterdir():
-                    if file_.suffix == '.const':
-                        (regression_dir / file_.name).write_text(file_.read_text())
-
-    return results
+            logger.info(f"Reading netlist: {netlist} subckt={subckt}, flat={flatten}")
+
+            topology_dir.mkdir(exist_ok=True)
+            primitive_lib = generate_hierarchy(netlist, subckt, topology_dir, flatten, pdk_dir)
+        else:
+            if subckt is None:
+                subckt = extract_netlist_files(netlist_dir, netlist_file).stem
+            primitive_lib = read_lib_json(topology_dir / '__primitives_library__.json')
+
+        # Generate primitives
+        primitive_dir = (working_dir / '2_primitives')
+
+        sub_steps = [step for step in steps_to_run if '3_pnr:' in step]
+
+        if '2_primitives' in steps_to_run:
+            primitive_dir.mkdir(exist_ok=True)
+            cache = None
+            if primitive_cache is not None:
+                cache = PrimitiveCache(primitive_cache, max_size=None if primitive_cache_size is None else primitive_cache_size*1024*1024)
+            primitives = generate_primitives(primitive_lib, pdk_dir, primitive_dir, netlist_dir, primitive_jobs=primitive_jobs, primitive_cache=cache)
+            store.put_json(primitive_dir / '__primitives__.json', primitives, indent=2)
+            store.put_checkpoint(primitive_dir / '__primitives__.ckpt', primitives)
+        elif sub_steps:
+            primitives = store.read_checkpoint(primitive_dir / '__primitives__.ckpt', sources=[primitive_dir / '__primitives__.json'])
+            if primitives is None:
+                primitives = store.read_json(primitive_dir / '__primitives__.json')
+
+        # run PNR tool
+        if sub_steps:
+            pnr_dir = working_dir / '3_pnr'
+            pnr_dir.mkdir(exist_ok=True)
+            placer_evaluations = None
+            if placer_cache is not None:
+                placer_evaluations = PlacerCache(placer_cache, max_size=None if placer_cache_size is None else placer_cache_size*1024*1024, pdk_dir=pdk_dir)
+            variants = generate_pnr(topology_dir, primitive_dir, pdk_dir, pnr_dir, subckt, primitives=primitives, nvariants=nvariants, effort=effort,
+                                    extract=extract, gds_json=not skipGDS, PDN_mode=PDN_mode, router_mode=router_mode, gui=gui, skipGDS=skipGDS,
+                                    steps_to_run=sub_steps, lambda_coeff=lambda_coeff,
+                                    nroutings=nroutings, select_in_ILP=select_in_ILP,
+                                    place_using_ILP=place_using_ILP, seed=seed,
+                                    use_analytical_placer=use_analytical_placer,
+                                    ilp_solver=ilp_solver,
+                                    placer_sa_iterations=placer_sa_iterations,
+                                    placer_jobs=placer_jobs, placer_seeds=placer_seeds, placer_threads=placer_threads, placer_cache=placer_evaluations,
+                                    placer_sa_adaptive=placer_sa_adaptive, placer_sa_stall=placer_sa_stall, placer_sa_block_iterations=placer_sa_block_iterations,
+                                    router_jobs=router_jobs,
+                                    python_gds_json=python_gds_json, gdsii=gdsii, pex_reduce=pex_reduce, hierarchical_check=hierarchical_check, artifacts=store)
+
+            results.append((subckt, variants))
+
+            assert gui or router_mode == 'no_op' or '3_pnr:route' not in sub_steps or len(variants) > 0, \
+                f"No layouts were generated for {subckt}. Cannot proceed further. See LOG/align.log for last error."
+
+            # Generate necessary output collateral into current directory
+            for variant, filemap in variants.items():
+                if filemap['errors'] > 0:
+                    (working_dir / filemap['errfile'].name).write_text(filemap['errfile'].read_text())
+
+                if viewer:
+                    start_viewer(working_dir, pnr_dir, variant)
+                elif os.getenv('ALIGN_HOME', False):
+                    shutil.copy(pnr_dir/f'{variant}.json',
+                                pathlib.Path(os.getenv('ALIGN_HOME'))/'Viewer'/'INPUT'/f'{variant}.json')
+
+                assert skipGDS or 'gdsjson' in filemap
+                if 'gdsjson' in filemap:
+                    convert_GDSjson_GDS(filemap['gdsjson'], working_dir / f'{variant}.gds', gdsii=gdsii)
+                    print("Use KLayout to visualize the generated GDS:", working_dir / f'{variant}.gds')
+
+                assert skipGDS or 'python_gds' in filemap
+                if 'python_gds' in filemap:
+                    shutil.copyfile(filemap['python_gds'], working_dir / f'{variant}.python.gds')
+                    print("Use KLayout to visualize the python generated GDS:", working_dir / f'{variant}.python.gds')
+
+                assert skipGDS or 'lef' in filemap
+                if 'lef' in filemap:
+                    (working_dir / filemap['lef'].name).write_text(filemap['lef'].read_text())
+
+                if extract:
+                    (working_dir / filemap['cir'].name).write_text(filemap['cir'].read_text())
+
+                # Generate PNG
+                if generate:
+                    generate_png(working_dir, variant)
+
+                # Copy regression results in one dir
+                # SMB: Do we use this; let's get rid of it
+                if regression:
+                    (regression_dir / filemap['gdsjson'].name).write_text(filemap['gdsjson'].read_text())
+                    if 'python_gds_json' in filemap:
+                        (regression_dir / filemap['python_gds_json'].name).write_text(filemap['python_gds_json'].read_text())
+                    shutil.copyfile(filemap['python_gds'], regression_dir / f'{variant}.python.gds')
+                    convert_GDSjson_GDS(filemap['gdsjson'], regression_dir / f'{variant}.gds', gdsii=gdsii)
+                    (regression_dir / filemap['lef'].name).write_text(filemap['lef'].read_text())
+                    (regression_dir / f'{subckt}.v').write_text((topology_dir / f'{subckt}.v').read_text())
+                    for file_ in topology_dir.iterdir():
+                        if file_.suffix == '.const':
+                            (regression_dir / file_.name).write_text(file_.read_text())
+
+        return results
+    finally:
+        store.close()
@@ -1,2 +1,3 @@
 from .checkers import *
 from .main import generate_pnr
+from .placer_cache import PlacerCache
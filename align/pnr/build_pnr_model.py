@@ -1,13 +1,14 @@
 
 import logging
 import pathlib
-import json
 import re
+import threading
 from itertools import chain
 from collections import defaultdict
 
 from .. import PnR
 from ..schema.hacks import VerilogJsonTop
+from ..utils.artifacts import ArtifactStore
 
 logger = logging.getLogger(__name__)
 
@@ -106,16 +107,14 @@ def process_connection( iter, net_name):
 
     return global_signals
 
-def _ReadMap(path, mapname):
+def _ReadMap(path, mapname, store):
     d = pathlib.Path(path)
     p = re.compile( r'^(\S+)\s+(\S+)\s*$')
-    with (d / mapname).open( "rt") as fp:
-        for line in fp:
-            line = line.rstrip('\n')
-            m = p.match(line)
-            assert m
-            k, v = m.groups()
-            yield k, str(d/v)
+    for line in store.read(d / mapname).splitlines():
+        m = p.match(line)
+        assert m
+        k, v = m.groups()
+        yield k, str(d/v)
 
 def _ConstructMap(pairs):
     tbl2 = defaultdict(list)
@@ -123,7 +122,7 @@ def _ConstructMap(pairs):
         tbl2[k].append(v)
     return tbl2
 
-def _attach_constraint_files( DB, fpath):
+def _attach_constraint_files( DB, fpath, store):
     d = pathlib.Path(fpath)
 
     for curr_node in DB.hierTree:
@@ -132,9 +131,8 @@ def _attach_constraint_files( DB, fpath):
         curr_node.compact_style = DB.getDrc_info().Design_info.compact_style
 
         fp = d / f"{curr_node.name}.pnr.const.json"
-        if fp.exists():
-            with fp.open("rt") as fp:
-                jsonStr = fp.read()
+        if store.exists(fp):
+            jsonStr = store.read(fp)
             logger.debug(f"Reading contraint json file {curr_node.name}.pnr.const.json:\n{jsonStr}")
             DB.ReadConstraint_Json(curr_node, jsonStr)
             logger.debug(f"Finished reading contraint json file {curr_node.name}.pnr.const.json")
@@ -143,55 +141,79 @@ def _attach_constraint_files( DB, fpath):
 
     for name, instances in DB.lefData.items():
         fp = d / f"{name}.json"
-        if fp.exists():
-            with fp.open( "rt") as fp:
-                jsonStr = fp.read()
+        if store.exists(fp):
+            jsonStr = store.read(fp)
             DB.ReadPrimitiveOffsetPitch(instances, jsonStr)
             logger.debug(f"Finished reading primitive json file {name}.json")
         else:
             logger.warning(f"No primitive json file for primitive {name}. Okay if a CC capacitor.")
 
-def _semantic(DB, path, topcell, global_signals):
-    _attach_constraint_files( DB, path)
+def _semantic(DB, path, topcell, global_signals, store):
+    _attach_constraint_files( DB, path, store)
     DB.semantic0( topcell)
     DB.semantic1( global_signals)
     DB.semantic2()
 
-def PnRdatabase( path, topcell, vname, lefname, mapname, drname, *, verilog_d_in=None, map_d_in=None, lef_s_in=None):
-    DB = PnR.PnRdatabase()
+# Last (PDK file, LEF) parsed and the PnRdatabase holding it, shared by the threads of a process
+_technology = {}
+_technology_lock = threading.Lock()
+
+def _technology_DB( pdkfile, lef_s, store):
+    """Copy of a PnRdatabase holding only the PDK design rules and the LEF macros
+
+    The PDK and LEF are only parsed when they differ from the previous call, so every DB built
+    in a process (for instance one per routed variant) starts from a snapshot instead.
+    """
+    key = (pdkfile, store.mtime(pdkfile), lef_s)
+    with _technology_lock:
+        if key not in _technology:
+            DB = PnR.PnRdatabase()
+            DB.ReadPDKJSON( pdkfile)
+            if lef_s is not None:
+                DB.ReadLEFFromString(lef_s)
+            _technology.clear()
+            _technology[key] = DB
+        else:
+            logger.debug(f'Reusing PDK {pdkfile} and LEF already read')
+        return PnR.PnRdatabase(_technology[key])
+
+def PnRdatabase( path, topcell, vname, lefname, mapname, drname, *, verilog_d_in=None, map_d_in=None, lef_s_in=None, store=None):
+    if store is None:
+        store = ArtifactStore()
 
     assert drname.endswith('.json'), drname
-    DB.ReadPDKJSON( path + '/' + drname)
+    # The C++ side reads the PDK file itself
+    store.flush([path + '/' + drname])
 
+    lef_s = None
     if lef_s_in is not None:
         logger.info(f'Reading LEF from string...')
-        DB.ReadLEFFromString(lef_s_in)
+        lef_s = lef_s_in
     else:
         p = pathlib.Path(path) / lefname
-        if p.exists():
-            with p.open( "rt") as fp:
-                DB.ReadLEFFromString(fp.read())
+        if store.exists(p):
+            lef_s = store.read(p)
         else:
             logger.warn(f"LEF file {p} doesn't exist.")
 
+    DB = _technology_DB( path + '/' + drname, lef_s, store)
 
     if map_d_in is None:
-        DB.gdsData2 = _ConstructMap(_ReadMap(path, mapname))
+        DB.gdsData2 = _ConstructMap(_ReadMap(path, mapname, store))
     else:
         DB.gdsData2 = _ConstructMap(map_d_in)
 
     if verilog_d_in is None:
-        with (pathlib.Path(path) / vname).open("rt") as fp:
-            verilog_d = VerilogJsonTop.parse_obj(json.load(fp=fp))
+        verilog_d = VerilogJsonTop.parse_obj(store.read_json(pathlib.Path(path) / vname))
     else:
         verilog_d = verilog_d_in
 
     global_signals = _ReadVerilogJson( DB, verilog_d)
-    _semantic(DB, path, topcell, global_signals)
+    _semantic(DB, path, topcell, global_signals, store)
 
     return DB, verilog_d
 
-def gen_DB_verilog_d(toplevel_args_d, results_dir, *, verilog_d_in=None, map_d_in=None, lef_s_in=None):
+def gen_DB_verilog_d(toplevel_args_d, results_dir, *, verilog_d_in=None, map_d_in=None, lef_s_in=None, store=None):
     fpath = toplevel_args_d['input_dir']
     lfile = toplevel_args_d['lef_file']
     vfile = toplevel_args_d['verilog_file']
@@ -201,10 +223,14 @@ def gen_DB_verilog_d(toplevel_args_d, results_dir, *, verilog_d_in=None, map_d_i
     numLayout = toplevel_args_d['nvariants']
     effort = toplevel_args_d['effort']
 
-    DB, verilog_d = PnRdatabase( fpath, topcell, vfile, lfile, mfile, dfile, verilog_d_in=verilog_d_in, map_d_in=map_d_in, lef_s_in=lef_s_in)
+    DB, verilog_d = PnRdatabase( fpath, topcell, vfile, lfile, mfile, dfile, verilog_d_in=verilog_d_in, map_d_in=map_d_in, lef_s_in=lef_s_in, store=store)
 
     assert verilog_d is not None
 
+    return DB, verilog_d, fpath, results_opath(results_dir), numLayout, effort
+
+def results_opath(results_dir):
+    """Output directory of the placer and router (created), as the string with a trailing / they expect"""
     if results_dir is None:
         opath = './Results/'
     else:
@@ -214,4 +240,4 @@ def gen_DB_verilog_d(toplevel_args_d, results_dir, *, verilog_d_in=None, map_d_i
 
     pathlib.Path(opath).mkdir(parents=True,exist_ok=True)
 
-    return DB, verilog_d, fpath, opath, numLayout, effort
+    return opath
@@ -7,10 +7,13 @@
 
 logger = logging.getLogger(__name__)
 
-def cap_placer_driver(*, toplevel_args_d, results_dir):
+def cap_placer_driver(*, toplevel_args_d, results_dir, store=None):
 
     logger.debug(f'Running cap_placer_driver...')
-    DB, verilog_d, fpath, opath, numLayout, effort = gen_DB_verilog_d(toplevel_args_d, results_dir)
+    if store is not None:
+        # The cap placer reads the unit capacitor jsons from the input directory
+        store.flush()
+    DB, verilog_d, fpath, opath, numLayout, effort = gen_DB_verilog_d(toplevel_args_d, results_dir, store=store)
 
     for idx in DB.TraverseHierTree():
         logger.debug(f'Starting bottom-up cap placement on {DB.hierTree[idx].name} {idx}')
@@ -1,9 +1,16 @@
 from ..cell_fabric import transformation, pdk
+from ..cell_fabric.terminal_table import TerminalTable
+from ..cell_fabric.remove_duplicates import RemoveDuplicates
 from ..compiler.util import get_generator
+from ..utils.artifacts import ArtifactStore
+import collections
 import itertools
 import json
 import pathlib
 import re
+import threading
+
+import numpy as np
 from .router import NType
 
 from .render_placement import gen_transformation
@@ -14,6 +21,15 @@
 def rational_scaling( d, *, mul=1, div=1, errors=None):
     assert all( (mul*c) % div == 0 for c in d['bbox'])
     d['bbox'] = [ (mul*c) //div for c in d['bbox']]
+    if isinstance(d['terminals'], TerminalTable):
+        for i in d['terminals'].off_grid(mul=mul, div=div).tolist():
+            term = d['terminals'][i]
+            txt = f"Terminal {term} not a multiple of {div} (mul={mul})."
+            if errors is not None:
+                errors.append( txt)
+            logger.error( txt)
+        d['terminals'].scale(mul=mul, div=div)
+        return
     for term in d['terminals']:
         if not all( (mul*c) % div == 0 for c in term['rect']):
             txt = f"Terminal {term} not a multiple of {div} (mul={mul})."
@@ -24,11 +40,263 @@ def rational_scaling( d, *, mul=1, div=1, errors=None):
         term['rect'] = [ (mul*c)//div for c in term['rect']]
 
 
+class LayoutCache:
+    """LRU cache of parsed layouts (json files of placed blocks), scaled to PnRDB units
+
+    Entries are keyed by (path, mtime, scale) and hold the layout dict, with the terminals in a
+    TerminalTable whose arrays are read-only (instances take() a copy to transform), and the
+    errors found while scaling it. Shared by all hierarchy levels and variants, and by the threads
+    of run_many, so entries are never mutated; values computed from a layout (cell abstracts) are
+    kept beside it by derive() and evicted with it.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(store, pth, scale_factor):
+        return (str(pathlib.Path(pth).resolve()), store.mtime(pth), scale_factor)
+
+    def get(self, store, pth, scale_factor):
+        key = self._key(store, pth, scale_factor)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry
+            self.misses += 1
+        # Parse outside the lock; if another thread got there first, keep its entry
+        d = store.read_json(pth)
+        d['terminals'] = TerminalTable( d['terminals'])
+        errors = []
+        # PnRDB coordinates are in units of 0.5nm. Scale primitives to this unit.
+        rational_scaling( d, mul=2, div=scale_factor, errors=errors)
+        d['terminals'].freeze()
+        with self._lock:
+            entry = self._entries.setdefault(key, (d, errors))
+            while len(self._entries) > self.maxsize:
+                (evicted, _) = self._entries.popitem(last=False)
+                self._derived.pop(evicted, None)
+        return entry
+
+    def derive(self, store, pth, scale_factor, tag, fn):
+        """fn(layout) for the layout of pth, computed once per (layout, tag)"""
+        key = self._key(store, pth, scale_factor)
+        with self._lock:
+            values = self._derived.get(key, {})
+            if tag in values:
+                return values[tag]
+        (d, _) = self.get(store, pth, scale_factor)
+        value = fn(d)
+        with self._lock:
+            if key in self._entries:
+                value = self._derived.setdefault(key, {}).setdefault(tag, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._derived.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+layout_cache = LayoutCache()
+
+
+def interaction_distances(p):
+    """Distance (in PDK units) per layer beyond which the design rules don't relate two rects on it"""
+    keys = ['Pitch', 'EndToEnd', 'SpaceX', 'SpaceY', 'AdjacentAttacker']
+    return {ly: 2 * max([v for (k, v) in layer.items() if k in keys and isinstance(v, (int, float))], default=0)
+            for (ly, layer) in p.items() if isinstance(layer, dict)}
+
+
+def _halos(tbl, halo):
+    """halo (a dict by layer) of each row of tbl"""
+    values = tbl.interners['layer'].values
+    per_code = np.array([halo.get(ly, 0) for ly in values] + [0], dtype=np.int64)
+    return per_code[tbl.codes('layer')]
+
+
+def cell_abstract(cnv, d, halo):
+    """Abstract of a (checked) master cell for hierarchical checking
+
+    d is the cell layout and halo the interaction distance by layer (both in PnRDB units); cnv is a
+    canvas of the PDK. Returns (boundary, components): boundary marks the pins and the rects within
+    halo of the cell bbox, which are always checked with the parent; components numbers the rects
+    on routing layers by the connected component (through the cell contents) they are in, -1 for
+    the others.
+    """
+    tbl = d['terminals']
+    r = tbl.rects
+    h = _halos(tbl, halo)
+    (llx, lly, urx, ury) = d['bbox']
+    inside = (r[:, 0] >= llx + h) & (r[:, 1] >= lly + h) & (r[:, 2] <= urx - h) & (r[:, 3] <= ury - h)
+    boundary = ~inside | tbl.mask('netType', 'pin')
+
+    cnv.terminals = tbl
+    cnv.subinsts.clear()
+    rd = RemoveDuplicates(cnv, allow_opens=True)
+    rd.build_scan_lines(rd.build_centerline_tbl())
+    rd.check_shorts_induced_by_vias()
+
+    roots = {}
+    components = np.full(len(tbl), -1)
+    layers = tbl.interners['layer'].values
+    for (i, (code, rect)) in enumerate(zip(tbl.codes('layer').tolist(), r.tolist())):
+        if code >= 0 and layers[code] in rd.layers:
+            slr = rd.find_slr(layers[code], rect)
+            if slr is not None:
+                components[i] = roots.setdefault(id(slr.root()), len(roots))
+    cnv.terminals = TerminalTable()
+
+    logger.debug(f'Abstract: {int(boundary.sum())} of {len(tbl)} rects, {len(roots)} components')
+    return (boundary, components)
+
+
+def _near(query, marks, halo, size=1024):
+    """Mask of the query rects within halo of some rect in marks
+
+    Marks are rasterized on a grid of at most size x size cells, so this errs on the side of True.
+    """
+    if len(query) == 0 or len(marks) == 0:
+        return np.zeros(len(query), dtype=bool)
+    marks = marks + np.array([-halo, -halo, halo, halo])
+    lo = np.minimum(query[:, :2].min(axis=0), marks[:, :2].min(axis=0))
+    hi = np.maximum(query[:, 2:].max(axis=0), marks[:, 2:].max(axis=0))
+    step = np.maximum(-(-(hi - lo + 1) // size), 1)
+    n = (hi - lo) // step + 1
+
+    # Cells covered by the marks: 2D difference array, integrated
+    (m0, m1) = ((marks[:, :2] - lo) // step, (marks[:, 2:] - lo) // step + 1)
+    diff = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(diff, (m0[:, 0], m0[:, 1]), 1)
+    np.add.at(diff, (m1[:, 0], m0[:, 1]), -1)
+    np.add.at(diff, (m0[:, 0], m1[:, 1]), -1)
+    np.add.at(diff, (m1[:, 0], m1[:, 1]), 1)
+    covered = diff.cumsum(axis=0).cumsum(axis=1) > 0
+
+    # Covered cells under each query rect: summed area table
+    sat = np.zeros(n + 2, dtype=np.int64)
+    sat[1:, 1:] = covered.cumsum(axis=0).cumsum(axis=1)
+    (q0, q1) = ((query[:, :2] - lo) // step, (query[:, 2:] - lo) // step + 1)
+    count = sat[q1[:, 0], q1[:, 1]] - sat[q0[:, 0], q1[:, 1]] - sat[q1[:, 0], q0[:, 1]] + sat[q0[:, 0], q0[:, 1]]
+    return count > 0
+
+
+def select_interactions(cnv, terminals, instances, halo):
+    """Add the parts of the placed instances that need to be checked with the routes to terminals
+
+    instances are (terminals, abstract) pairs in the parent frame. The abstract rects (see
+    cell_abstract) are added, and so are the other rects within halo of a route or an abstract
+    rect on the same or an adjacent (via) layer, halo being the largest interaction distance of
+    these layers.
+    Returns the rects that are left out, and the groups of rows of terminals that are connected
+    through the contents of an instance.
+    """
+    related = collections.defaultdict(set)
+    for (via, metals) in cnv.layer_stack:
+        for metal in metals:
+            if metal is not None:
+                related[via].add(metal)
+                related[metal].add(via)
+
+    def by_layer(tbl, mask):
+        values = tbl.interners['layer'].values
+        codes = tbl.codes('layer')
+        return {values[c]: np.nonzero(mask & (codes == c))[0] for c in np.unique(codes[mask]).tolist() if c >= 0}
+
+    marks = collections.defaultdict(list)
+    queries = collections.defaultdict(list)
+    for (layer, rows) in by_layer(terminals, np.ones(len(terminals), dtype=bool)).items():
+        marks[layer].append(terminals.rects[rows])
+    for (k, (tbl, (boundary, _))) in enumerate(instances):
+        for (layer, rows) in by_layer(tbl, boundary).items():
+            marks[layer].append(tbl.rects[rows])
+        for (layer, rows) in by_layer(tbl, ~boundary).items():
+            queries[layer].append((k, rows))
+
+    selected = [boundary.copy() for (_, (boundary, _)) in instances]
+    for (layer, qs) in queries.items():
+        near = [np.concatenate(marks[ly]) for ly in {layer} | related[layer] if marks[ly]]
+        if not near:
+            continue
+        h = max(halo.get(ly, 0) for ly in {layer} | related[layer])
+        mask = _near(np.concatenate([instances[k][0].rects[rows] for (k, rows) in qs]), np.concatenate(near), h)
+        offset = 0
+        for (k, rows) in qs:
+            selected[k][rows[mask[offset:offset + len(rows)]]] = True
+            offset += len(rows)
+
+    # The metals under the vias that are checked are needed to connect them
+    for ((tbl, _), keep) in zip(instances, selected):
+        for (via, metals) in cnv.layer_stack:
+            vias = keep & tbl.mask('layer', via)
+            if not vias.any():
+                continue
+            for metal in metals:
+                if metal is not None:
+                    rows = np.nonzero(~keep & tbl.mask('layer', metal))[0]
+                    keep[rows[_near(tbl.rects[rows], tbl.rects[vias], 0)]] = True
+
+    unchecked = TerminalTable()
+    known_connections = []
+    for ((tbl, (_, components)), keep) in zip(instances, selected):
+        drawn = ~tbl.mask('layer', 'boundary')
+        rows = np.nonzero(keep & drawn)[0]
+        start = len(terminals)
+        terminals.extend(tbl.take(rows))
+        unchecked.extend(tbl.take(~keep & drawn))
+
+        comps = components[rows]
+        order = np.argsort(comps, kind='stable')
+        (values, first, counts) = np.unique(comps[order], return_index=True, return_counts=True)
+        for (v, f, c) in zip(values.tolist(), first.tolist(), counts.tolist()):
+            if v >= 0 and c > 1:
+                known_connections.append((start + order[f:f + c]).tolist())
+
+    logger.debug(f'Hierarchical check: {len(terminals)} rects checked, {len(unchecked)} not')
+    return (unchecked, known_connections)
+
+
+def route_rects(hN):
+    """(netName, layer, rect, tag) of the block pin contacts, routes and power grid of hN
+
+    The geometry comes out of PnRDB as one structured array (hierNode.export_route_rects) rather
+    than one pybind11 object (and list copy) per net, via and contact.
+    """
+    d = hN.export_route_rects()
+    (nets, layers, tags) = (d['nets'], d['layers'], d['tags'])
+    a = d['rects']
+    rects = np.stack([a['llx'], a['lly'], a['urx'], a['ury']], axis=1).tolist()
+    for (net, layer, tag, r) in zip(a['net'].tolist(), a['layer'].tolist(), a['tag'].tolist(), rects):
+        yield (nets[net], layers[layer], r, tags[tag])
+
+
 def gen_viewer_json(hN, *, pdkdir, draw_grid=False, global_route_json=None, json_dir=None, extract=False, input_dir=None, markers=False,
-                    toplevel=True, pnr_const_ds=None):
+                    toplevel=True, pnr_const_ds=None, store=None, hierarchical=False):
+    """Flatten hN (placed blocks, routes and power grid) into a layout and check it
+
+    With hierarchical set, the placed blocks, which were checked on their own, are not checked again:
+    only their abstracts (see cell_abstract) and the parts of their contents near the routes of hN
+    are, together with the routes. The returned layout is still flat. PEX (extract) needs the
+    full layout and turns this off.
+    """
 
     logger.debug(f'Checking: {hN.name}')
 
+    hierarchical = hierarchical and not extract
+
+    if store is None:
+        store = ArtifactStore()
+
     global_power_names = set( [ n.name for n in hN.PowerNets])
 
     generator = get_generator('MOSGenerator', pdkdir)
@@ -41,15 +309,24 @@ def gen_viewer_json(hN, *, pdkdir, draw_grid=False, global_route_json=None, json
     # PnRDB coordinates are in units of 2nm. All else is in PDK abstraction.
     assert scale_factor == 1 or scale_factor % 2 == 0, f'PDK ScaleFactor should be even.'
 
-    terminals = []
+    terminals = TerminalTable()
 
     subinsts = {}
 
+    (hits, misses) = (layout_cache.hits, layout_cache.misses)
+
+    instances = []
+
+    if hierarchical:
+        # Canvas to trace the connectivity of the masters on
+        acnv = generator(pdk.Pdk().load(pdkdir / 'layers.json'),28,12,2,3,1,1,1)
+        # PnRDB units
+        halo = {ly: -(-2 * v // scale_factor) for (ly, v) in interaction_distances( cnv.pdk).items()}
+
     errors = []
 
-    def add_terminal( netName, layer, b, tag=None):
+    def add_terminal( netName, layer, r, tag=None):
 
-        r = [ b.LL.x, b.LL.y, b.UR.x, b.UR.y]
         terminals.append( { "netName": netName, "netType": "drawing", "layer": layer, "rect": r})
 
         def f( gen, value, tag=None):
@@ -67,15 +344,15 @@ def f( gen, value, tag=None):
                     logger.error( txt)
 
         if layer == "cellarea":
-            f( cnv.m1, b.LL.x, "LL.x")
-            f( cnv.m1, b.UR.x, "UR.x")
-            f( cnv.m2, b.LL.y, "LL.y")
-            f( cnv.m2, b.UR.y, "UR.y")
+            f( cnv.m1, r[0], "LL.x")
+            f( cnv.m1, r[2], "UR.x")
+            f( cnv.m2, r[1], "LL.y")
+            f( cnv.m2, r[3], "UR.y")
         else:
             if   layer in ["M1", "M3", "M5"]:
-                center = (b.LL.x + b.UR.x)//2
+                center = (r[0] + r[2])//2
             elif layer in ["M2", "M4", "M6"]:
-                center = (b.LL.y + b.UR.y)//2
+                center = (r[1] + r[3])//2
             else:
                 center = None
             if center is not None:
@@ -88,8 +365,6 @@ def f( gen, value, tag=None):
             if c.type == 'Block' or c.type == NType.Block:
                 cblk = hN.Blocks[c.iter2]
                 blk = cblk.instance[cblk.selectedInstance]
-                block_name = blk.name
-                master_name = blk.master
                 pin = blk.blockPins[c.iter]
                 formal_name = f"{blk.name}/{pin.name}"
                 assert formal_name not in fa_map
@@ -106,7 +381,7 @@ def f( gen, value, tag=None):
         found = False
         if json_dir is not None:
             pth = pathlib.Path( json_dir + "/" + blk.lefmaster + ".json")
-            if not pth.is_file():
+            if not store.exists(pth):
                 logger.debug( f"{pth} is not available; not importing subblock rectangles")
             else:
                 found = True
@@ -114,11 +389,11 @@ def f( gen, value, tag=None):
         if not found and input_dir is not None:
 
             logger.debug( f"blk.gdsFile: {blk.gdsFile} {found} {input_dir}")
-            p = re.compile( r"^(\./|)Results/(\S+)\.gds$")
+            p = re.compile( r"^(.*/|)Results/(\S+)\.gds$")
             m = p.match( blk.gdsFile)
             if m:
                 pth = input_dir / (m.groups()[1] + ".json")
-                if not pth.is_file():
+                if not store.exists(pth):
                     logger.error( f"{pth} not found in input_dir")
                 else:
                     logger.debug( f"{pth} found in input_dir")
@@ -127,92 +402,45 @@ def f( gen, value, tag=None):
                 logger.error( f"'{blk.gdsFile}' does not match pattern {p.pattern}")
 
         if found:
-            with pth.open( "rt") as fp:
-                d = json.load( fp)
-            # PnRDB coordinates are in units of 0.5nm. Scale primitives to this unit.
-            rational_scaling( d, mul=2, div=scale_factor, errors=errors)
+            (master, master_errors) = layout_cache.get( store, pth, scale_factor)
+            errors.extend( master_errors)
+            d = dict(master, terminals=master['terminals'].copy())
 
             tr3 = gen_transformation( blk)
-            for term in d['terminals']:
-                term['rect'] = tr3.hitRect( transformation.Rect( *term['rect'])).canonical().toList()
+            d['terminals'].transform( tr3)
+
+            def rename( nm):
+                if nm is None:
+                    return nm
+                formal_name = f"{blk.name}/{nm}"
+                default_name = nm if nm in global_power_names else formal_name
+                if nm in ["dummy_gnd_MINUS", "dummy_gnd_PLUS"]:
+                    default_name = hN.Gnd.name
+                return fa_map.get( formal_name, default_name)
+
+            # Rename once per distinct net instead of once per rect
+            d['terminals'].rename( 'netName', rename)
 
             for term in d['terminals']:
-                nm = term['netName']
-                if nm is not None:
-                    formal_name = f"{blk.name}/{nm}"
-                    default_name = nm if nm in global_power_names else formal_name
-                    if nm in ["dummy_gnd_MINUS", "dummy_gnd_PLUS"]:
-                        default_name = hN.Gnd.name
-                    term['netName'] = fa_map.get( formal_name, default_name)
                 if 'pin' in term:
                     del term['pin']
                 if 'terminal' in term:
                     assert len(term['terminal']) == 2
                     term['netName'] = f"{blk.name}/{':'.join(term['terminal'])}"
                     term['terminal'] = [f"{blk.name}/{term['terminal'][0]}", term['terminal'][1]]
-                if term['layer'] not in ["boundary"]:
+                if term['layer'] not in ["boundary"] and not hierarchical:
                     terminals.append( term)
 
+            if hierarchical:
+                abstract = layout_cache.derive( store, pth, scale_factor, str(pdkdir),
+                                                lambda m: cell_abstract( acnv, m, halo))
+                instances.append( (d['terminals'], abstract))
+
             if 'subinsts' in d:
                 subinsts.update({f'{blk.name}/{nm}': v for nm, v in d['subinsts'].items()})
 
-    for n in itertools.chain( hN.Nets, hN.PowerNets):
-        logger.debug( f"Net: {n.name}")
-
-        def addt( obj, con, tag=None):
-            b = con.placedBox
-            if obj == n:
-                add_terminal( obj.name, con.metal, b, tag=tag)
-            else:
-                add_terminal( obj, con.metal, b, tag=tag)
-
-        for c in n.connected:
-            if c.type == 'Block' or c.type == NType.Block:
-                cblk = hN.Blocks[c.iter2]
-                blk = cblk.instance[cblk.selectedInstance]
-                block_name = blk.name
-                master_name = blk.master
-                pin = blk.blockPins[c.iter]
-                formal_name = pin.name
-
-                tag = f'Block formal_index: {c.iter},{formal_name} block_index: {c.iter2},{block_name},{master_name}'
-                logger.debug( f'\t{tag}')
-
-                for con in pin.pinContacts:
-                    addt( n, con, "blockPin")
-            elif c.type == 'Terminal' or c.type == NType.Terminal:
-                term = hN.Terminals[c.iter]
-                terminal_name = term.name
-                assert terminal_name == n.name
-                tag = f'Terminal formal_index: {c.iter},{terminal_name}'
-                logger.debug( f'\t{tag}')
-                for con in term.termContacts:
-                    pass
-                    # addt( n, con)
-            else:
-                assert False, c.type
-
-
-        for metal in n.path_metal:
-            con = metal.MetalRect
-            add_terminal( n.name, con.metal, con.placedBox, "path_metal")
-
-        for via in n.path_via:
-            for con in [via.UpperMetalRect,via.LowerMetalRect,via.ViaRect]:
-                addt( n, con, "path_via")
-
-        if hasattr( n, 'interVias'):        
-            for via in n.interVias:
-                for con in [via.UpperMetalRect,via.LowerMetalRect,via.ViaRect]:
-                    addt( n, con, "intervia")
-
-    for pg in [hN.Gnd, hN.Vdd]:
-        for metal in pg.metals:
-            con = metal.MetalRect
-            add_terminal( pg.name, con.metal, con.placedBox, "power grid metal")
-        for via in pg.vias:
-            for con in [via.UpperMetalRect,via.LowerMetalRect,via.ViaRect]:
-                add_terminal( pg.name, con.metal, con.placedBox, "power grid via")
+    for (netName, layer, r, tag) in route_rects( hN):
+        add_terminal( netName, layer, r, tag)
 
     if global_route_json is not None:
         with open(global_route_json, "rt") as fp:
@@ -275,6 +503,12 @@ def addt( obj, con, tag=None):
                 r = [ 0, y-2, hN.width, y+2]
                 terminals.append( { "netName": 'm2_bin', "netType": "drawing", "layer": 'M2', "rect": r})
 
+    logger.info( f'Layout cache: {layout_cache.hits - hits} hits, {layout_cache.misses - misses} misses '
+                 f'({layout_cache.hits} / {layout_cache.misses} in total, {len(layout_cache)} layouts)')
+
+    if hierarchical:
+        (unchecked, known_connections) = select_interactions( cnv, terminals, instances, halo)
+
     # Create viewer dictionary
 
     d = {}
@@ -294,6 +528,11 @@ def addt( obj, con, tag=None):
 
     cnv.bbox = transformation.Rect( *d["bbox"])
     cnv.terminals = d["terminals"]
+    if hierarchical:
+        rects = cnv.terminals.rects.tolist()
+        layers = cnv.terminals.interners['layer'].values
+        layer_codes = cnv.terminals.codes('layer').tolist()
+        cnv.known_connections = [[(layers[layer_codes[i]], rects[i]) for i in group] for group in known_connections]
     for inst, parameters in subinsts.items():
         cnv.subinsts[inst].parameters.update(parameters)
 
@@ -307,10 +546,15 @@ def addt( obj, con, tag=None):
     if not toplevel:
         nets_allowed_to_be_open = set.union(nets_allowed_to_be_open, global_power_names)
 
-    new_d = cnv.gen_data(run_drc=True, run_pex=extract,nets_allowed_to_be_open=nets_allowed_to_be_open,postprocess=toplevel)
+    new_d = cnv.gen_data(run_drc=True, run_pex=extract,nets_allowed_to_be_open=nets_allowed_to_be_open,postprocess=toplevel and not hierarchical)
 
     d['bbox'] = cnv.bbox.toList()
     d['terminals'] = new_d['terminals']
+    if hierarchical:
+        unchecked.scale( mul=scale_factor, div=2)
+        d['terminals'].extend( unchecked.to_list())
+        if toplevel:
+            d['terminals'] = cnv.postprocessor.run( d['terminals'])
 
     if False:
         nets_actual = set.union({net.name for net in hN.Nets}, {net.name for net in hN.PowerNets})
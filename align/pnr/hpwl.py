@@ -3,6 +3,7 @@
 import pathlib
 from collections import defaultdict
 
+import numpy as np
 
 from .. import PnR
 from ..cell_fabric.transformation import Transformation, Rect
@@ -103,35 +104,139 @@ def to_center( r):
     #return [xc,yc,xc,yc]
     return r
 
-def calculate_HPWL_from_placement_verilog_d_top_down( placement_verilog_d, concrete_name, nets_d, *, skip_globals=False):
-    instances = { (module['concrete_name'],instance['instance_name']): instance for module in placement_verilog_d['modules'] for instance in module['instances']}
+def transform_rects( rects, tr):
+    """Canonical rects (rows llx, lly, urx, ury) after applying Transformation tr
+
+    tr can also be an array with a row (oX, oY, sX, sY) per rect.
+    """
+    tr = np.asarray( tr.toTuple() if isinstance( tr, Transformation) else tr)
+    oX, oY, sX, sY = (tr[..., i, None] for i in range(4))
+    x = rects[:, 0::2] * sX + oX
+    y = rects[:, 1::2] * sY + oY
+    return np.stack( [x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)], axis=1)
+
+def net_hpwls( rects, offsets):
+    """Semi-perimeter of the bounding box of each net
+
+    The rects (rows llx, lly, urx, ury) of net i are rects[offsets[i]:offsets[i+1]]; nets without rects have zero HPWL.
+    """
+    offsets = np.asarray( offsets)
+    counts = np.diff( offsets)
+    hpwl = np.zeros( len(counts), dtype=rects.dtype)
+    present = counts > 0
+    if present.any():
+        starts = offsets[:-1][present]
+        lo = np.minimum.reduceat( rects[:, :2], starts)
+        hi = np.maximum.reduceat( rects[:, 2:], starts)
+        hpwl[present] = (hi - lo).sum(axis=1)
+    return hpwl
+
+class FlatNetlist:
+    """Array form of a flattened netlist (nets_d from gen_netlist)
+
+    Each pin has the index of its net and of the instance path down to its leaf; instance paths are listed
+    after their parents. The placement alternatives of a hierarchy node differ in the transformations and
+    concrete templates of their instances but not in connectivity, so one FlatNetlist serves all of them.
+    """
+    def __init__(self, nets_d):
+        self.nets = list(nets_d)
+        self.paths, self.parents = [()], [-1]
+        path_index = { (): 0}
+
+        def index( p):
+            if p not in path_index:
+                parent = index( p[:-1])
+                path_index[p] = len(self.paths)
+                self.paths.append( p)
+                self.parents.append( parent)
+            return path_index[p]
+
+        self.pin_nets, self.pin_paths, self.formals = [], [], []
+        for i, hnet in enumerate(self.nets):
+            for hpin in nets_d[hnet]:
+                self.pin_nets.append( i)
+                self.pin_paths.append( index( hpin[:-1]))
+                self.formals.append( hpin[-1])
+
+        depths = np.array( [len(p) for p in self.paths])
+        parents = np.array( self.parents)
+        self.levels = [ (level, parents[level]) for level in (np.flatnonzero( depths == d) for d in range( 1, depths.max()+1))]
+
+    def _resolve( self, placement_verilog_d, concrete_name):
+        """Concrete template name and local transformation (oX, oY, sX, sY) of each instance path"""
+        instances = { (module['concrete_name'],instance['instance_name']): instance for module in placement_verilog_d['modules'] for instance in module['instances']}
+        ctns, local = [concrete_name], [(0, 0, 1, 1)]
+        for p, parent in zip( self.paths[1:], self.parents[1:]):
+            instance = instances[(ctns[parent],p[-1])]
+            ctns.append( instance['concrete_template_name'])
+            local.append( Transformation( **instance['transformation']).toTuple())
+        return ctns, local
+
+    def net_hpwls( self, alternatives):
+        """HPWL of each net (columns) in each (placement_verilog_d, concrete_name) of alternatives (rows)"""
+        n, m = len(alternatives), len(self.nets)
+        ctns, trs = [], []
+        for placement_verilog_d, concrete_name in alternatives:
+            c, t = self._resolve( placement_verilog_d, concrete_name)
+            ctns.append( c)
+            trs.append( t)
+
+        # Compose the transformations down the instance paths, a level at a time
+        trs = np.array( trs).reshape( n, len(self.paths), 4)
+        for level, parent in self.levels:
+            ptr = trs[:, parent]
+            trs[:, level, :2] = ptr[..., 2:] * trs[:, level, :2] + ptr[..., :2]
+            trs[:, level, 2:] *= ptr[..., 2:]
+
+        # Terminal rects of each (leaf concrete name, terminal name); a concrete leaf is the same in every alternative
+        leaf_terminals = defaultdict(list)
+        for placement_verilog_d, _ in alternatives:
+            for leaf in placement_verilog_d['leaves']:
+                ctn = leaf['concrete_name']
+                if any( (ctn,terminal['name']) in leaf_terminals for terminal in leaf['terminals']): continue
+                for terminal in leaf['terminals']:
+                    leaf_terminals[(ctn,terminal['name'])].append( to_center(terminal['rect']))
+        groups = { k: i for i, k in enumerate(leaf_terminals)}
+        counts = np.array( [len(v) for v in leaf_terminals.values()] + [0], dtype=int)
+        starts = np.cumsum( counts) - counts
+        rects = [r for v in leaf_terminals.values() for r in v]
+
+        # Pins without terminals (not on a leaf) get the last, empty group
+        pin_groups = np.array( [[groups.get( (c[path],formal), len(groups)) for path, formal in zip( self.pin_paths, self.formals)] for c in ctns], dtype=int).reshape( n, -1)
+
+        # Expand the pins of all alternatives into their rects, ordered by alternative then net so that each
+        # (alternative, net) is a contiguous segment
+        pin_counts = counts[pin_groups].ravel()
+        total = pin_counts.sum()
+        first = np.repeat( np.cumsum( pin_counts) - pin_counts, pin_counts)
+        rect_index = np.repeat( starts[pin_groups].ravel(), pin_counts) + np.arange( total) - first
+        alt = np.arange( n)[:, None]
+        rect_trs = np.repeat( (alt*len(self.paths) + np.array( self.pin_paths, dtype=int)).ravel(), pin_counts)
+        segments = np.repeat( (alt*m + np.array( self.pin_nets, dtype=int)).ravel(), pin_counts)
+
+        rects = np.array( rects).reshape( -1, 4)[rect_index] if rects else np.zeros( (0, 4), dtype=trs.dtype)
+        rects = transform_rects( rects, trs.reshape( -1, 4)[rect_trs])
+        offsets = np.concatenate( [[0], np.cumsum( np.bincount( segments, minlength=n*m))])
+        return net_hpwls( rects, offsets).reshape( n, m)
+
+    def hpwls( self, alternatives, *, skip_globals=False):
+        """Total HPWL of each (placement_verilog_d, concrete_name) of alternatives"""
+        hpwls = self.net_hpwls( alternatives)
+        if skip_globals:
+            for a, (placement_verilog_d, _) in enumerate(alternatives):
+                global_actuals = { gs['actual'] for gs in placement_verilog_d['global_signals']}
+                hpwls[a, [i for i, hnet in enumerate(self.nets) if len(hnet) == 1 and hnet[0] in global_actuals]] = 0
+        return hpwls.sum( axis=1)
 
+def calculate_HPWL_from_placement_verilog_d_top_down( placement_verilog_d, concrete_name, nets_d, *, skip_globals=False):
     global_actuals = { gs['actual'] for gs in placement_verilog_d['global_signals']}
 
-    leaf_terminals = defaultdict(list)
-
-    for leaf in placement_verilog_d['leaves']:
-        ctn = leaf['concrete_name']
-        for terminal in leaf['terminals']:
-            leaf_terminals[(ctn,terminal['name'])].append( to_center(terminal['rect']))
+    netlist = FlatNetlist( nets_d)
+    hpwls = netlist.net_hpwls( [(placement_verilog_d, concrete_name)])[0]
 
     HPWL = 0
-    for hnet, hpins in nets_d.items():
+    for hnet, local_HPWL in zip( netlist.nets, hpwls.tolist()):
         if skip_globals and len(hnet) == 1 and hnet[0] in global_actuals: continue
-        sp = SemiPerimeter()
-        for hpin in hpins:
-            ctn = concrete_name
-            tr = Transformation()
-            for instance_name in hpin[:-1]:
-                instance = instances[(ctn,instance_name)]
-                ctn = instance['concrete_template_name']
-                tr = tr.postMult(Transformation( **instance['transformation']))
-            
-            for r in leaf_terminals[(ctn,hpin[-1])]:
-                new_r = tr.hitRect( Rect(*r)).canonical().toList()
-                sp.addRect( new_r)
-
-        local_HPWL = sp.dist()
         logger.debug( f"from netlist HPWL: {'/'.join(hnet)}: {local_HPWL}")
         HPWL += local_HPWL
 
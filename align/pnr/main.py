@@ -1,20 +1,22 @@
 import pathlib
-import os
 import io
 import sys
 import logging
 import json
 import re
 import itertools
+import concurrent.futures
 
 import copy
 
 from collections import defaultdict
+from collections.abc import Mapping
 
 from ..cell_fabric.pdk import Pdk
 
 from .checkers import gen_viewer_json, gen_transformation
 from ..cell_fabric import gen_gds_json, transformation
+from ..gdsconv.json2gds import convert_GDSjson_GDS
 from .write_constraint import PnRConstraintWriter
 from .. import PnR
 from ..schema import constraint
@@ -24,6 +26,7 @@
 from .placer import placer_driver, startup_gui
 from .router import router_driver
 from .cap_placer import cap_placer_driver
+from ..utils.artifacts import ArtifactStore
 
 import copy
 
@@ -33,13 +36,14 @@
 
 
 def _generate_json(*, hN, variant, primitive_dir, pdk_dir, output_dir, extract=False, input_dir=None, toplevel=True, gds_json=True,
-                   pnr_const_ds=None):
+                   python_gds_json=True, gdsii=False, pex_reduce=False, hierarchical_check=False, pnr_const_ds=None, store=None):
 
     logger.debug(
         f"_generate_json: {hN} {variant} {primitive_dir} {pdk_dir} {output_dir} {extract} {input_dir} {toplevel} {gds_json}")
 
     cnv, d = gen_viewer_json(hN, pdkdir=pdk_dir, draw_grid=True, json_dir=str(primitive_dir),
-                             extract=extract, input_dir=input_dir, toplevel=toplevel, pnr_const_ds=pnr_const_ds)
+                             extract=extract, input_dir=input_dir, toplevel=toplevel, pnr_const_ds=pnr_const_ds, store=store,
+                             hierarchical=hierarchical_check)
 
     if gds_json and toplevel:
         # Hack in Outline layer
@@ -75,10 +79,10 @@ def _generate_json(*, hN, variant, primitive_dir, pdk_dir, output_dir, extract=F
     if extract:
         ret['cir'] = output_dir / f'{variant}.cir'
         with open(ret['cir'], 'wt') as fp:
-            cnv.pex.writePex(fp)
+            cnv.pex.writePex(fp, reduce=pex_reduce)
         logger.info(f"OUTPUT extracted netlist at {ret['cir']}")
 
-    if gds_json:
+    if gds_json and (python_gds_json or gdsii):
         ret['python_gds_json'] = output_dir / f'{variant}.python.gds.json'
         with open(ret['json'], 'rt') as ifp:
             with open(ret['python_gds_json'], 'wt') as ofp:
@@ -86,17 +90,117 @@ def _generate_json(*, hN, variant, primitive_dir, pdk_dir, output_dir, extract=F
                     hN.name, '', 0, ifp, ofp, timestamp=None, p=cnv.pdk)
         logger.info(f"OUTPUT gds.json {ret['python_gds_json']}")
 
+    if gds_json:
+        ret['python_gds'] = output_dir / f'{variant}.python.gds'
+        if gdsii:
+            # Previous path: python-gdsii conversion of the gds.json
+            convert_GDSjson_GDS(ret['python_gds_json'], ret['python_gds'], gdsii=True)
+        else:
+            with open(ret['python_gds'], 'wb') as ofp:
+                gen_gds_json.translate_gds(hN.name, '', 0, d, ofp, timestamp=None, p=cnv.pdk)
+        logger.info(f"OUTPUT gds {ret['python_gds']}")
+
     return ret
 
 
-def gen_constraint_files(verilog_d, input_dir):
+def _generate_variants(results_name_map, *, pdk_dir, primitive_dir, input_dir, output_dir, results_dir, extract, gds_json, skipGDS,
+                       pnr_const_ds, python_gds_json=True, gdsii=False, pex_reduce=False, hierarchical_check=False, store=None):
+    """Generate the json (and gds.json) of every routed variant; return the results of the toplevel ones"""
+    variants = {}
+
+    for variant, (path_name, layout_idx, DB) in results_name_map.items():
+
+        hN = DB.hierTree[layout_idx]
+        result = _generate_json(hN=hN,
+                                variant=variant,
+                                pdk_dir=pdk_dir,
+                                primitive_dir=primitive_dir,
+                                input_dir=input_dir,
+                                output_dir=output_dir,
+                                extract=extract,
+                                gds_json=gds_json,
+                                python_gds_json=python_gds_json,
+                                gdsii=gdsii,
+                                pex_reduce=pex_reduce,
+                                hierarchical_check=hierarchical_check,
+                                toplevel=hN.isTop,
+                                pnr_const_ds=pnr_const_ds,
+                                store=store)
+
+        if hN.isTop:
+            variants[variant] = result
+
+            if not skipGDS:
+                for tag, suffix in [('lef', '.lef'), ('gdsjson', '.gds.json')]:
+                    path = results_dir / (variant + suffix)
+                    assert path.exists()
+                    variants[variant][tag] = path
+
+    return variants
+
+
+def _route_variant_in_dir(concrete_top_name, scaled_placement_verilog_d, *, working_dir, results_dir, router_kwargs, json_kwargs):
+    """Route one placement in working_dir/routing/<concrete_top_name> (run in a worker process)
+
+    The toplevel json, lef and gds.json are copied back to working_dir and results_dir, where the serial flow writes them.
+    """
+    routing_dir = working_dir / 'routing' / concrete_top_name
+    routing_dir.mkdir(parents=True, exist_ok=True)
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    # gen_viewer_json picks up the capacitor arrays from its input_dir
+    for _, gdsFile in router_kwargs['cap_map']:
+        fn = working_dir / f'{pathlib.Path(gdsFile).stem}.json'
+        if fn.exists():
+            (routing_dir / fn.name).write_text(fn.read_text())
+
+    router_kwargs = dict(router_kwargs, toplevel_args_d=dict(router_kwargs['toplevel_args_d']), results_dir=routing_dir / 'Results')
+    results_name_map = router_driver(**router_kwargs, verilog_ds_to_run=[(concrete_top_name, VerilogJsonTop.parse_obj(scaled_placement_verilog_d))])
+
+    variants = _generate_variants(results_name_map, input_dir=routing_dir, output_dir=routing_dir,
+                                  results_dir=routing_dir / 'Results', **json_kwargs)
+
+    for variant, result in variants.items():
+        for tag, dst_dir in [('json', working_dir), ('lef', results_dir), ('gdsjson', results_dir)]:
+            if tag in result:
+                (dst_dir / result[tag].name).write_text(result[tag].read_text())
+                result[tag] = dst_dir / result[tag].name
+
+    return variants
+
+
+class PlacementAlternatives(Mapping):
+    """Placement verilog dicts by concrete name, parsed into VerilogJsonTop when first looked up
+
+    Resuming from the placer checkpoint only pays for validating the placements that are used.
+    """
+
+    def __init__(self, items):
+        self._dicts = dict(items)
+        self._parsed = {}
+
+    def __getitem__(self, nm):
+        if nm not in self._parsed:
+            self._parsed[nm] = VerilogJsonTop.parse_obj(self._dicts[nm])
+        return self._parsed[nm]
+
+    def __iter__(self):
+        return iter(self._dicts)
+
+    def __len__(self):
+        return len(self._dicts)
+
+
+def gen_constraint_files(verilog_d, input_dir, store=None):
+    if store is None:
+        store = ArtifactStore()
+
     pnr_const_ds = {module['name'] : PnRConstraintWriter().map_valid_const(module['constraints']) for module in verilog_d['modules']}
 
     constraint_files = { (input_dir / f'{nm}.pnr.const.json') : constraints for nm, constraints in pnr_const_ds.items() if len(constraints) > 0 }
 
     for fn, constraints in constraint_files.items():
-        with open(fn, 'wt') as outfile:
-            json.dump(constraints, outfile, indent=2)
+        store.put_json(fn, constraints, indent=2)
 
     return pnr_const_ds
 
@@ -199,10 +303,14 @@ def write_verilog_d(verilog_d):
 def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, primitives, nvariants=1, effort=0, extract=False,
                  gds_json=False, PDN_mode=False, router_mode='top_down', gui=False, skipGDS=False, steps_to_run,lambda_coeff,
                  nroutings=1, select_in_ILP=False, place_using_ILP=False, seed=0, use_analytical_placer=False, ilp_solver='symphony',
-                 placer_sa_iterations=10000):
+                 placer_sa_iterations=10000, placer_jobs=1, placer_seeds=1, placer_threads=1, placer_cache=None, placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None, router_jobs=1, python_gds_json=True, gdsii=False, pex_reduce=False, hierarchical_check=False, artifacts=None):
 
     subckt = subckt.upper()
 
+    # Artifacts are handed to the later steps through the store; with an asynchronous store the
+    # files below are written in the background and only flushed when C++ code needs them
+    store = ArtifactStore() if artifacts is None else artifacts
+
     logger.info(f"Running Place & Route for {subckt}")
     logger.debug(f"Running Place & Route for {subckt} {router_mode} {steps_to_run}")
 
@@ -226,11 +334,10 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
         manipulate_hierarchy(verilog_d, subckt)
 
         logger.debug(f"updated verilog: {verilog_d}")
-        with (input_dir/verilog_file).open("wt") as fp:
-            json.dump(write_verilog_d(verilog_d), fp=fp, indent=2, default=str)
+        store.put_json(input_dir/verilog_file, write_verilog_d(verilog_d), indent=2, default=str)
 
         # SMB: I want this to be in main (perhaps), or in the topology stage
-        pnr_const_ds = gen_constraint_files(verilog_d, input_dir)
+        pnr_const_ds = gen_constraint_files(verilog_d, input_dir, store=store)
 
         leaves, capacitors = gen_leaf_cell_info( verilog_d, pnr_const_ds)
 
@@ -240,43 +347,37 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
         logger.debug( f'capacitors: {dict(capacitors)}')
 
         # Generate .map file for PnR
-        with (input_dir / map_file).open(mode='wt') as mp:
-            for _,v in sorted(primitives.items()):
-                a = v['abstract_template_name']
-                c = v['concrete_template_name']
-                if c in leaf_collateral:
-                    assert '.lef' in leaf_collateral[c]
-                else:
-                    logger.warning( f'Unused primitive: {a} {c} excluded from map file')
-                print( f'{a} {c}.gds', file=mp)
+        map_lines = []
+        for _,v in sorted(primitives.items()):
+            a = v['abstract_template_name']
+            c = v['concrete_template_name']
+            if c in leaf_collateral:
+                assert '.lef' in leaf_collateral[c]
+            else:
+                logger.warning( f'Unused primitive: {a} {c} excluded from map file')
+            map_lines.append( f'{a} {c}.gds\n')
+        store.put(input_dir / map_file, ''.join(map_lines))
 
         # Generate .lef inputs for PnR
-        with (input_dir / lef_file).open(mode='wt') as lp:
-            logger.debug(f"lef files: {[pathlib.Path(v['.lef']) for k,v in leaf_collateral.items()]}")
-            for k,v in leaf_collateral.items():
-                lp.write(pathlib.Path(v['.lef']).read_text())
+        logger.debug(f"lef files: {[pathlib.Path(v['.lef']) for k,v in leaf_collateral.items()]}")
+        store.put(input_dir / lef_file, ''.join(store.read(v['.lef']) for k,v in leaf_collateral.items()))
 
-        with (input_dir / placement_lef_file).open(mode='wt') as lp:
-            logger.debug(f"placement lef files: {[pathlib.Path(v['.placement_lef']) for k,v in leaf_collateral.items()]}")
-            for k,v in leaf_collateral.items():
-                lp.write(pathlib.Path(v['.placement_lef']).read_text())
+        logger.debug(f"placement lef files: {[pathlib.Path(v['.placement_lef']) for k,v in leaf_collateral.items()]}")
+        store.put(input_dir / placement_lef_file, ''.join(store.read(v['.placement_lef']) for k,v in leaf_collateral.items()))
 
         #
         # TODO: Copying is bad ! Consider rewriting C++ code to accept fully qualified paths
         #
 
         # Copy pdk file
-        (input_dir / pdk_file).write_text((pdk_dir / pdk_file).read_text())
+        store.copy(pdk_dir / pdk_file, input_dir / pdk_file)
 
         # Copy primitive json files
         for k,v in leaf_collateral.items():
             for suffix in ['.gds.json', '.json']:
                 if suffix in v:
-                    (input_dir / f'{k}{suffix}').write_text(pathlib.Path(v[suffix]).read_text())
+                    store.copy(v[suffix], input_dir / f'{k}{suffix}')
 
-        
-        current_working_dir = os.getcwd()
-        os.chdir(working_dir)
 
         toplevel_args_d = {'input_dir': str(input_dir),
                            'lef_file': str(placement_lef_file),
@@ -288,7 +389,7 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
                            'effort': effort}
 
 
-        cap_map, cap_lef_s = cap_placer_driver(toplevel_args_d=toplevel_args_d, results_dir=None)
+        cap_map, cap_lef_s = cap_placer_driver(toplevel_args_d=toplevel_args_d, results_dir=results_dir, store=store)
 
         # Copy generated cap jsons from results_dir to working_dir
         # TODO: Cap arrays should eventually be generated by align.primitive
@@ -296,33 +397,27 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
 
         for cap_template_name in capacitors.keys():
             for fn in results_dir.glob( f'{cap_template_name}_AspectRatio_*.json'):
-                (working_dir / fn.name).write_text(fn.read_text())
-
-        os.chdir(current_working_dir)
-
-        with (working_dir / "__cap_map__.json").open("wt") as fp:
-            json.dump(cap_map, fp, indent=2)
+                store.put(working_dir / fn.name, fn.read_text())
 
-        with (working_dir / "__cap_lef__").open("wt") as fp:
-            fp.write(cap_lef_s)
+        store.put_json(working_dir / "__cap_map__.json", cap_map, indent=2)
+        store.put(working_dir / "__cap_lef__", cap_lef_s)
+        store.put_checkpoint(working_dir / "__prep__.ckpt", (pnr_const_ds, cap_map, cap_lef_s))
 
     else:
-        pnr_const_ds = load_constraint_files(input_dir)
-
-        with (working_dir / "__cap_map__.json").open("rt") as fp:
-            cap_map = json.load(fp)
-
-        with (working_dir / "__cap_lef__").open("rt") as fp:
-            cap_lef_s = fp.read()
+        prep = store.read_checkpoint(working_dir / "__prep__.ckpt",
+                                     sources=[*input_dir.glob('*.pnr.const.json'), working_dir / "__cap_map__.json", working_dir / "__cap_lef__"])
+        if prep is not None:
+            pnr_const_ds, cap_map, cap_lef_s = prep
+        else:
+            pnr_const_ds = load_constraint_files(input_dir)
+            cap_map = store.read_json(working_dir / "__cap_map__.json")
+            cap_lef_s = store.read(working_dir / "__cap_lef__")
 
 
     if '3_pnr:place' in steps_to_run:
         with (pdk_dir / pdk_file).open( 'rt') as fp:
             scale_factor = json.load(fp)["ScaleFactor"]
 
-        current_working_dir = os.getcwd()
-        os.chdir(working_dir)
-
         toplevel_args_d = {'input_dir': str(input_dir),
                            'lef_file': str(placement_lef_file),
                            'verilog_file': str(verilog_file),
@@ -337,18 +432,22 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
                           lambda_coeff=lambda_coeff, scale_factor=scale_factor,
                           select_in_ILP=select_in_ILP, place_using_ILP=place_using_ILP, seed=seed,
                           use_analytical_placer=use_analytical_placer, ilp_solver=ilp_solver, primitives=primitives,
-                          toplevel_args_d=toplevel_args_d, results_dir=None,
-                          placer_sa_iterations=placer_sa_iterations)
-
-        with open("__placer_dump__.json", "wt") as fp:
-            json.dump((top_level, leaf_map, [(nm, verilog_d.dict()) for nm, verilog_d in placement_verilog_alternatives.items()],metrics), fp=fp, indent=2)
+                          toplevel_args_d=toplevel_args_d, results_dir=results_dir,
+                          placer_sa_iterations=placer_sa_iterations, placer_jobs=placer_jobs, placer_seeds=placer_seeds, placer_threads=placer_threads, placer_cache=placer_cache,
+                          placer_sa_adaptive=placer_sa_adaptive, placer_sa_stall=placer_sa_stall, placer_sa_block_iterations=placer_sa_block_iterations,
+                          store=store)
 
-        os.chdir(current_working_dir)
+        # Only needed to restart at the gui or route steps; the placements are used from memory below
+        placer_dump = (top_level, leaf_map, [(nm, verilog_d.dict()) for nm, verilog_d in placement_verilog_alternatives.items()],metrics)
+        store.put_json(working_dir / "__placer_dump__.json", placer_dump, indent=2)
+        store.put_checkpoint(working_dir / "__placer_dump__.ckpt", placer_dump)
 
     elif '3_pnr:gui' in steps_to_run or '3_pnr:route' in steps_to_run:
-        with (working_dir / "__placer_dump__.json").open('rt') as fp:
-            top_level, leaf_map, placement_verilog_alternatives, metrics = json.load(fp)
-            placement_verilog_alternatives = {nm : VerilogJsonTop.parse_obj(v) for nm, v in placement_verilog_alternatives}
+        placer_dump = store.read_checkpoint(working_dir / "__placer_dump__.ckpt", sources=[working_dir / "__placer_dump__.json"])
+        if placer_dump is None:
+            placer_dump = store.read_json(working_dir / "__placer_dump__.json")
+        top_level, leaf_map, placement_verilog_alternatives, metrics = placer_dump
+        placement_verilog_alternatives = PlacementAlternatives(placement_verilog_alternatives)
 
     if '3_pnr:gui' in steps_to_run:
         if gui:
@@ -360,18 +459,16 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
         else:
             placements_to_run = None
         
-        with open("__placements_to_run__.json", "wt") as fp:
-            json.dump(placements_to_run, fp=fp, indent=2)
+        store.put_json(working_dir / "__placements_to_run__.json", placements_to_run, indent=2)
 
     elif '3_pnr:route' in steps_to_run:
-        with open("__placements_to_run__.json", "rt") as fp:
-            placements_to_run = json.load(fp)
+        placements_to_run = store.read_json(working_dir / "__placements_to_run__.json")
 
     variants = defaultdict(defaultdict)
 
     if '3_pnr:route' in steps_to_run:
 
-        assert nroutings == 1, f"nroutings other than 1 is currently not working"
+        assert nroutings == 1 or router_jobs > 1, f"nroutings other than 1 requires routing in separate directories (router_jobs > 1)"
 
         if placements_to_run is None:
             verilog_ds_to_run = [(f'{top_level}_{i}', placement_verilog_alternatives[f'{top_level}_{i}']) for i in range(min(nroutings, len(placement_verilog_alternatives)))]
@@ -381,9 +478,6 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
         with (pdk_dir / pdk_file).open( 'rt') as fp:
             scale_factor = json.load(fp)["ScaleFactor"]
 
-        current_working_dir = os.getcwd()
-        os.chdir(working_dir)
-
         toplevel_args_d = {'input_dir': str(input_dir),
                            'lef_file': str(placement_lef_file),
                            'verilog_file': str(verilog_file),
@@ -393,38 +487,34 @@ def generate_pnr(topology_dir, primitive_dir, pdk_dir, output_dir, subckt, *, pr
                            'nvariants': nvariants,
                            'effort': effort}
 
-        results_name_map = router_driver(cap_map=cap_map, cap_lef_s=cap_lef_s,
-                                         numLayout=toplevel_args_d['nvariants'], effort=toplevel_args_d['effort'],
-                                         adr_mode=False, PDN_mode=PDN_mode,
-                                         router_mode=router_mode, skipGDS=skipGDS, scale_factor=scale_factor,
-                                         nroutings=nroutings, primitives=primitives, toplevel_args_d=toplevel_args_d, results_dir=None,
-                                         verilog_ds_to_run=verilog_ds_to_run)
-
+        router_kwargs = dict(cap_map=cap_map, cap_lef_s=cap_lef_s,
+                             numLayout=toplevel_args_d['nvariants'], effort=toplevel_args_d['effort'],
+                             adr_mode=False, PDN_mode=PDN_mode,
+                             router_mode=router_mode, skipGDS=skipGDS, scale_factor=scale_factor,
+                             nroutings=nroutings, primitives=primitives, toplevel_args_d=toplevel_args_d, results_dir=results_dir)
+        json_kwargs = dict(pdk_dir=pdk_dir, primitive_dir=input_dir, extract=extract, gds_json=gds_json, skipGDS=skipGDS,
+                           pnr_const_ds=pnr_const_ds, python_gds_json=python_gds_json, gdsii=gdsii, pex_reduce=pex_reduce,
+                           hierarchical_check=hierarchical_check)
+
+        if router_jobs > 1:
+            # Each variant gets a fresh DB anyway; route them in worker processes, each in its own directory
+            # so that the intermediate results of sub-hierarchies with the same name don't collide
+            logger.info(f'Routing {len(verilog_ds_to_run)} placements using {router_jobs} processes')
+            store.flush()
+            with concurrent.futures.ProcessPoolExecutor(max_workers=router_jobs) as executor:
+                futures = [executor.submit(_route_variant_in_dir, concrete_top_name, scaled_placement_verilog_d.dict(),
+                                           working_dir=working_dir, results_dir=results_dir,
+                                           router_kwargs=router_kwargs, json_kwargs=json_kwargs)
+                           for concrete_top_name, scaled_placement_verilog_d in verilog_ds_to_run]
+                for future in futures:
+                    for variant, result in future.result().items():
+                        variants[variant].update(result)
 
-        os.chdir(current_working_dir)
-
-        for variant, (path_name, layout_idx, DB) in results_name_map.items():
-
-            hN = DB.hierTree[layout_idx]
-            result = _generate_json(hN=hN,
-                                    variant=variant,
-                                    pdk_dir=pdk_dir,
-                                    primitive_dir=input_dir,
-                                    input_dir=working_dir,
-                                    output_dir=working_dir,
-                                    extract=extract,
-                                    gds_json=gds_json,
-                                    toplevel=hN.isTop,
-                                    pnr_const_ds=pnr_const_ds)
+        else:
+            results_name_map = router_driver(**router_kwargs, verilog_ds_to_run=verilog_ds_to_run, store=store)
 
-            if hN.isTop:
+            for variant, result in _generate_variants(results_name_map, input_dir=working_dir, output_dir=working_dir,
+                                                      results_dir=results_dir, store=store, **json_kwargs).items():
                 variants[variant].update(result)
 
-                if not skipGDS:
-                    for tag, suffix in [('lef', '.lef'), ('gdsjson', '.gds.json')]:
-                        path = results_dir / (variant + suffix)
-                        assert path.exists()
-                        variants[variant][tag] = path
-
-
     return variants
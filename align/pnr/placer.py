@@ -1,23 +1,61 @@
+import hashlib
 import logging
 import re
 import pathlib
 import json
 import copy
+import concurrent.futures
 from collections import defaultdict
 from .. import PnR
 from .render_placement import gen_placement_verilog, scale_placement_verilog, gen_boxes_and_hovertext, standalone_overlap_checker, scalar_rational_scaling, round_to_angstroms
 from .checker import check_placement, check_place_on_grid
 from ..gui.mockup import run_gui
-from .hpwl import calculate_HPWL_from_placement_verilog_d, gen_netlist
+from .hpwl import FlatNetlist, gen_netlist, calculate_HPWL_from_placement_verilog_d_bottom_up
 from .grid_constraints import gen_constraints
 import math
+import time
 from .build_pnr_model import gen_DB_verilog_d
+from ..utils.artifacts import ArtifactStore
+from .placer_cache import hit_rate
 
 
 logger = logging.getLogger(__name__)
 
 
-def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_ILP, place_using_ILP, seed, use_analytical_placer, modules_d=None, ilp_solver, place_on_grid_constraints_json, placer_sa_iterations):
+def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_ILP, place_using_ILP, seed, use_analytical_placer, modules_d=None, ilp_solver, place_on_grid_constraints_json, placer_sa_iterations, placer_threads=1, placer_cache=None, module_d=None,
+          placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None):
+    """Place hierarchy node idx and check its layouts in; returns the annealing_stats of the run"""
+
+    current_node, hyper = setup_placer(DB=DB, idx=idx, lambda_coeff=lambda_coeff, select_in_ILP=select_in_ILP, place_using_ILP=place_using_ILP,
+                                       seed=seed, use_analytical_placer=use_analytical_placer, modules_d=modules_d, ilp_solver=ilp_solver,
+                                       place_on_grid_constraints_json=place_on_grid_constraints_json, placer_sa_iterations=placer_sa_iterations,
+                                       placer_threads=placer_threads, placer_sa_adaptive=placer_sa_adaptive, placer_sa_stall=placer_sa_stall,
+                                       placer_sa_block_iterations=placer_sa_block_iterations)
+
+    signature = placer_cache.prime(current_node, hyper, module_d) if placer_cache is not None else None
+
+    s = time.time()
+    curr_plc = PnR.PlacerIfc( current_node, numLayout, opath, effort, DB.getDrc_info(), hyper)
+    stats = annealing_stats(curr_plc, time.time() - s)
+
+    if placer_cache is not None:
+        placer_cache.record(signature, idx, curr_plc)
+
+    checkin_placements(DB=DB, fpath=fpath, numLayout=numLayout, idx=idx, nodes=[curr_plc.getNode(lidx) for lidx in range(curr_plc.getNodeVecSize())])
+
+    return stats
+
+
+def annealing_stats(curr_plc, runtime):
+    """Temperature steps a PnR.PlacerIfc run used of its budget, and the runtime saved at its rate per step"""
+    used, budget = curr_plc.getSAIterations(), curr_plc.getSABudget()
+    return {'sa_iterations': used, 'sa_budget': budget, 'runtime': runtime,
+            'time_saved': runtime * (budget - used) / used if used else 0.0}
+
+
+def setup_placer( *, DB, idx, lambda_coeff, select_in_ILP, place_using_ILP, seed, use_analytical_placer, modules_d=None, ilp_solver, place_on_grid_constraints_json, placer_sa_iterations, placer_threads=1,
+                  placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None):
+    """Check out hierarchy node idx and build the hyperparameters for PnR.PlacerIfc"""
 
     current_node = DB.CheckoutHierNode(idx,-1)
 
@@ -27,6 +65,9 @@ def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_
     # Defaults; change (and uncomment) as required
     hyper.T_INT = 0.5  # Increase for denormalized decision criteria
     hyper.T_MIN = 0.05
+    if placer_sa_block_iterations is not None:
+        # Small nodes do not need the full schedule
+        placer_sa_iterations = min(placer_sa_iterations, max(1, placer_sa_block_iterations*len(current_node.Blocks)))
     hyper.ALPHA = math.exp(math.log(hyper.T_MIN/hyper.T_INT)/placer_sa_iterations)
     # hyper.T_MIN = hyper.T_INT*(hyper.ALPHA**1e4)    # 10k iterations
     # hyper.ALPHA = 0.99925
@@ -34,11 +75,16 @@ def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_
     # hyper.max_cache_hit_count = 10
     hyper.SEED = seed  # if seed==0, C++ code will use its default value. Else, C++ code will use the provided value.
     # hyper.COUNT_LIMIT = 200
+    # Cooling driven by the acceptance ratio; stop once the best cost has not improved in SA_STALL trials
+    hyper.adaptive_cooling = placer_sa_adaptive
+    hyper.SA_STALL = placer_sa_stall
     hyper.select_in_ILP = select_in_ILP
     hyper.ilp_solver = 0 if ilp_solver == 'symphony' else 1
     hyper.LAMBDA = lambda_coeff
     hyper.use_analytical_placer = use_analytical_placer
     hyper.use_ILP_placer = place_using_ILP
+    # SA trials evaluated concurrently per step (ILP threads if 1)
+    hyper.NUM_THREADS = placer_threads
 
     hyper.place_on_grid_constraints_json = place_on_grid_constraints_json
 
@@ -48,15 +94,18 @@ def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_
     else:
         logger.info(f'Starting bottom-up placement on {DB.hierTree[idx].name} {idx}')
 
-    curr_plc = PnR.PlacerIfc( current_node, numLayout, opath, effort, DB.getDrc_info(), hyper)
+    return current_node, hyper
 
-    actualNumLayout = curr_plc.getNodeVecSize()
+
+def checkin_placements( *, DB, fpath, numLayout, idx, nodes):
+    """Check the layouts found by PnR.PlacerIfc back into hierarchy node idx"""
+
+    actualNumLayout = len(nodes)
 
     if actualNumLayout != numLayout:
         logger.debug( f'Placer did not provide numLayout ({numLayout} > {actualNumLayout}) layouts for {DB.hierTree[idx].name}')
 
-    for lidx in range(actualNumLayout):
-        node = curr_plc.getNode(lidx)
+    for node in nodes:
         if node.Guardring_Consts:
             logger.info( f'Running guardring flow')
             PnR.GuardRingIfc( node, DB.checkoutSingleLEF(), DB.getDrc_info(), fpath)
@@ -65,6 +114,79 @@ def place( *, DB, opath, fpath, numLayout, effort, idx, lambda_coeff, select_in_
 
     DB.hierTree[idx].numPlacement = actualNumLayout
 
+
+def run_placer_seeds( *, runs, numLayout, opath, effort, drc_info, idx=None, placer_cache=None, module_d=None):
+    """Run PnR.PlacerIfc once per (current_node, hyper) pair in runs, concurrently (it releases the GIL)
+
+    Returns the best numLayout placed nodes of all runs ranked by cost, the seed each of them came from,
+    and the best cost and annealing_stats of every run. The runs share placer_cache (under key idx) if given.
+    With several runs, each writes its .pl/.plt files to opath/seed_<SEED>/ rather than over the others.
+    """
+    def run(current_node, hyper):
+        run_opath = opath
+        if len(runs) > 1:
+            run_opath = f'{opath}seed_{hyper.SEED}/'
+            pathlib.Path(run_opath).mkdir(parents=True, exist_ok=True)
+        signature = placer_cache.prime(current_node, hyper, module_d) if placer_cache is not None else None
+        s = time.time()
+        curr_plc = PnR.PlacerIfc( current_node, numLayout, run_opath, effort, drc_info, hyper)
+        stats = annealing_stats(curr_plc, time.time() - s)
+        if placer_cache is not None:
+            placer_cache.record(signature, idx, curr_plc)
+        nodes = [curr_plc.getNode(lidx) for lidx in range(curr_plc.getNodeVecSize())]
+        return nodes, stats
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(runs)) as executor:
+        results = list(executor.map(lambda r: run(*r), runs))
+
+    ranked = [(k, lidx) for k, (run_nodes, _) in enumerate(results) for lidx in range(len(run_nodes))]
+    if len(runs) > 1:
+        # A single run keeps the placer's own order; sorted is stable, so ties keep the order of the runs
+        ranked = sorted(ranked, key=lambda p: results[p[0]][0][p[1]].cost)[:numLayout]
+    nodes = [results[k][0][lidx] for k, lidx in ranked]
+    seeds = [runs[k][1].SEED for k, _ in ranked]
+    stats = [{'seed': hyper.SEED, 'cost': min((node.cost for node in run_nodes), default=None), 'layouts': len(run_nodes), **run_stats}
+             for (_, hyper), (run_nodes, run_stats) in zip(runs, results)]
+    return nodes, seeds, stats
+
+
+def schedule_hierarchy(order, children, start, finish, *, max_workers):
+    """Run the nodes of a hierarchy on a thread pool, each as soon as all of its children are finished
+
+    order lists the nodes children first (as DB.TraverseHierTree does) and children(idx) the child nodes of idx.
+    start(idx) is called on this thread and returns the function to run in the pool; finish(idx, result) is
+    called on this thread too, so only the pool functions run concurrently. Nodes that finish together are
+    finished in the order they appear in order.
+    """
+    order = list(order)
+    position = {idx: i for i, idx in enumerate(order)}
+    waiting_on = {idx: {c for c in children(idx) if c in position} for idx in order}
+    parents = defaultdict(list)
+    for idx, deps in waiting_on.items():
+        for c in deps:
+            parents[c].append(idx)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def submit(idx):
+            running[executor.submit(start(idx))] = idx
+
+        for idx in order:
+            if not waiting_on[idx]:
+                submit(idx)
+
+        while running:
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: position[running[f]]):
+                idx = running.pop(future)
+                finish(idx, future.result())
+                for parent in parents[idx]:
+                    waiting_on[parent].discard(idx)
+                    if not waiting_on[parent]:
+                        submit(parent)
+
+
 def subset_verilog_d( verilog_d, nm):
     # Should be an abstract verilog_d; no concrete_instance_names
 
@@ -111,18 +233,23 @@ def scale_and_check_placement(*, placement_verilog_d, concrete_name, scale_facto
         check_place_on_grid(scaled_placement_verilog_d, concrete_name, opath)
     placement_verilog_alternatives[concrete_name] = scaled_placement_verilog_d
 
-def per_placement( placement_verilog_d, *, hN, scale_factor, opath, placement_verilog_alternatives, is_toplevel, metrics):
-    assert hN is not None
-    abstract_name = hN.name
+def placement_concrete_name( placement_verilog_d, abstract_name):
     concrete_names = { m['concrete_name'] for m in placement_verilog_d['modules'] if m['abstract_name'] == abstract_name}
     assert len(concrete_names) == 1, concrete_names
-    concrete_name = next(iter(concrete_names))
+    return next(iter(concrete_names))
+
+def per_placement( placement_verilog_d, *, hN, hpwl_alt, scale_factor, opath, placement_verilog_alternatives, is_toplevel, metrics):
+    assert hN is not None
+    abstract_name = hN.name
+    concrete_name = placement_concrete_name( placement_verilog_d, abstract_name)
 
     scale_and_check_placement( placement_verilog_d=placement_verilog_d, concrete_name=concrete_name, scale_factor=scale_factor, opath=opath, placement_verilog_alternatives=placement_verilog_alternatives, is_toplevel=is_toplevel)
-    
 
-    nets_d = gen_netlist( placement_verilog_d, concrete_name)
-    hpwl_alt = calculate_HPWL_from_placement_verilog_d( placement_verilog_d, concrete_name, nets_d, skip_globals=True)
+    if logger.isEnabledFor(logging.DEBUG):
+        # Cross-check the batched HPWL (computed top down) bottom up
+        hpwl_bottom_up = calculate_HPWL_from_placement_verilog_d_bottom_up( placement_verilog_d, concrete_name, skip_globals=True)
+        if hpwl_alt != hpwl_bottom_up:
+            logger.warning( f'HPWL calculated in different ways differ: top_down: {hpwl_alt} bottom_up: {hpwl_bottom_up}')
 
     if hpwl_alt != hN.HPWL_extend:
         logger.warning( f'hpwl: locally computed from netlist {hpwl_alt}, placer computed {hN.HPWL_extend} differ!')
@@ -142,6 +269,8 @@ def per_placement( placement_verilog_d, *, hN, scale_factor, opath, placement_ve
         'concrete_name': concrete_name
     }
 
+    return concrete_name
+
 
 def gen_leaf_map(*, DB):
     leaf_map = defaultdict(dict)
@@ -167,8 +296,14 @@ def startup_gui(*, top_level, leaf_map, placement_verilog_alternatives, lambda_c
 
     tagged_bboxes = defaultdict(dict)
 
+    # Alternatives of a node share its netlist
+    netlists = {}
+
     for concrete_name, placement_verilog_d in placement_verilog_alternatives.items():
-        nets_d = gen_netlist(placement_verilog_d, concrete_name)
+        abstract_name = metrics[concrete_name]['abstract_name']
+        if abstract_name not in netlists:
+            netlists[abstract_name] = gen_netlist(placement_verilog_d, concrete_name)
+        nets_d = netlists[abstract_name]
 
         def r2wh( r):
             return (round_to_angstroms(r[2]-r[0]), round_to_angstroms(r[3]-r[1]))
@@ -183,8 +318,6 @@ def r2wh( r):
 
         metrics[concrete_name].update( {'width': p[0], 'height': p[1]})
 
-        abstract_name = metrics[concrete_name]['abstract_name']
-
         tagged_bboxes[abstract_name][concrete_name] = metrics[concrete_name], list(gen_boxes_and_hovertext( gui_scaled_placement_verilog_d, concrete_name, nets_d)), nets_d
 
 
@@ -212,7 +345,7 @@ def r2wh( r):
 
 
 
-def process_placements(*, DB, verilog_d, lambda_coeff, scale_factor, opath):
+def process_placements(*, DB, verilog_d, lambda_coeff, scale_factor, opath, seed_stats=None, cache_stats=None, sa_stats=None):
 
     placement_verilog_alternatives = {}
     metrics = {}
@@ -225,11 +358,24 @@ def process_placements(*, DB, verilog_d, lambda_coeff, scale_factor, opath):
         # Restrict verilog_d to include only sub-hierachies of the current name
         s_verilog_d = subset_verilog_d( verilog_d, DB.hierTree[idx].name)
 
+        # create new verilog for each placement
+        hNs, placement_verilog_ds = [], []
         for sel in range(DB.hierTree[idx].numPlacement):
-            # create new verilog for each placement
-            hN = DB.CheckoutHierNode( idx, sel)
-            placement_verilog_d = gen_placement_verilog( hN, idx, sel, DB, s_verilog_d)
-            per_placement( placement_verilog_d, hN=hN, scale_factor=scale_factor, opath=opath, placement_verilog_alternatives=placement_verilog_alternatives, is_toplevel=is_toplevel, metrics=metrics)
+            hNs.append( DB.CheckoutHierNode( idx, sel))
+            placement_verilog_ds.append( gen_placement_verilog( hNs[-1], idx, sel, DB, s_verilog_d))
+
+        # The alternatives share the netlist of the node; compute their HPWLs together
+        alternatives = [ (d, placement_concrete_name( d, DB.hierTree[idx].name)) for d in placement_verilog_ds]
+        hpwls = FlatNetlist( gen_netlist( *alternatives[0])).hpwls( alternatives, skip_globals=True).tolist() if alternatives else []
+
+        for sel, (hN, placement_verilog_d, hpwl_alt) in enumerate(zip( hNs, placement_verilog_ds, hpwls)):
+            concrete_name = per_placement( placement_verilog_d, hN=hN, hpwl_alt=hpwl_alt, scale_factor=scale_factor, opath=opath, placement_verilog_alternatives=placement_verilog_alternatives, is_toplevel=is_toplevel, metrics=metrics)
+            if seed_stats and idx in seed_stats:
+                metrics[concrete_name].update( {'seed': seed_stats[idx]['seeds'][sel], 'seed_runs': seed_stats[idx]['runs']})
+            if cache_stats and idx in cache_stats:
+                metrics[concrete_name]['placer_cache'] = hit_rate(cache_stats[idx])
+            if sa_stats and idx in sa_stats:
+                metrics[concrete_name]['annealing'] = sa_stats[idx]
 
     leaf_map = gen_leaf_map(DB=DB)
     top_level = DB.hierTree[TraverseOrder[-1]].name
@@ -295,7 +441,9 @@ def update_grid_constraints(grid_constraints, DB, idx, verilog_d, primitives, sc
 
 def hierarchical_place(*, DB, opath, fpath, numLayout, effort, verilog_d,
                        lambda_coeff, scale_factor,
-                       placement_verilog_d, select_in_ILP, place_using_ILP, seed, use_analytical_placer, ilp_solver, primitives, placer_sa_iterations):
+                       placement_verilog_d, select_in_ILP, place_using_ILP, seed, use_analytical_placer, ilp_solver, primitives, placer_sa_iterations,
+                       placer_jobs=1, placer_seeds=1, placer_threads=1, placer_cache=None,
+                       placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None):
 
     logger.debug(f'Calling hierarchical_place with {"existing placement" if placement_verilog_d is not None else "no placement"}')
 
@@ -308,36 +456,126 @@ def hierarchical_place(*, DB, opath, fpath, numLayout, effort, verilog_d,
 
     grid_constraints = {}
 
-    for idx in DB.TraverseHierTree():
+    verilog_modules = {module['name']: module for module in verilog_d['modules']}
 
+    def place_kwargs(idx):
         json_str = json.dumps([{'concrete_name': k, 'constraints': v} for k, v in grid_constraints.items()], indent=2)
 
         modules_d = None
         if placement_verilog_d is not None:
             modules_d = modules[DB.hierTree[idx].name]
 
-        place(DB=DB, opath=opath, fpath=fpath, numLayout=numLayout, effort=effort, idx=idx,
-              lambda_coeff=lambda_coeff, select_in_ILP=select_in_ILP, place_using_ILP=place_using_ILP,
-              seed=seed, use_analytical_placer=use_analytical_placer,
-              modules_d=modules_d, ilp_solver=ilp_solver, place_on_grid_constraints_json=json_str,
-              placer_sa_iterations=placer_sa_iterations)
+        return dict(idx=idx, lambda_coeff=lambda_coeff, select_in_ILP=select_in_ILP, place_using_ILP=place_using_ILP,
+                    seed=seed, use_analytical_placer=use_analytical_placer,
+                    modules_d=modules_d, ilp_solver=ilp_solver, place_on_grid_constraints_json=json_str,
+                    placer_sa_iterations=placer_sa_iterations, placer_threads=placer_threads,
+                    placer_sa_adaptive=placer_sa_adaptive, placer_sa_stall=placer_sa_stall,
+                    placer_sa_block_iterations=placer_sa_block_iterations)
+
+    def cache_kwargs(idx):
+        return dict(placer_cache=placer_cache, module_d=verilog_modules.get(DB.hierTree[idx].name))
+
+    seed_stats = {}
+    sa_stats = {}
+
+    def report_annealing(idx, stats):
+        sa_stats[idx] = stats
+        if stats['sa_iterations'] < stats['sa_budget']:
+            logger.info(f'Annealed {DB.hierTree[idx].name} in {stats["sa_iterations"]} of {stats["sa_budget"]} temperature steps, '
+                        f'saving about {stats["time_saved"]:.2f}s')
+
+    if placer_jobs > 1 or placer_seeds > 1:
+        # Sibling sub-hierarchies are independent: run PnR.PlacerIfc (which releases the GIL) for every node whose
+        # children are placed, while checkout/checkin and the place_on_grid frontier stay on this thread
+        drc_info = DB.getDrc_info()
+
+        def start(idx):
+            kwargs = place_kwargs(idx)
+            runs = [setup_placer(DB=DB, **dict(kwargs, seed=seed+k)) for k in range(placer_seeds)]
+            return lambda: run_placer_seeds(runs=runs, numLayout=numLayout, opath=opath, effort=effort, drc_info=drc_info,
+                                            idx=idx, **cache_kwargs(idx))
+
+        def finish(idx, result):
+            nodes, seeds, stats = result
+            checkin_placements(DB=DB, fpath=fpath, numLayout=numLayout, idx=idx, nodes=nodes)
+            report_annealing(idx, {k: sum(run[k] for run in stats) for k in ('sa_iterations', 'sa_budget', 'runtime', 'time_saved')})
+            if placer_seeds > 1:
+                seed_stats[idx] = {'seeds': seeds, 'runs': stats}
+                logger.info(f'Placed {DB.hierTree[idx].name} with seeds {[run["seed"] for run in stats]}: '
+                            f'costs {[run["cost"] for run in stats]} runtimes {[round(run["runtime"], 2) for run in stats]}')
+            update_grid_constraints(grid_constraints, DB, idx, verilog_d, primitives, scale_factor)
+
+        def children(idx):
+            return {blk.child for blk in DB.hierTree[idx].Blocks if blk.child >= 0}
+
+        schedule_hierarchy(DB.TraverseHierTree(), children, start, finish, max_workers=placer_jobs)
 
-        update_grid_constraints(grid_constraints, DB, idx, verilog_d, primitives, scale_factor)
+    else:
+        for idx in DB.TraverseHierTree():
+
+            report_annealing(idx, place(DB=DB, opath=opath, fpath=fpath, numLayout=numLayout, effort=effort, **place_kwargs(idx), **cache_kwargs(idx)))
+
+            update_grid_constraints(grid_constraints, DB, idx, verilog_d, primitives, scale_factor)
 
 
     top_level, leaf_map, placement_verilog_alternatives, metrics = process_placements(DB=DB, verilog_d=verilog_d,
                                                                                       lambda_coeff=lambda_coeff, scale_factor=scale_factor,
-                                                                                      opath=opath)
+                                                                                      opath=opath, seed_stats=seed_stats,
+                                                                                      cache_stats=placer_cache.stats if placer_cache is not None else None,
+                                                                                      sa_stats=sa_stats)
 
     return top_level, leaf_map, placement_verilog_alternatives, metrics
 
 
+def replay_placement(*, DB, opath, fpath, effort, verilog_d, scale_factor, placement_verilog_d, primitives, placed_nodes=None):
+    """Check the placement placement_verilog_d into DB bottom up, without processing the placements as hierarchical_place does
+
+    placed_nodes caches the checked in nodes across calls on copies of the same DB, by the digest of the placement of
+    their sub-hierarchy: nodes found in it are checked in again rather than placed again through PnR.PlacerIfc.
+    """
+    hack_placement_verilog_d = scale_placement_verilog( placement_verilog_d, scale_factor, invert=True)
+
+    modules = defaultdict(list)
+    for m in hack_placement_verilog_d['modules']:
+        modules[m['abstract_name']].append(m)
+
+    grid_constraints = {}
+    digests = {}
+
+    for idx in DB.TraverseHierTree():
+        name = DB.hierTree[idx].name
+        json_str = json.dumps([{'concrete_name': k, 'constraints': v} for k, v in grid_constraints.items()], indent=2)
+        children = sorted(digests[blk.child] for blk in DB.hierTree[idx].Blocks if blk.child >= 0)
+        digests[idx] = hashlib.sha256(json.dumps([name, modules[name], json_str, children], sort_keys=True, default=str).encode()).hexdigest()
+
+        nodes = placed_nodes.get(digests[idx]) if placed_nodes is not None else None
+        if nodes is None:
+            current_node, hyper = setup_placer(DB=DB, idx=idx, lambda_coeff=1, select_in_ILP=False, place_using_ILP=False, seed=0,
+                                               use_analytical_placer=False, modules_d=modules[name], ilp_solver='symphony',
+                                               place_on_grid_constraints_json=json_str, placer_sa_iterations=10000)
+            curr_plc = PnR.PlacerIfc( current_node, 1, opath, effort, DB.getDrc_info(), hyper)
+            nodes = [curr_plc.getNode(lidx) for lidx in range(curr_plc.getNodeVecSize())]
+            checkin_placements(DB=DB, fpath=fpath, numLayout=1, idx=idx, nodes=nodes)
+            if placed_nodes is not None:
+                placed_nodes[digests[idx]] = [PnR.hierNode(node) for node in nodes]
+        else:
+            logger.debug(f'Checking in the placement of {name} replayed before')
+            for node in nodes:
+                DB.CheckinHierNode(idx, node)
+            DB.hierTree[idx].numPlacement = len(nodes)
+
+        update_grid_constraints(grid_constraints, DB, idx, verilog_d, primitives, scale_factor)
+
 
 def placer_driver(*, cap_map, cap_lef_s,
                   lambda_coeff, scale_factor,
                   select_in_ILP, place_using_ILP, seed,
                   use_analytical_placer, ilp_solver, primitives, toplevel_args_d, results_dir,
-                  placer_sa_iterations):
+                  placer_sa_iterations, placer_jobs=1, placer_seeds=1, placer_threads=1, placer_cache=None,
+                  placer_sa_adaptive=False, placer_sa_stall=1000, placer_sa_block_iterations=None, store=None):
+
+    if store is None:
+        store = ArtifactStore()
 
     fpath = toplevel_args_d['input_dir']
 
@@ -349,24 +587,19 @@ def placer_driver(*, cap_map, cap_lef_s,
     p = re.compile(r'^(\S+)\s+(\S+)\s*$')
 
     map_d_in = []
-    with (idir/map_file).open("rt") as fp:
-        for line in fp:
-            line = line.rstrip('\n')
-            m = p.match(line)
-            assert m
-            map_d_in.append(m.groups())
+    for line in store.read(idir/map_file).splitlines():
+        m = p.match(line)
+        assert m
+        map_d_in.append(m.groups())
 
     lef_s_in = None
     if cap_map:
         map_d_in.extend(cap_map)
 
-        with (idir/lef_file).open("rt") as fp:
-            lef_s_in = fp.read()
-
-        lef_s_in += cap_lef_s
+        lef_s_in = store.read(idir/lef_file) + cap_lef_s
 
 
-    DB, verilog_d, new_fpath, opath, numLayout, effort = gen_DB_verilog_d(toplevel_args_d=toplevel_args_d, results_dir=results_dir, map_d_in=map_d_in, lef_s_in=lef_s_in)
+    DB, verilog_d, new_fpath, opath, numLayout, effort = gen_DB_verilog_d(toplevel_args_d=toplevel_args_d, results_dir=results_dir, map_d_in=map_d_in, lef_s_in=lef_s_in, store=store)
 
     assert new_fpath == fpath
 
@@ -379,6 +612,10 @@ def placer_driver(*, cap_map, cap_lef_s,
                                                                                       select_in_ILP=select_in_ILP, place_using_ILP=place_using_ILP, seed=seed,
                                                                                       use_analytical_placer=use_analytical_placer, ilp_solver=ilp_solver,
                                                                                       primitives=primitives,
-                                                                                      placer_sa_iterations=placer_sa_iterations)
+                                                                                      placer_sa_iterations=placer_sa_iterations,
+                                                                                      placer_jobs=placer_jobs, placer_seeds=placer_seeds,
+                                                                                      placer_threads=placer_threads, placer_cache=placer_cache,
+                                                                                      placer_sa_adaptive=placer_sa_adaptive, placer_sa_stall=placer_sa_stall,
+                                                                                      placer_sa_block_iterations=placer_sa_block_iterations)
 
     return top_level, leaf_map, placement_verilog_alternatives, metrics
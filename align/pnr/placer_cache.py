@@ -0,0 +1,140 @@
+"""Persistent cache of simulated annealing evaluations
+
+The placer evaluates each sequence pair it visits with an ILP. PlacerCache keeps those evaluations
+(cost and block coordinates, serialized by ILP_solver::Serialize) in an SQLite file so that later runs
+and other processes placing the same hierarchy node skip the ILPs they have already solved.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from ..primitive.cache import source_digest
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Bump when the serialized evaluations or the signature change
+CACHE_VERSION = 1
+
+_schema = '''CREATE TABLE IF NOT EXISTS evaluations (
+    signature TEXT NOT NULL,
+    seqpair TEXT NOT NULL,
+    evaluation TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (signature, seqpair))'''
+
+
+class PlacerCache:
+    """SQLite store of SA evaluations keyed by (node signature, sequence pair)
+
+    The signature hashes the node (its block instances with their sizes and pins, and its nets and constraints
+    from the verilog module), the hyperparameters that change the ILP, and the PDK. Least recently used entries
+    are evicted once the evaluations grow past max_size bytes. stats maps each key passed to record (the
+    hierarchy index) to the number of cache hits and misses of its runs.
+    """
+
+    def __init__(self, path, max_size=None, pdk_dir=None):
+        self.path = str(path)
+        self.max_size = max_size
+        self.pdk_digest = source_digest(pdk_dir) if pdk_dir is not None else ''
+        self.stats = {}
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(_schema)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # A connection per call: placer runs record from several threads, and other processes share the file
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def signature(self, current_node, hyper, module_d=None):
+        h = hashlib.sha256()
+        h.update(str(CACHE_VERSION).encode())
+        h.update(self.pdk_digest.encode())
+        h.update(current_node.name.encode())
+        for blk in current_node.Blocks:
+            for inst in blk.instance:
+                pins = inst.export_pin_rects()
+                h.update(json.dumps([inst.name, inst.master, inst.width, inst.height,
+                                     pins['pins'], pins['rects'].tolist()]).encode())
+        h.update(json.dumps(module_d, sort_keys=True, default=str).encode())
+        # LAMBDA weights the HPWL terms of the ILP objective, so it changes the solved coordinates and not
+        # only the cost: evaluations cannot be re-weighted across lambda_coeff values
+        h.update(json.dumps([hyper.LAMBDA, hyper.ilp_solver, hyper.select_in_ILP, hyper.use_ILP_placer,
+                             hyper.place_on_grid_constraints_json]).encode())
+        return h.hexdigest()
+
+    def load(self, signature):
+        """dict of sequence pair key to serialized evaluation for the node with this signature"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('UPDATE evaluations SET used = ? WHERE signature = ?', (time.time(), signature))
+            return dict(conn.execute('SELECT seqpair, evaluation FROM evaluations WHERE signature = ?', (signature,)))
+        finally:
+            conn.close()
+
+    def store(self, signature, evaluations):
+        if not evaluations:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany('INSERT OR IGNORE INTO evaluations VALUES (?, ?, ?, ?)',
+                                 ((signature, k, v, now) for k, v in evaluations.items()))
+                self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        if self.max_size is None:
+            return
+        (total,) = conn.execute('SELECT COALESCE(SUM(LENGTH(seqpair) + LENGTH(evaluation)), 0) FROM evaluations').fetchone()
+        if total <= self.max_size:
+            return
+        # Whole nodes go at once (a run loads all evaluations of its node), least recently used first
+        for signature, size in conn.execute('SELECT signature, SUM(LENGTH(seqpair) + LENGTH(evaluation)) FROM evaluations '
+                                            'GROUP BY signature ORDER BY MAX(used), MIN(rowid)').fetchall():
+            if total <= self.max_size:
+                break
+            logger.debug(f'Evicting placer cache entries of {signature}')
+            conn.execute('DELETE FROM evaluations WHERE signature = ?', (signature,))
+            total -= size
+
+    def prime(self, current_node, hyper, module_d=None):
+        """Hand the cached evaluations of current_node to the placer; returns the signature to record under
+
+        Returns None (and leaves hyper alone) when the placer does not run SA: placements read from JSON or
+        found by the analytical placer.
+        """
+        if hyper.use_external_placement_info or hyper.use_analytical_placer:
+            return None
+        signature = self.signature(current_node, hyper, module_d)
+        hyper.use_sa_cache = True
+        hyper.sa_cache = self.load(signature)
+        return signature
+
+    def record(self, signature, key, plc):
+        """Store the new evaluations of PnR.PlacerIfc plc and add its hits and misses to stats[key]"""
+        if signature is None:
+            return
+        self.store(signature, plc.getNewEvaluations())
+        with self._lock:
+            s = self.stats.setdefault(key, {'hits': 0, 'misses': 0})
+            s['hits'] += plc.getCacheHits()
+            s['misses'] += plc.getCacheMisses()
+
+
+def hit_rate(stats):
+    """metrics entry of the hits and misses of a node"""
+    lookups = stats['hits'] + stats['misses']
+    return dict(stats, hit_rate=stats['hits'] / lookups if lookups else None)
@@ -57,11 +57,10 @@ def traverse( hN, sel):
             else:
                 
                 pinterminals = defaultdict(list)
-                for pin in inst.blockPins:
-                    pinname = pin.name
-                    for contact in pin.pinContacts:
-                        b = contact.originBox
-                        pinterminals[pinname].append( (b.LL.x, b.LL.y, b.UR.x, b.UR.y))
+                pr = inst.export_pin_rects()
+                a = pr['rects']
+                for (pin, llx, lly, urx, ury) in zip(*(a[f].tolist() for f in a.dtype.names)):
+                    pinterminals[pr['pins'][pin]].append( (llx, lly, urx, ury))
 
                 concrete_template_name = pathlib.Path(inst.gdsFile).stem
                 if concrete_template_name not in used_leaves[abstract_template_name]:                
@@ -1,27 +1,35 @@
+import hashlib
 import logging
 import pathlib
 import json
 import re
+import threading
 
 from collections import defaultdict
 
 from .. import PnR
 from .manipulate_hierarchy import change_concrete_names_for_routing, gen_abstract_verilog_d, connectivity_change_for_partial_routing
 
-from .build_pnr_model import gen_DB_verilog_d
-from .placer import hierarchical_place
+from .build_pnr_model import PnRdatabase, results_opath
+from .placer import replay_placement
+from ..utils.artifacts import ArtifactStore
 
 logger = logging.getLogger(__name__)
 
+# PnRdatabase parsed for the routing hierarchy last seen (by the digest of its inputs), and the nodes placed in
+# copies of it (see replay_placement); shared by the threads of a process
+_routing_DB = {}
+_routing_DB_lock = threading.Lock()
+
 Omark, NType = PnR.Omark, PnR.NType
 TransformType = PnR.TransformType
 
-def route_single_variant( DB, drcInfo, current_node, lidx, opath, adr_mode, *, PDN_mode, return_name=None, noGDS=False, noExtra=False):
+def route_single_variant( DB, drcInfo, current_node, lidx, opath, adr_mode, *, PDN_mode, fpath='./inputs', return_name=None, noGDS=False, noExtra=False):
 
     # Hack to read in default layers
     # This can be removed once default and per net layer restrictions are handled in the router
 
-    ipath = pathlib.Path("./inputs")
+    ipath = pathlib.Path(fpath)
     pnr_constraint_fn = ipath / f'{current_node.name}.pnr.const.json'
     assert pnr_constraint_fn.exists()
 
@@ -101,8 +109,8 @@ def RouteWork( mode, current_node, *, metal_l=signal_routing_metal_l, metal_u=si
         if PDN_mode:
             current_node_copy = PnR.hierNode(current_node)
 
-            current_file = "InputCurrent_initial.txt"
-            power_mesh_conffile = "Power_Grid_Conf.txt"
+            current_file = f"{opath}InputCurrent_initial.txt"
+            power_mesh_conffile = f"{opath}Power_Grid_Conf.txt"
             dataset_generation = True
             if dataset_generation:
                 total_current = 0.036
@@ -116,8 +124,8 @@ def RouteWork( mode, current_node, *, metal_l=signal_routing_metal_l, metal_u=si
             RouteWork(7, current_node_copy, metal_l=power_grid_metal_l, metal_u=power_grid_metal_u, fn=power_mesh_conffile)
 
             logger.info("Start MNA ")
-            output_file_IR = "IR_drop.txt"
-            output_file_EM = "EM.txt"
+            output_file_IR = f"{opath}IR_drop.txt"
+            output_file_EM = f"{opath}EM.txt"
             Test_MNA = PnR.MNASimulationIfc(current_node_copy, drcInfo, current_file, output_file_IR, output_file_EM)
             worst = Test_MNA.Return_Worst_Voltage()
             logger.info(f"worst voltage is {worst}")
@@ -164,7 +172,7 @@ def RouteWork( mode, current_node, *, metal_l=signal_routing_metal_l, metal_u=si
 
     return return_name
 
-def route_bottom_up( *, DB, idx, opath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
+def route_bottom_up( *, DB, idx, opath, fpath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
 
     if placements_to_run is None:
         placements_to_run = list(range(min(nroutings, DB.hierTree[idx].numPlacement)))
@@ -221,7 +229,7 @@ def aux(idx, sel):
                     blk.child = new_currentnode_idx_d[child_idx][inst_idx]
 
             return_name = f'{current_node.name}_{j}'
-            result_name = route_single_variant( DB, DB.getDrc_info(), current_node, j, opath, adr_mode, PDN_mode=PDN_mode, return_name=return_name, noGDS=skipGDS, noExtra=skipGDS)
+            result_name = route_single_variant( DB, DB.getDrc_info(), current_node, j, opath, adr_mode, PDN_mode=PDN_mode, fpath=fpath, return_name=return_name, noGDS=skipGDS, noExtra=skipGDS)
 
             DB.AppendToHierTree(current_node)
 
@@ -237,14 +245,14 @@ def aux(idx, sel):
 
     return results_name_map
 
-def route_no_op( *, DB, idx, opath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
+def route_no_op( *, DB, idx, opath, fpath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
     results_name_map = {}
     return results_name_map
 
 def route_top_down_aux( DB, drcInfo,
                         bounding_box,
                         current_node_ort, idx, lidx, sel,
-                        opath, adr_mode, *, PDN_mode, results_name_map, hierarchical_path, skipGDS):
+                        opath, adr_mode, *, PDN_mode, fpath, results_name_map, hierarchical_path, skipGDS):
 
     current_node = DB.CheckoutHierNode(idx, sel) # Make a copy
     i_copy = DB.hierTree[idx].n_copy
@@ -265,11 +273,11 @@ def route_top_down_aux( DB, drcInfo,
         childnode_orient = DB.RelOrt2AbsOrt( current_node_ort, inst.orient)
         child_node_name = DB.hierTree[child_idx].name
         childnode_bbox = PnR.bbox( inst.placedBox.LL, inst.placedBox.UR)
-        new_childnode_idx = route_top_down_aux(DB, drcInfo, childnode_bbox, childnode_orient, child_idx, lidx, blk.selectedInstance, opath, adr_mode, PDN_mode=PDN_mode, results_name_map=results_name_map, hierarchical_path=hierarchical_path + (inst.name,), skipGDS=skipGDS)
+        new_childnode_idx = route_top_down_aux(DB, drcInfo, childnode_bbox, childnode_orient, child_idx, lidx, blk.selectedInstance, opath, adr_mode, PDN_mode=PDN_mode, fpath=fpath, results_name_map=results_name_map, hierarchical_path=hierarchical_path + (inst.name,), skipGDS=skipGDS)
         DB.CheckinChildnodetoBlock(current_node, bit, DB.hierTree[new_childnode_idx], DB.hierTree[new_childnode_idx].abs_orient)
         blk.child = new_childnode_idx
 
-    result_name = route_single_variant( DB, drcInfo, current_node, lidx, opath, adr_mode, PDN_mode=PDN_mode, noGDS=skipGDS, noExtra=skipGDS)
+    result_name = route_single_variant( DB, drcInfo, current_node, lidx, opath, adr_mode, PDN_mode=PDN_mode, fpath=fpath, noGDS=skipGDS, noExtra=skipGDS)
 
     #results_name_map[result_name] = hierarchical_path
 
@@ -299,7 +307,7 @@ def route_top_down_aux( DB, drcInfo,
 
     return new_currentnode_idx
 
-def route_top_down( *, DB, idx, opath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
+def route_top_down( *, DB, idx, opath, fpath, adr_mode, PDN_mode, skipGDS, placements_to_run, nroutings):
     assert len(DB.hierTree[idx].PnRAS) == DB.hierTree[idx].numPlacement
 
     if placements_to_run is None:
@@ -314,14 +322,14 @@ def route_top_down( *, DB, idx, opath, adr_mode, PDN_mode, skipGDS, placements_t
                                                         PnR.point(DB.hierTree[idx].PnRAS[lidx].width,
                                                                   DB.hierTree[idx].PnRAS[lidx].height)),
                                               Omark.N, idx, lidx, sel,
-                                              opath, adr_mode, PDN_mode=PDN_mode, results_name_map=results_name_map,
+                                              opath, adr_mode, PDN_mode=PDN_mode, fpath=fpath, results_name_map=results_name_map,
                                               hierarchical_path=(f'{DB.hierTree[idx].name}:placement_{lidx}',),
                                               skipGDS=skipGDS
         )
         new_topnode_indices.append(new_topnode_idx)
     return results_name_map
 
-def route( *, DB, idx, opath, adr_mode, PDN_mode, router_mode, skipGDS, placements_to_run, nroutings):
+def route( *, DB, idx, opath, fpath, adr_mode, PDN_mode, router_mode, skipGDS, placements_to_run, nroutings):
     logger.info(f'Starting {router_mode} routing on {DB.hierTree[idx].name} {idx} restricted to {placements_to_run}')
 
     router_engines = { 'top_down': route_top_down,
@@ -329,12 +337,58 @@ def route( *, DB, idx, opath, adr_mode, PDN_mode, router_mode, skipGDS, placemen
                        'no_op': route_no_op
                        }
 
-    return router_engines[router_mode]( DB=DB, idx=idx, opath=opath, adr_mode=adr_mode, PDN_mode=PDN_mode, skipGDS=skipGDS, placements_to_run=placements_to_run, nroutings=nroutings)
+    return router_engines[router_mode]( DB=DB, idx=idx, opath=opath, fpath=fpath, adr_mode=adr_mode, PDN_mode=PDN_mode, skipGDS=skipGDS, placements_to_run=placements_to_run, nroutings=nroutings)
+
+def _routing_DB_digest(toplevel_args_d, *, abstract_verilog_d, map_d_in, lef_s_in, store):
+    """Digest of everything PnRdatabase reads to build the routing DB of a placement"""
+    d = pathlib.Path(toplevel_args_d['input_dir'])
+    pdk_file = d / toplevel_args_d['pdk_file']
+    lef_s = lef_s_in
+    if lef_s is None and store.exists(d / toplevel_args_d['lef_file']):
+        lef_s = store.read(d / toplevel_args_d['lef_file'])
+
+    # Constraint files of the modules, and primitive files of the LEF macros (see _attach_constraint_files)
+    names = [f'{module["name"]}.pnr.const.json' for module in abstract_verilog_d['modules']]
+    names.extend(f'{macro}.json' for macro in re.findall(r'^\s*MACRO\s+(\S+)', lef_s or '', re.MULTILINE))
+
+    h = hashlib.sha256()
+    h.update(json.dumps([toplevel_args_d, str(pdk_file), store.mtime(pdk_file), lef_s, map_d_in], default=str).encode())
+    h.update(abstract_verilog_d.json(sort_keys=True).encode())
+    for name in names:
+        h.update(json.dumps([name, store.read(d / name) if store.exists(d / name) else None]).encode())
+    return h.hexdigest()
+
+def _routing_DB_copy(toplevel_args_d, *, abstract_verilog_d, map_d_in, lef_s_in, store):
+    """Copy of the routing DB of a placement, with the placed nodes cache to replay the placement into it
+
+    The DB is only parsed (verilog, constraints and primitives) when its inputs differ from the previous call, so
+    routing several placements of a hierarchy, in the serial flow or in a reused worker process, starts from a snapshot.
+    """
+    key = _routing_DB_digest(toplevel_args_d, abstract_verilog_d=abstract_verilog_d, map_d_in=map_d_in, lef_s_in=lef_s_in, store=store)
+    with _routing_DB_lock:
+        if _routing_DB.get('key') != key:
+            DB, new_verilog_d = PnRdatabase(toplevel_args_d['input_dir'], toplevel_args_d['subckt'], toplevel_args_d['verilog_file'],
+                                            toplevel_args_d['lef_file'], toplevel_args_d['map_file'], toplevel_args_d['pdk_file'],
+                                            verilog_d_in=abstract_verilog_d, map_d_in=map_d_in, lef_s_in=lef_s_in, store=store)
+
+            assert new_verilog_d == abstract_verilog_d
+
+            _routing_DB.clear()
+            _routing_DB.update(key=key, DB=DB, placed_nodes={})
+        else:
+            logger.debug(f'Reusing the routing DB of {toplevel_args_d["subckt"]}')
+        return PnR.PnRdatabase(_routing_DB['DB']), _routing_DB['placed_nodes']
 
 def router_driver(*, cap_map, cap_lef_s, 
                   numLayout, effort, adr_mode, PDN_mode,
                   router_mode, skipGDS, scale_factor,
-                  nroutings, primitives, toplevel_args_d, results_dir, verilog_ds_to_run):
+                  nroutings, primitives, toplevel_args_d, results_dir, verilog_ds_to_run, store=None):
+
+    if store is None:
+        store = ArtifactStore()
+    else:
+        # The router reads the leaf gds.json files from the input directory
+        store.flush()
 
     fpath = toplevel_args_d['input_dir']
         
@@ -353,13 +407,11 @@ def router_driver(*, cap_map, cap_lef_s,
 
             abstract_verilog_file = verilog_file.replace(".verilog.json", ".abstract_verilog.json")
 
-            with (pathlib.Path(fpath)/abstract_verilog_file).open("wt") as fp:
-                json.dump(abstract_verilog_d.dict(), fp=fp, indent=2, default=str)
+            store.put_json(pathlib.Path(fpath)/abstract_verilog_file, abstract_verilog_d.dict(), indent=2, default=str)
                 
             scaled_placement_verilog_file = verilog_file.replace(".verilog.json", ".scaled_placement_verilog.json")
 
-            with (pathlib.Path(fpath)/scaled_placement_verilog_file).open("wt") as fp:
-                json.dump(scaled_placement_verilog_d.dict(), fp=fp, indent=2, default=str)
+            store.put_json(pathlib.Path(fpath)/scaled_placement_verilog_file, scaled_placement_verilog_d.dict(), indent=2, default=str)
 
 
         lef_file = toplevel_args_d['lef_file']
@@ -378,40 +430,31 @@ def router_driver(*, cap_map, cap_lef_s,
             ctn = leaf['concrete_name']
             if ctn in cap_ctns:
                 map_d_in.append((ctn,cap_ctns[ctn]))
-            elif (idir/f'{ctn}.json').exists():
+            elif store.exists(idir/f'{ctn}.json'):
                 map_d_in.append((ctn,str(idir/f'{ctn}.gds')))
             else:
                 logger.error(f'Missing .lef file for {ctn}')
 
         lef_s_in = None
         if cap_map:
-            with (idir/new_lef_file).open("rt") as fp:
-                lef_s_in = fp.read()
-            lef_s_in += cap_lef_s
-
+            lef_s_in = store.read(idir/new_lef_file) + cap_lef_s
 
-        # create a fresh DB and populate it with a placement verilog d    
 
-        DB, new_verilog_d, new_fpath, opath, _, _ = gen_DB_verilog_d(toplevel_args_d, results_dir, verilog_d_in=abstract_verilog_d, map_d_in=map_d_in, lef_s_in=lef_s_in)
-        
-        assert new_verilog_d == abstract_verilog_d
+        # start from a copy of the DB parsed for this hierarchy and populate it with a placement verilog d
 
-        assert new_fpath == fpath
+        DB, placed_nodes = _routing_DB_copy(toplevel_args_d, abstract_verilog_d=abstract_verilog_d, map_d_in=map_d_in, lef_s_in=lef_s_in, store=store)
+        opath = results_opath(results_dir)
 
         # populate new DB with placements to run
 
-        hierarchical_place(DB=DB, opath=opath, fpath=fpath, numLayout=1, effort=effort,
-                           verilog_d=abstract_verilog_d, lambda_coeff=1,
-                           scale_factor=scale_factor,
-                           placement_verilog_d=scaled_placement_verilog_d.dict(),
-                           select_in_ILP=False, place_using_ILP=False, seed=0,
-                           use_analytical_placer=False, ilp_solver='symphony',
-                           primitives=primitives,
-                           placer_sa_iterations=10000)
+        replay_placement(DB=DB, opath=opath, fpath=fpath, effort=effort,
+                         verilog_d=abstract_verilog_d, scale_factor=scale_factor,
+                         placement_verilog_d=scaled_placement_verilog_d.dict(),
+                         primitives=primitives, placed_nodes=placed_nodes)
 
         placements_to_run = None
 
-        res = route( DB=DB, idx=DB.TraverseHierTree()[-1], opath=opath, adr_mode=adr_mode, PDN_mode=PDN_mode,
+        res = route( DB=DB, idx=DB.TraverseHierTree()[-1], opath=opath, fpath=fpath, adr_mode=adr_mode, PDN_mode=PDN_mode,
                      router_mode=router_mode, skipGDS=skipGDS, placements_to_run=placements_to_run, nroutings=nroutings)
 
         res_dict.update(res)
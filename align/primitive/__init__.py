@@ -1 +1,2 @@
 from .main import generate_primitives, generate_primitive
+from .cache import PrimitiveCache
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+
+import logging
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SUFFIXES = ('.json', '.lef', '.placement_lef', '.gds.json')
+
+# align packages the generators depend on (the generators themselves, the canvas, the primitive and
+# constraint schema, and the built-in PDK generators)
+GENERATOR_SOURCES = ('primitive', 'cell_fabric', 'schema', 'pdk')
+
+_source_digests = {}
+
+
+def _digest_tree(root, h):
+    """Feed the relative path and contents of every file under root into h"""
+    root = pathlib.Path(root)
+    for path in sorted(p for p in root.rglob('*') if p.is_file() and '__pycache__' not in p.parts):
+        h.update(str(path.relative_to(root)).encode())
+        h.update(b'\0')
+        h.update(path.read_bytes())
+        h.update(b'\0')
+
+
+def source_digest(root):
+    """Digest of a directory tree (PDK or generator sources), computed once per process"""
+    root = str(pathlib.Path(root).resolve())
+    if root not in _source_digests:
+        h = hashlib.sha256()
+        _digest_tree(root, h)
+        _source_digests[root] = h.hexdigest()
+    return _source_digests[root]
+
+
+class PrimitiveCache:
+    """Content-addressed store of generated primitive artifacts
+
+    An entry is keyed by a hash of the block name, its generator arguments, the primitive definition,
+    the PDK directory contents and the align sources in GENERATOR_SOURCES. It holds the
+    <block>.json/.lef/.placement_lef/.gds.json files plus the (updated) block_args and metadata.
+    Least recently used entries are evicted once the cache grows past max_size bytes.
+    """
+
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, block_name, block_args, primitive_def, pdk_dir):
+        align_dir = pathlib.Path(__file__).resolve().parent.parent
+        h = hashlib.sha256()
+        h.update(block_name.encode())
+        h.update(json.dumps(block_args, sort_keys=True, default=str).encode())
+        if not isinstance(primitive_def, str):
+            primitive_def = json.dumps(primitive_def.dict(), sort_keys=True, default=str)
+        h.update(primitive_def.encode())
+        h.update(source_digest(pdk_dir).encode())
+        for package in GENERATOR_SOURCES:
+            h.update(source_digest(align_dir / package).encode())
+        return h.hexdigest()
+
+    def fetch(self, key, block_name, outputdir):
+        """Copy the artifacts of a cached entry into outputdir; return (block_args, metadata) or None on a miss"""
+        entry_dir = self.cache_dir / key
+        try:
+            with (entry_dir / 'entry.json').open('rt') as fp:
+                entry = json.load(fp)
+            for suffix in ARTIFACT_SUFFIXES:
+                shutil.copyfile(entry_dir / f'artifact{suffix}', outputdir / f'{block_name}{suffix}')
+        except (OSError, ValueError):
+            return None
+        os.utime(entry_dir)
+        logger.debug(f'Primitive cache hit for {block_name} ({key})')
+        return entry['block_args'], entry['metadata']
+
+    def store(self, key, block_name, outputdir, block_args, metadata):
+        entry_dir = self.cache_dir / key
+        if entry_dir.exists():
+            return
+        tmp_dir = pathlib.Path(tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp'))
+        try:
+            for suffix in ARTIFACT_SUFFIXES:
+                shutil.copyfile(outputdir / f'{block_name}{suffix}', tmp_dir / f'artifact{suffix}')
+            with (tmp_dir / 'entry.json').open('wt') as fp:
+                json.dump({'block_name': block_name, 'block_args': block_args, 'metadata': metadata}, fp=fp, indent=2)
+            # Concurrent writers of the same key produce identical entries; the first rename wins
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not entry_dir.exists():
+                raise
+        self.evict()
+
+    def entries(self):
+        """List of (mtime, size, path) of the cache entries"""
+        result = []
+        for entry_dir in self.cache_dir.iterdir():
+            if entry_dir.name.startswith('.') or not entry_dir.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                result.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except OSError:
+                continue
+        return result
+
+    def evict(self):
+        if self.max_size is None:
+            return
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_size:
+                break
+            logger.debug(f'Evicting primitive cache entry {entry_dir.name}')
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
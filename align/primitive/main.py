@@ -4,9 +4,12 @@
 from ..cell_fabric import gen_lef
 from ..schema.subcircuit import SubCircuit
 from ..schema import constraint
+from ..schema.library import read_lib_data
 from ..compiler.util import get_generator
+import concurrent.futures
 import copy
 import datetime
+import json
 import pathlib
 import logging
 import importlib.util
@@ -132,25 +135,71 @@ def generate_generic(pdkdir, parameters, netlistdir=None):
     return uc, parameters["ports"]
 
 
-def generate_primitives(primitive_lib, pdk_dir, primitive_dir, netlist_dir):
+def generate_primitives(primitive_lib, pdk_dir, primitive_dir, netlist_dir, primitive_jobs=1, primitive_cache=None):
     primitives = dict()
     for primitive in primitive_lib:
         if isinstance(primitive, SubCircuit):
             generate_primitive_param(primitive, primitives, pdk_dir)
-    for block_name, block_args in primitives.items():
-        if block_args['primitive'] != 'generic' and block_args['primitive'] != 'guard_ring':
-            primitive_def = primitive_lib.find(block_args['abstract_template_name'])
-            assert primitive_def is not None, f"unavailable primitive definition {block_name} of type {block_args['abstract_template_name']}"
-        else:
-            primitive_def = block_args['primitive']
-        block_args.pop("primitive", None)
-        uc = generate_primitive(block_name, primitive_def,  ** block_args,
-                                pdkdir=pdk_dir, outputdir=primitive_dir, netlistdir=netlist_dir)
-        if hasattr(uc, 'metadata'):
-            primitives[block_name]['metadata'] = copy.deepcopy(uc.metadata)
+
+    if primitive_jobs > 1 and len(primitives) > 1:
+        # Library objects don't pickle; ship the same data as __primitives_library__.json instead
+        lib_data = json.dumps(primitive_lib.dict()["__root__"])
+        jobs = [(block_name, block_args, pdk_dir, primitive_dir, netlist_dir, primitive_cache) for block_name, block_args in primitives.items()]
+        logger.info(f"Generating {len(jobs)} primitives using {primitive_jobs} processes")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=primitive_jobs, initializer=_init_primitive_worker, initargs=(lib_data,)) as executor:
+            # map returns results in submission order so the merged metadata is deterministic
+            for (block_name, *_), (block_args, metadata) in zip(jobs, executor.map(_generate_primitive_job, jobs)):
+                primitives[block_name] = block_args
+                if metadata is not None:
+                    primitives[block_name]['metadata'] = metadata
+    else:
+        for block_name, block_args in primitives.items():
+            block_args, metadata = _generate_block(primitive_lib, block_name, block_args, pdk_dir, primitive_dir, netlist_dir, primitive_cache)
+            primitives[block_name] = block_args
+            if metadata is not None:
+                primitives[block_name]['metadata'] = metadata
     return primitives
 
 
+def _generate_block(primitive_lib, block_name, block_args, pdk_dir, primitive_dir, netlist_dir, primitive_cache=None):
+    """Generate (or fetch from primitive_cache) one primitive; return the updated block_args and the metadata"""
+    if block_args['primitive'] != 'generic' and block_args['primitive'] != 'guard_ring':
+        primitive_def = primitive_lib.find(block_args['abstract_template_name'])
+        assert primitive_def is not None, f"unavailable primitive definition {block_name} of type {block_args['abstract_template_name']}"
+    else:
+        primitive_def = block_args['primitive']
+
+    # Generic primitives may read arbitrary files from the netlist directory, so they are never cached
+    key = None
+    if primitive_cache is not None and primitive_def != 'generic':
+        key = primitive_cache.key(block_name, block_args, primitive_def, pdk_dir)
+        hit = primitive_cache.fetch(key, block_name, primitive_dir)
+        if hit is not None:
+            return hit
+
+    block_args.pop("primitive", None)
+    uc = generate_primitive(block_name, primitive_def,  ** block_args,
+                            pdkdir=pdk_dir, outputdir=primitive_dir, netlistdir=netlist_dir)
+    metadata = copy.deepcopy(uc.metadata) if hasattr(uc, 'metadata') else None
+    if key is not None:
+        primitive_cache.store(key, block_name, primitive_dir, block_args, metadata)
+    return block_args, metadata
+
+
+_worker_primitive_lib = None
+
+
+def _init_primitive_worker(lib_data):
+    global _worker_primitive_lib
+    _worker_primitive_lib = read_lib_data(json.loads(lib_data))
+
+
+def _generate_primitive_job(job):
+    """Generate one primitive in a worker process"""
+    (block_name, block_args, pdk_dir, primitive_dir, netlist_dir, primitive_cache) = job
+    return _generate_block(_worker_primitive_lib, block_name, block_args, pdk_dir, primitive_dir, netlist_dir, primitive_cache)
+
+
 def generate_primitive_param(subckt: SubCircuit, primitives: list, pdk_dir: pathlib.Path, uniform_height=False):
     """ Return commands to generate parameterized lef"""
     assert isinstance(subckt, SubCircuit), f"invalid input for primitive generator {subckt}"
@@ -1,6 +1,7 @@
 import z3
 import abc
 import collections
+import threading
 
 import logging
 logger = logging.getLogger(__name__)
@@ -159,10 +160,26 @@ def Abs(self, expr):
 
 AnnotatedFormula = collections.namedtuple('AnnotatedFormula', ['formula', 'label'])
 
+_thread_contexts = threading.local()
+
+def _z3_context():
+    '''
+    Z3 context of the calling thread
+
+    A Z3 context must not be shared between threads, so
+    checkers built outside the main thread get their own
+    '''
+    if threading.current_thread() is threading.main_thread():
+        return z3.main_ctx()
+    if not hasattr(_thread_contexts, 'ctx'):
+        _thread_contexts.ctx = z3.Context()
+    return _thread_contexts.ctx
+
 class Z3Checker(AbstractSolver):
 
     def __init__(self):
-        self._solver = z3.Solver()
+        self._ctx = _z3_context()
+        self._solver = z3.Solver(ctx=self._ctx)
         self._solver.set(unsat_core=True)
 
     def annotate(self, formulae, label):
@@ -206,7 +223,8 @@ def label(self, object):
         # Z3 throws 'index out of bounds' error
         # if more than 9 digits are used
         return z3.Bool(
-            hash(repr(object)) % 10**9
+            hash(repr(object)) % 10**9,
+            ctx=self._ctx
         )
 
     @staticmethod
@@ -236,12 +254,11 @@ def cast(expr, type_):
         else:
             raise NotImplementedError
 
-    @staticmethod
-    def _generate_var(name, **fields):
+    def _generate_var(self, name, **fields):
         if fields:
             return collections.namedtuple(
                 name,
                 fields.keys(),
-            )(*z3.Ints(' '.join(fields.values())))
+            )(*z3.Ints(' '.join(fields.values()), ctx=self._ctx))
         else:
-            return z3.Int(name)
+            return z3.Int(name, ctx=self._ctx)
@@ -99,6 +99,11 @@ def default_models(self):
 def read_lib_json(json_file_path):
     with open(json_file_path, "r") as f:
         data = json.load(f)
+    return read_lib_data(data)
+
+
+def read_lib_data(data):
+    """Rebuild a library from the list written to __primitives_library__.json"""
     library = Library(loadbuiltins=False)
     with set_context(library):
         for x in data:
@@ -0,0 +1,162 @@
+import concurrent.futures
+import json
+import os
+import pathlib
+import pickle
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of a checkpointed object changes; older checkpoints are then ignored
+CHECKPOINT_VERSION = 1
+
+
+def _stat(key):
+    try:
+        st = os.stat(key)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ArtifactStore:
+    """Text artifacts handed between flow stages, kept in memory and keyed by path
+
+    Stages put and read artifacts through the store instead of writing a file and reading it back.
+    Puts go to disk immediately, or in a background thread if asynchronous is set; flush() makes sure
+    artifacts are on disk, e.g. before C++ code opens them or at the end of a run.
+    Files that were not put are read from disk and then served from memory. An artifact is read again
+    once its file changes on disk (other mtime, size or inode than when it was put or last read).
+
+    Checkpoints are binary artifacts (pickle protocol 5) that let a resumed flow skip re-reading and
+    re-validating the JSON that stages hand to each other.
+    """
+
+    def __init__(self, asynchronous=False):
+        self._texts = {}
+        self._mtimes = {}
+        self._stats = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1) if asynchronous else None
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    def _write(self, key, text):
+        with open(key, 'wb' if isinstance(text, bytes) else 'wt') as fp:
+            fp.write(text)
+        st = _stat(key)
+        with self._lock:
+            self._stats[key] = st
+
+    def _stale(self, key):
+        """Whether the file of a kept artifact changed on disk (call with the lock held)"""
+        if any(not f.done() for f in self._pending.get(key, ())):
+            return False
+        return self._stats.get(key) != _stat(key)
+
+    def _forget(self, key):
+        self._texts.pop(key, None)
+        self._mtimes.pop(key, None)
+        self._stats.pop(key, None)
+
+    def put(self, path, text):
+        key = self._key(path)
+        if self._writer is None:
+            self._write(key, text)
+        with self._lock:
+            self._texts[key] = text
+            self._mtimes[key] = time.time_ns()
+            if self._writer is not None:
+                self._pending.setdefault(key, []).append(self._writer.submit(self._write, key, text))
+
+    def put_json(self, path, obj, **kwargs):
+        self.put(path, json.dumps(obj, **kwargs))
+
+    def read(self, path, binary=False):
+        key = self._key(path)
+        with self._lock:
+            if key in self._texts and self._stale(key):
+                logger.debug(f'{key} changed on disk; reading it again')
+                self._forget(key)
+            text = self._texts.get(key)
+        if text is None:
+            # stat before reading: a change in between is caught by the next read
+            st = _stat(key)
+            with open(key, 'rb' if binary else 'rt') as fp:
+                text = fp.read()
+            with self._lock:
+                if key not in self._texts:
+                    self._texts[key] = text
+                    self._stats[key] = st
+                text = self._texts[key]
+        return text
+
+    def read_json(self, path):
+        return json.loads(self.read(path))
+
+    def put_checkpoint(self, path, obj):
+        """Put obj as a binary checkpoint tagged with CHECKPOINT_VERSION"""
+        self.put(path, pickle.dumps((CHECKPOINT_VERSION, obj), protocol=5))
+
+    def read_checkpoint(self, path, sources=()):
+        """Object put with put_checkpoint, or None if there is no checkpoint of the current version
+
+        The checkpoint is also ignored if one of the (e.g. hand edited) files in sources is newer.
+        """
+        if not self.exists(path):
+            return None
+        mtime = self.mtime(path)
+        newer = [src for src in sources if self.exists(src) and self.mtime(src) > mtime]
+        if newer:
+            logger.info(f'Ignoring checkpoint {path}: {newer[0]} was modified after it')
+            return None
+        try:
+            (version, obj) = pickle.loads(self.read(path, binary=True))
+        except (pickle.UnpicklingError, EOFError, TypeError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable checkpoint {path}: {e}')
+            return None
+        if version != CHECKPOINT_VERSION:
+            logger.warning(f'Ignoring checkpoint {path} of version {version} (current version is {CHECKPOINT_VERSION})')
+            return None
+        return obj
+
+    def copy(self, src, dst):
+        self.put(dst, self.read(src))
+
+    def exists(self, path):
+        key = self._key(path)
+        with self._lock:
+            if key in self._texts and not self._stale(key):
+                return True
+        return pathlib.Path(key).is_file()
+
+    def mtime(self, path):
+        """Modification time (ns) of an artifact: when it was last put, else that of the file"""
+        key = self._key(path)
+        with self._lock:
+            mtime = self._mtimes.get(key)
+            if mtime is not None and self._stale(key):
+                mtime = None
+        return os.stat(key).st_mtime_ns if mtime is None else mtime
+
+    def flush(self, paths=None):
+        """Wait until the given artifacts (all of them if paths is None) are written"""
+        with self._lock:
+            if paths is None:
+                keys = list(self._pending)
+            else:
+                keys = [k for k in map(self._key, paths) if k in self._pending]
+            futures = [f for k in keys for f in self._pending.pop(k)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
@@ -84,6 +84,7 @@ def align_manifest_filter(cmake_manifest):
           'colorlog',
           'plotly',
           'numpy',
+          'scipy',
           'pandas',
           'werkzeug==2.0.0',
           'dash',
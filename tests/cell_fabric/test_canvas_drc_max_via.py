@@ -88,3 +88,17 @@ def test_max_adjacent_x(setup):
     data = c.gen_data(run_pex=False)
     assert c.drc.num_errors == 1
     print('MaxAdjacentX is expected:', c.drc.errors)
+
+
+def test_max_adjacent_x_reports_offending_via(setup):
+    c = setup
+    for j in (0, 2):
+        c.addWire(c.M2, 'a', j, (0, -1), (3, 1))
+    for i in range(4):
+        c.addWire(c.M1, 'a', i, (0, -1), (3, 1))
+    c.drop_via(c.V1)
+
+    c.pdk['V1']['MaxAdjacentX'] = 3
+    data = c.gen_data(run_pex=False)
+    assert c.drc.num_errors == 2
+    assert len(set(c.drc.errors)) == 2, c.drc.errors
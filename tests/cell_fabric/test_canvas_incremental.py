@@ -0,0 +1,189 @@
+import random
+
+from align.cell_fabric import Pdk, Canvas, Wire, Via, UncoloredCenterLineGrid, EnclosureGrid
+from align.cell_fabric.drc import DesignRuleCheck
+
+
+def setup(seed):
+    rnd = random.Random(seed)
+    p = Pdk()
+    p.pdk = {
+        "M1": {"Direction": "v", 'MaxL': None, 'MinL': 1500, 'EndToEnd': 1000, 'Pitch': 800, 'AdjacentAttacker': 1000},
+        "M2": {"Direction": "h", 'MaxL': None, 'MinL': 1500, 'EndToEnd': 1000, 'Pitch': 900, 'AdjacentAttacker': 1000},
+        "V1": {"Stack": ["M1", "M2"], "SpaceX": 4000, "SpaceY": 2000, "WidthX": 400, "WidthY": 300,
+               "VencA_L": 0, "VencA_H": 0, "VencP_L": 0, "VencP_H": 0, 'MaxAdjacentX': 1, 'MaxAdjacentY': 1},
+    }
+    c = Canvas(p)
+    c.M1 = c.addGen(Wire(nm='m1', layer='M1', direction='v',
+                         clg=UncoloredCenterLineGrid(width=400, pitch=800),
+                         spg=EnclosureGrid(pitch=900, stoppoint=450)))
+    c.M2 = c.addGen(Wire(nm='m2', layer='M2', direction='h',
+                         clg=UncoloredCenterLineGrid(width=400, pitch=900),
+                         spg=EnclosureGrid(pitch=800, stoppoint=400)))
+    c.V1 = c.addGen(Via(nm='v1', layer='V1', h_clg=c.M2.clg, v_clg=c.M1.clg, WidthX=400, WidthY=300))
+
+    def add(n):
+        for _ in range(n):
+            wire = rnd.choice([c.M1, c.M2])
+            b = rnd.randrange(10)
+            c.addWire(wire, rnd.choice(['a', 'a', 'b', None]), rnd.randrange(10), (b, -1), (b + rnd.randrange(1, 4), 1))
+        for _ in range(n // 4):
+            (x, y) = (rnd.randrange(10), rnd.randrange(10))
+            c.addWire(c.M1, 'a', x, (y, -1), (y, 1))
+            c.addWire(c.M2, 'a', y, (x, -1), (x, 1))
+            c.addVia(c.V1, 'a', x, y)
+    return c, add
+
+
+def test_update_matches_rebuild():
+    for seed in range(20):
+        results = []
+        for incremental in [False, True]:
+            c, add = setup(seed)
+            add(60)
+            c._reset_terminals(c.removeDuplicates(allow_opens=True))
+            n = len(c.terminals)
+            add(10)
+            if incremental:
+                terminals = c.rd.update(c.terminals[n:])
+            else:
+                terminals = c.removeDuplicates(allow_opens=True)
+            drc = DesignRuleCheck(c)
+            drc.run()
+            results.append((terminals, c.rd.shorts, len(c.rd.opens), len(c.rd.different_widths), drc.errors))
+        assert results[0] == results[1], seed
+
+
+def test_join_wires_after_join_wires():
+    for seed in range(5):
+        results = []
+        for incremental in [False, True]:
+            c, add = setup(seed)
+            add(60)
+            c.join_wires(c.M1)
+            rd = c.rd
+            if not incremental:
+                c._rd_synced = None
+            c.join_wires(c.M2)
+            assert (c.rd is rd) == incremental
+            results.append(c.terminals)
+        assert results[0] == results[1], seed
+
+
+def test_update_with_removals_matches_rebuild():
+    for seed in range(20):
+        results = []
+        for incremental in [False, True]:
+            c, add = setup(seed)
+            add(60)
+            c._reset_terminals(c.removeDuplicates(allow_opens=True))
+            n = len(c.terminals)
+            add(10)
+            vias = [t['rect'] for t in c.terminals if t['layer'] == 'V1']
+
+            def landed(r):
+                return any(v[0] <= r[2] and r[0] <= v[2] and v[1] <= r[3] and r[1] <= v[3] for v in vias)
+
+            removed = [c.terminals[i] for i in range(0, n, 7)
+                       if c.terminals[i]['layer'] in ['M1', 'M2'] and not landed(c.terminals[i]['rect'])]
+            for term in removed:
+                c.remove_terminal(term)
+            if incremental:
+                terminals = c.rd.update(c.terminals[n - len(removed):], removed)
+            else:
+                terminals = c.removeDuplicates(allow_opens=True)
+            results.append((terminals, c.rd.shorts, len(c.rd.opens), len(c.rd.different_widths)))
+        assert results[0] == results[1], seed
+
+
+def test_named_updates_match_rebuild():
+    for seed in range(20):
+        results = []
+        for incremental in [False, True]:
+            rnd = random.Random(seed)
+            c, _ = setup(seed)
+            for x in range(10):
+                c.addWire(c.M1, f'n{x}', x, (0, -1), (9, 1))
+                c.addWire(c.M2, f'n{x}', x, (x, -1), (x + 1, 1))
+                c.addVia(c.V1, f'n{x}', x, x)
+            c._reset_terminals(c.removeDuplicates(allow_opens=True))
+            for _ in range(3):
+                n = len(c.terminals)
+                x = rnd.randrange(10)
+                c.addWire(c.M1, f'n{x}', x, (8, -1), (11, 1))
+                c.addWire(c.M2, f'n{x}', 11, (x, -1), (x + 1, 1))
+                c.addVia(c.V1, f'n{x}', x, 11)
+                if incremental:
+                    terminals = c.rd.update(c.terminals[n:])
+                else:
+                    terminals = c.removeDuplicates(allow_opens=True)
+                c._reset_terminals(terminals)
+            results.append((c.terminals, c.rd.shorts, c.rd.opens, len(c.rd.different_widths)))
+        assert results[0] == results[1], seed
+
+
+def test_drc_run_dirty_layers():
+    for seed in range(10):
+        c, add = setup(seed)
+        add(60)
+        c._reset_terminals(c.removeDuplicates(allow_opens=True))
+        drc = DesignRuleCheck(c)
+        drc.run()
+        n = len(c.terminals)
+        c.addWire(c.M2, 'a', 3, (0, -1), (2, 1))
+        c._reset_terminals(c.rd.update(c.terminals[n:]))
+        drc.run(layers=c.rd.dirty_layers)
+        full = DesignRuleCheck(c)
+        full.run()
+        assert drc.errors == full.errors, seed
+
+
+def test_terminal_edits():
+    c, add = setup(0)
+    add(60)
+    c.join_wires(c.M1)
+    rd = c.rd
+    c.remove_terminal(c.terminals[3])
+    c.join_wires(c.M2)
+    assert c.rd is rd
+
+    c.terminals = c.terminals[1:]
+    c.join_wires(c.M2)
+    assert c.rd is not rd
+
+    rd = c.rd
+    c.addGen(Wire(nm='m3', layer='M2', direction='h',
+                  clg=UncoloredCenterLineGrid(width=400, pitch=900),
+                  spg=EnclosureGrid(pitch=800, stoppoint=400)))
+    c.join_wires(c.M2)
+    assert c.rd is not rd
+
+
+def test_gen_data():
+    for seed in range(5):
+        results = []
+        for incremental in [False, True]:
+            c, add = setup(seed)
+            add(60)
+            c.join_wires(c.M1)
+            add(10)
+            rd = c.rd
+            if not incremental:
+                c._rd_synced = None
+            data = c.gen_data(run_pex=False, nets_allowed_to_be_open=['b'])
+            assert (c.rd is rd) == incremental
+            results.append((data, c.rd.shorts, len(c.rd.opens), c.drc.errors))
+        assert results[0] == results[1], seed
+
+
+def test_gen_data_reuses_drc():
+    c, add = setup(0)
+    add(60)
+    c.gen_data(run_pex=False, nets_allowed_to_be_open=['b'])
+    drc = c.drc
+    c.addWire(c.M2, 'a', 3, (0, -1), (2, 1))
+    c.gen_data(run_pex=False, nets_allowed_to_be_open=['b'])
+    assert c.drc is drc
+    full = DesignRuleCheck(c)
+    full.run()
+    assert drc.errors == full.errors
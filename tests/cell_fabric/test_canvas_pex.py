@@ -3,6 +3,10 @@
 import math
 import filecmp
 import pathlib
+import io
+
+import numpy as np
+import scipy.sparse
 
 from align.primitive.default import DefaultCanvas
 from align.cell_fabric import Pdk
@@ -195,3 +199,65 @@ def test_via_pex_current2(setup):
 """)
 
     assert filecmp.cmp(mydir / fn, mydir / (fn + "-gold"))
+
+def resistance(nodes, G, a, b):
+    # voltage at a with 1A injected at a and b grounded
+    G = G.toarray()
+    i, j = nodes.index(a), nodes.index(b)
+    keep = [k for k in range(len(nodes)) if k != j]
+    rhs = np.zeros(len(nodes))
+    rhs[i] = 1
+    return np.linalg.lstsq(G[np.ix_(keep, keep)], rhs[keep], rcond=None)[0][keep.index(i)]
+
+def test_reduced_pex(setup):
+    c = setup
+    for (i,nm) in product( [5,7,9], ['a']):
+        c.addWire( c.m1, nm, i, (0,-1), (0,1))
+    for (i,nm) in product( [5,7,9], ['a']):
+        c.addWire( c.m1, nm, i, (4,-1), (4,1))
+    for (i,nm) in product( [1,3], ['a']):
+        c.addWire( c.m1, nm, i, (2,-1), (2,1))
+    c.addWire( c.m1, 'b', 11, (0,-1), (4,1))
+    c.asciiStickDiagram( c.v1, c.m2, c.v2, c.m3, """
+                    *=======+=======+
+                    a
+                    |
+                    |
+    +=======+=======/
+                    |
+                    |
+                    |
+                    *=======+=======+
+""")
+
+    c.gen_data()
+
+    source = f"a_M1_{80*1}_{84*2}"
+    sink1  = f"a_M1_{80*9}_{84*4}"
+    sink2  = f"a_M1_{80*9}_{84*0}"
+
+    (nodes, G, C) = c.pex.rc_network()
+    (rnodes, rG, rC) = c.pex.reduce_network()
+    assert len(rnodes) < len(nodes)
+    assert {source, sink1, sink2} <= set(rnodes)
+    assert np.allclose(G.sum(axis=1), 0) and np.allclose(rG.sum(axis=1), 0)
+    assert math.isclose(rC.sum(), C.sum())
+    assert math.isclose(rC.sum(), sum(c.pex.getSummaryCaps().values()))
+    for sink in [sink1, sink2]:
+        assert math.isclose(resistance(rnodes, rG, source, sink), resistance(nodes, G, source, sink))
+
+    # the unconnected wire b collapses to a single node holding its capacitance
+    b = [nm for nm in rnodes if nm.startswith('b_')]
+    assert len(b) == 1
+    assert math.isclose(rC[rnodes.index(b[0]), rnodes.index(b[0])], c.pex.getSummaryCaps()['b'])
+
+    # extra nodes can be kept
+    (knodes, _, _) = c.pex.reduce_network(keep=[f"a_M1_{80*5}_{84*4}"])
+    assert set(knodes) == set(rnodes) | {f"a_M1_{80*5}_{84*4}"}
+
+    fp = io.StringIO()
+    c.pex.writePex(fp, reduce=True)
+    lines = fp.getvalue().splitlines()
+    assert len([ln for ln in lines if ln[0] == 'r']) == scipy.sparse.triu(rG, k=1).nnz
+    assert len([ln for ln in lines if ln[0] == 'c']) == len(rnodes)
+    assert len(lines) < len(c.pex.components)
@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+
+from align.cell_fabric.drc import RegionSet, LayerArrays, _adjacent_counts
+from align.cell_fabric.remove_duplicates import Scanline
+
+
+def contained_in_brute_force(regions, rect):
+    return any(r[0] <= rect[0] and rect[2] <= r[2] and r[1] <= rect[1] and rect[3] <= r[3] for r in regions)
+
+
+def test_region_set():
+    rnd = random.Random(0)
+    regions = []
+    for _ in range(200):
+        x, y = rnd.randrange(-5000, 5000), rnd.randrange(-5000, 5000)
+        regions.append([x, y, x + rnd.randrange(1, 1000), y + rnd.randrange(1, 1000)])
+    # a region covering (almost) everything ends up outside the grid buckets
+    regions.append([-4000, -4000, 6000, 100])
+
+    rs = RegionSet()
+    for r in regions:
+        rs.add_region(r)
+    for _ in range(2000):
+        x, y = rnd.randrange(-6000, 6000), rnd.randrange(-6000, 6000)
+        rect = [x, y, x + rnd.randrange(0, 300), y + rnd.randrange(0, 300)]
+        assert rs.contained_in(rect) == contained_in_brute_force(regions, rect)
+
+
+def test_region_set_empty():
+    assert not RegionSet().contained_in([0, 0, 10, 10])
+
+
+def test_layer_arrays():
+    vv = {}
+    for (cx, rects) in [(0, [[0, -5, 10, 5], [20, -5, 30, 5]]), (100, [[5, 95, 8, 105]])]:
+        sl = vv[cx] = Scanline([1, 3], 0)
+        for r in rects:
+            sl.new_slr(r, 'x', 'drawing')
+    a = LayerArrays(vv)
+    assert len(a) == 3
+    assert a.rects.tolist() == [[0, -5, 10, 5], [20, -5, 30, 5], [5, 95, 8, 105]]
+    assert a.same_line().tolist() == [True, False]
+    assert a.offsets == [0, 2, 3]
+    (order, row) = a.rows()
+    assert order.tolist() == [0, 1, 2]
+    assert row.tolist() == [0, 0, 1]
+
+
+def test_adjacent_counts():
+    # counting starts at 1 on a new line and restarts at 0 after a gap
+    idx = np.array([0, 1, 2, 4, 5, 6, 7, 0, 1])
+    starts = np.array([True, False, False, False, False, False, False, True, False])
+    assert _adjacent_counts(idx, starts).tolist() == [1, 2, 3, 0, 1, 2, 3, 1, 2]
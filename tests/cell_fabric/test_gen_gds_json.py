@@ -45,6 +45,22 @@ def test_gds():
 
     assert filecmp.cmp( mydir / "test_gds.gds", mydir / "test_gds.gds_gold", shallow=False)
 
+def test_gds_gdsii():
+
+    block_name = "__json_cmc_nmos_big_no_duplicates_gds_cand"
+    json_file_name = "__json_cmc_nmos_big_no_duplicates"
+
+    with open( mydir / (json_file_name + "_cand"), "rt") as fp0, \
+         io.StringIO() as fp1:
+        gen_gds_json.translate(  block_name, '', 0, fp0, fp1,
+                                            datetime.datetime( 2019, 1, 1, 0, 0, 0), p)
+        contents = fp1.getvalue()
+
+    with io.StringIO( contents) as fp0, \
+         io.BytesIO() as fp1:
+        json2gds.convert_GDSjson_GDS_fps_gdsii( fp0, fp1)
+        assert fp1.getvalue() == (mydir / "test_gds.gds_gold").read_bytes()
+
 def test_gds_stringio():
 
     block_name = "__json_cmc_nmos_big_no_duplicates_gds_cand"
@@ -62,3 +78,16 @@ def test_gds_stringio():
 
     assert filecmp.cmp( mydir / "test_gds.gds", mydir / "test_gds.gds_gold", shallow=False)
 
+
+def test_gds_direct():
+
+    block_name = "__json_cmc_nmos_big_no_duplicates_gds_cand"
+    json_file_name = "__json_cmc_nmos_big_no_duplicates"
+
+    with open( mydir / (json_file_name + "_cand"), "rt") as fp0, \
+         io.BytesIO() as fp1:
+        gen_gds_json.translate_gds(  block_name, '', 0, json.load(fp0), fp1,
+                                     datetime.datetime( 2019, 1, 1, 0, 0, 0), p)
+        contents = fp1.getvalue()
+
+    assert contents == (mydir / "test_gds.gds_gold").read_bytes()
@@ -1,5 +1,6 @@
 import pathlib
-from align.cell_fabric import Canvas, Wire, UncoloredCenterLineGrid, EnclosureGrid
+import numpy as np
+from align.cell_fabric import Canvas, Wire, UncoloredCenterLineGrid, ColoredCenterLineGrid, EnclosureGrid
 
 mydir = pathlib.Path(__file__).resolve().parent
 
@@ -41,3 +42,38 @@ def test_inverseBounds():
 
     b, e = c.M2.spg.inverseBounds(1000)
     assert b == e == (1, 3)
+
+
+def inverseBounds_reference(grid, physical):
+    offset = grid.grid[0][0]
+    (q, r) = divmod(physical - offset, grid.period)
+    monotonic_grid = [(i, v[0]) for i, v in enumerate(grid.grid)]
+    monotonic_grid.sort(key=lambda x: x[1])
+    for i, (idx, val) in enumerate(monotonic_grid):
+        if val - offset == r:
+            return ((q, idx), (q, idx))
+        elif val - offset > r:
+            idx_prev = monotonic_grid[i-1][0]
+            return ((q, idx_prev), (q, idx))
+
+
+def test_inverseBounds_reference():
+    grids = [UncoloredCenterLineGrid(width=40, pitch=80, offset=-40, repeat=3),
+             ColoredCenterLineGrid(width=40, pitch=84, colors=['a', 'b'], repeat=4),
+             EnclosureGrid(pitch=800, stoppoint=200),
+             EnclosureGrid(pitch=800, stoppoint=600, offset=100),
+             EnclosureGrid(pitch=800, stoppoint=600).copyShift(37)]
+    for grid in grids:
+        for physical in range(-2000, 2000, 7):
+            assert grid.inverseBounds(physical) == inverseBounds_reference(grid, physical), (grid, physical)
+
+
+def test_inverseBounds_many():
+    grids = [UncoloredCenterLineGrid(width=40, pitch=80, repeat=3),
+             EnclosureGrid(pitch=800, stoppoint=600)]
+    for grid in grids:
+        physical = np.arange(-2000, 2000, 3)
+        b, e = grid.inverseBounds_many(physical)
+        assert b.shape == e.shape == (len(physical), 2)
+        for (p, bb, ee) in zip(physical.tolist(), b.tolist(), e.tolist()):
+            assert (tuple(bb), tuple(ee)) == grid.inverseBounds(p)
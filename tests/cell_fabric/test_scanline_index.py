@@ -0,0 +1,77 @@
+import time
+import pytest
+
+from align.cell_fabric import Canvas, Wire, Via, UncoloredCenterLineGrid, EnclosureGrid
+from align.cell_fabric.remove_duplicates import Scanline
+
+
+BENCHMARK = False
+
+
+def build_scanline(rects):
+    sl = Scanline([1, 3], 0)
+    for r in rects:
+        sl.new_slr(r, 'x', 'drawing')
+    sl.build_index()
+    return sl
+
+
+def test_overlapping():
+    sl = build_scanline([[0, -50, 300, 50], [100, -50, 1000, 50], [400, -50, 500, 50], [1200, -50, 1300, 50]])
+    assert [slr.rect[0] for slr in sl.overlapping(350, 350)] == [100]
+    assert [slr.rect[0] for slr in sl.overlapping(300, 400)] == [0, 100, 400]
+    assert [slr.rect[0] for slr in sl.overlapping(1100, 1150)] == []
+    assert [slr.rect[0] for slr in sl.overlapping(1000, 1200)] == [100, 1200]
+    assert [slr.rect[0] for slr in sl.overlapping(-100, -1)] == []
+
+
+def test_find_covering():
+    sl = build_scanline([[0, -50, 300, 50], [400, -50, 500, 50]])
+    assert sl.find_covering(0).rect == [0, -50, 300, 50]
+    assert sl.find_covering(300).rect == [0, -50, 300, 50]
+    assert sl.find_covering(350) is None
+    assert sl.find_covering(450).rect == [400, -50, 500, 50]
+    assert sl.find_covering(-1) is None
+
+
+def test_find_touching_different_widths():
+    sl = build_scanline([[0, -10, 300, 10], [100, -50, 400, 50]])
+    via = Scanline.new_slr_no_add([200, 20, 220, 40], 'x', 'drawing')
+    assert sl.find_touching(via).rect == [100, -50, 400, 50]
+
+
+def test_index_is_rebuilt_after_add():
+    sl = build_scanline([[0, -50, 300, 50]])
+    assert sl.find_covering(450) is None
+    sl.new_slr([400, -50, 500, 50], 'x', 'drawing')
+    assert sl.find_covering(450).rect == [400, -50, 500, 50]
+
+
+@pytest.mark.skipif(not BENCHMARK, reason="Exclude from CI")
+def test_benchmark_100k_rects():
+    c = Canvas()
+    c.pdk = None
+    m1 = c.addGen(Wire(nm='m1', layer='M1', direction='v',
+                       clg=UncoloredCenterLineGrid(width=40, pitch=80),
+                       spg=EnclosureGrid(pitch=84, stoppoint=42)))
+    m2 = c.addGen(Wire(nm='m2', layer='M2', direction='h',
+                       clg=UncoloredCenterLineGrid(width=40, pitch=84),
+                       spg=EnclosureGrid(pitch=80, stoppoint=40)))
+    v1 = c.addGen(Via(nm='v1', layer='via1', h_clg=m2.clg, v_clg=m1.clg, WidthX=32, WidthY=32))
+
+    # 100 vertical lines each with 1000 short M1 wires, crossed by 100 rows of short M2 wires and vias
+    n, m = 100, 1000
+    for x in range(n):
+        for y in range(m):
+            c.addWire(m1, f'n{x}', 2*x, (2*y, -1), (2*y, 1))
+    for y in range(n):
+        for x in range(n):
+            c.addWire(m2, f'n{x}', 2*y, (2*x, -1), (2*x, 1))
+            c.addVia(v1, f'n{x}', 2*x, 2*y)
+    assert len(c.terminals) >= 100000
+
+    s = time.time()
+    c.removeDuplicates(allow_opens=True)
+    elapsed_time = time.time() - s
+    assert len(c.rd.shorts) == 0, c.rd.shorts[:10]
+    print(f'\nremoveDuplicates on {len(c.terminals)} rects: TIME={elapsed_time:0.2f}')
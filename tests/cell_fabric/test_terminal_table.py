@@ -0,0 +1,104 @@
+import json
+import pathlib
+
+from align.cell_fabric import Canvas, Pdk, Wire, Via, UncoloredCenterLineGrid, EnclosureGrid
+from align.cell_fabric import transformation
+from align.cell_fabric.terminal_table import TerminalTable
+from align.pnr.checkers import rational_scaling
+
+mydir = pathlib.Path(__file__).resolve().parent
+pdkfile = mydir.parent.parent / 'pdks' / 'FinFET14nm_Mock_PDK' / 'layers.json'
+
+terminals = [
+    {'layer': 'M1', 'netName': 'x', 'rect': [0, 0, 100, 300], 'netType': 'drawing'},
+    {'layer': 'M2', 'netName': None, 'rect': [0, -50, 200, 50], 'netType': 'pin', 'color': 'a'},
+    {'layer': 'Boundary', 'netName': None, 'rect': [0, 0, 400, 400]},
+]
+
+
+def test_round_trip():
+    tbl = TerminalTable(terminals)
+    assert len(tbl) == 3
+    assert tbl.to_list() == terminals
+    assert tbl[-1] == terminals[-1]
+    assert 'netType' not in tbl[2]
+    assert json.loads(json.dumps(tbl.to_list())) == terminals
+
+
+def test_write_through():
+    tbl = TerminalTable(terminals)
+    term = tbl[0]
+    term['rect'][2] = 120
+    term.update({'netName': 'y', 'netType': 'pin'})
+    assert tbl[0] == {'layer': 'M1', 'netName': 'y', 'rect': [0, 0, 120, 300], 'netType': 'pin'}
+    del tbl[1]['color']
+    assert tbl[1] == {'layer': 'M2', 'netName': None, 'rect': [0, -50, 200, 50], 'netType': 'pin'}
+
+
+def test_transform_and_bbox():
+    tbl = TerminalTable(terminals)
+    tr = transformation.Transformation(oX=1000, oY=10, sX=-1, sY=1)
+    tbl.transform(tr)
+    for term, orig in zip(tbl, terminals):
+        assert term['rect'] == tr.hitRect(transformation.Rect(*orig['rect'])).canonical().toList()
+    assert tbl.bbox() == [600, -40, 1000, 410]
+
+
+def test_rational_scaling():
+    d = {'bbox': [0, 0, 400, 400], 'terminals': [dict(t) for t in terminals]}
+    d['terminals'][0]['rect'] = [0, 0, 101, 300]
+    d_tbl = {'bbox': d['bbox'], 'terminals': TerminalTable(d['terminals'])}
+    errors, errors_tbl = [], []
+    rational_scaling(d, mul=2, div=5, errors=errors)
+    rational_scaling(d_tbl, mul=2, div=5, errors=errors_tbl)
+    assert d_tbl['terminals'].to_list() == d['terminals']
+    assert len(errors) == len(errors_tbl) == 1
+    assert '[0, 0, 101, 300]' in errors_tbl[0]
+
+
+def test_rename():
+    tbl = TerminalTable(terminals)
+    tbl.rename('netName', lambda nm: None if nm is None else f'blk/{nm}')
+    assert [t['netName'] for t in tbl] == ['blk/x', None, None]
+
+
+def build(c):
+    m1 = c.addGen(Wire(nm='m1', layer='M1', direction='v',
+                       clg=UncoloredCenterLineGrid(width=32, pitch=80, repeat=2),
+                       spg=EnclosureGrid(pitch=84, stoppoint=42)))
+    m2 = c.addGen(Wire(nm='m2', layer='M2', direction='h',
+                       clg=UncoloredCenterLineGrid(width=32, pitch=84, repeat=2),
+                       spg=EnclosureGrid(pitch=80, stoppoint=40)))
+    v1 = c.addGen(Via(nm='v1', layer='V1', h_clg=m2.clg, v_clg=m1.clg))
+    for x in range(4):
+        c.addWire(m1, f'n{x % 2}', x, (0, -1), (4, 1))
+        c.addWire(m1, f'n{x % 2}', x, (3, -1), (6, 1))
+    for y in range(3):
+        c.addWire(m2, f'n{y % 2}', y, (0, -1), (3, 1))
+    c.addVia(v1, 'n0', 0, 0)
+    c.addVia(v1, 'n1', 1, 1)
+    c.drop_via(v1)
+    c.terminals.append({'layer': 'Boundary', 'netName': None, 'rect': [0, 0, 400, 600], 'netType': 'drawing'})
+    return c.gen_data(run_pex=False)
+
+
+def test_columnar_canvas_matches_list_canvas():
+    p = Pdk().load(pdkfile)
+    c_list = Canvas(p)
+    c_tbl = Canvas(p, columnar=True)
+    data_list = build(c_list)
+    data_tbl = build(c_tbl)
+    assert isinstance(c_tbl.terminals, TerminalTable)
+    assert data_tbl == data_list
+    assert c_tbl.rd.shorts == c_list.rd.shorts
+    assert c_tbl.drc.errors == c_list.drc.errors
+
+
+def test_take():
+    tbl = TerminalTable(terminals)
+    sub = tbl.take([2, 0])
+    assert sub.to_list() == [terminals[2], terminals[0]]
+    sub[1]['rect'][0] = 7
+    assert tbl[0]['rect'][0] == 0
+    assert tbl.take(tbl.mask('layer', 'M2')).to_list() == [terminals[1]]
+    assert tbl.copy().to_list() == terminals
@@ -0,0 +1,89 @@
+import json
+
+from align.utils import artifacts
+from align.utils.artifacts import ArtifactStore
+
+
+def test_sync_store(tmp_path):
+    store = ArtifactStore()
+    store.put(tmp_path / 'a.txt', 'hello')
+    assert (tmp_path / 'a.txt').read_text() == 'hello'
+    store.put_json(tmp_path / 'b.json', {'x': [1, 2]}, indent=2)
+    assert json.loads((tmp_path / 'b.json').read_text()) == {'x': [1, 2]}
+    store.copy(tmp_path / 'a.txt', tmp_path / 'c.txt')
+    assert (tmp_path / 'c.txt').read_text() == 'hello'
+
+
+def test_async_store(tmp_path):
+    store = ArtifactStore(asynchronous=True)
+    for i in range(100):
+        store.put(tmp_path / f'{i}.txt', str(i))
+    # readable from memory whether or not the write has happened
+    assert store.exists(tmp_path / '99.txt')
+    assert store.read(tmp_path / '99.txt') == '99'
+    store.flush([tmp_path / '0.txt'])
+    assert (tmp_path / '0.txt').read_text() == '0'
+    # the last put of a path wins
+    store.put(tmp_path / '0.txt', 'zero')
+    store.close()
+    assert all((tmp_path / f'{i}.txt').read_text() == str(i) for i in range(1, 100))
+    assert (tmp_path / '0.txt').read_text() == 'zero'
+
+
+def test_reads_are_cached(tmp_path, monkeypatch):
+    (tmp_path / 'a.txt').write_text('before')
+    store = ArtifactStore()
+    assert store.read(tmp_path / 'a.txt') == 'before'
+    opened = []
+    monkeypatch.setattr('builtins.open', lambda *args, **kwargs: opened.append(args))
+    assert store.read(tmp_path / 'a.txt') == 'before'
+    assert opened == []
+    monkeypatch.undo()
+    assert not store.exists(tmp_path / 'missing.txt')
+
+
+def test_changed_files_are_read_again(tmp_path):
+    (tmp_path / 'a.txt').write_text('before')
+    store = ArtifactStore(asynchronous=True)
+    assert store.read(tmp_path / 'a.txt') == 'before'
+    (tmp_path / 'a.txt').write_text('after')
+    assert store.read(tmp_path / 'a.txt') == 'after'
+
+    # also files the store wrote itself
+    store.put(tmp_path / 'b.txt', 'put')
+    store.flush()
+    (tmp_path / 'b.txt').write_text('rewritten')
+    assert store.read(tmp_path / 'b.txt') == 'rewritten'
+    assert store.mtime(tmp_path / 'b.txt') == (tmp_path / 'b.txt').stat().st_mtime_ns
+    (tmp_path / 'b.txt').unlink()
+    assert not store.exists(tmp_path / 'b.txt')
+    store.close()
+
+
+def test_mtime(tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    store = ArtifactStore(asynchronous=True)
+    before = store.mtime(tmp_path / 'a.txt')
+    assert before == (tmp_path / 'a.txt').stat().st_mtime_ns
+    store.put(tmp_path / 'a.txt', 'b')
+    assert store.mtime(tmp_path / 'a.txt') > before
+    store.close()
+
+
+def test_checkpoint(tmp_path, monkeypatch):
+    store = ArtifactStore(asynchronous=True)
+    obj = ('top', {'a': (1, 2)}, [('top_0', {'modules': []})])
+    store.put_checkpoint(tmp_path / 'a.ckpt', obj)
+    assert store.read_checkpoint(tmp_path / 'a.ckpt') == obj
+    store.close()
+    assert ArtifactStore().read_checkpoint(tmp_path / 'a.ckpt') == obj
+    assert store.read_checkpoint(tmp_path / 'missing.ckpt') is None
+
+    # an edited source invalidates the checkpoint
+    store = ArtifactStore()
+    store.put(tmp_path / 'a.json', '[]')
+    assert store.read_checkpoint(tmp_path / 'a.ckpt', sources=[tmp_path / 'a.json']) is None
+
+    # so does a change of the checkpoint version
+    monkeypatch.setattr(artifacts, 'CHECKPOINT_VERSION', artifacts.CHECKPOINT_VERSION + 1)
+    assert ArtifactStore().read_checkpoint(tmp_path / 'a.ckpt') is None
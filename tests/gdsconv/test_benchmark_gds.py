@@ -0,0 +1,85 @@
+import io
+import os
+import json
+import time
+import shutil
+import pathlib
+import pytest
+
+import align
+from align.cell_fabric import gen_gds_json, pdk
+from align.gdsconv.json2gds import convert_GDSjson_GDS_fps, convert_GDSjson_GDS_fps_gdsii
+
+ALIGN_HOME = pathlib.Path(__file__).resolve().parent.parent.parent
+
+if 'ALIGN_WORK_DIR' in os.environ:
+    ALIGN_WORK_DIR = pathlib.Path(os.environ['ALIGN_WORK_DIR']).resolve()
+else:
+    ALIGN_WORK_DIR = ALIGN_HOME / 'tests' / 'tmp'
+
+PDK_DIR = ALIGN_HOME / 'pdks' / 'FinFET14nm_Mock_PDK'
+
+CLEANUP = True
+
+BENCHMARK = False
+
+
+def timed(f, *args):
+    s = time.time()
+    with io.BytesIO() as ofp:
+        f(*args, ofp)
+        return ofp.getvalue(), time.time() - s
+
+
+@pytest.mark.skipif(not BENCHMARK, reason="Exclude from CI")
+@pytest.mark.parametrize("nm", ["five_transistor_ota", "switched_capacitor_filter"])
+def test_benchmark_gds(nm):
+    """GDS of the primitives of an example: python-gdsii (through gds.json) against the streaming writer"""
+    run_dir = ALIGN_WORK_DIR / f'{nm}_benchmark_gds'
+    if run_dir.exists():
+        shutil.rmtree(run_dir)
+    run_dir.mkdir(parents=True)
+    os.chdir(run_dir)
+
+    align.CmdlineParser().parse_args([str(ALIGN_HOME / 'examples' / nm), '-p', str(PDK_DIR), '--flow_stop', '2_primitives'])
+
+    p = pdk.Pdk().load(PDK_DIR / 'layers.json')
+
+    # The PnR flow before the streaming writer: layout -> gds.json -> python-gdsii
+    def old_path(layout, ofp):
+        name, d = layout
+        with io.StringIO() as fp:
+            json.dump(gen_gds_json.translate_data(name, '', p.layerfile, 0, d, {}), fp, indent=4)
+            fp.seek(0)
+            convert_GDSjson_GDS_fps_gdsii(fp, ofp)
+
+    def new_path(layout, ofp):
+        name, d = layout
+        gen_gds_json.translate_gds(name, '', 0, d, ofp, p=p)
+
+    layouts = [(fn.stem, json.loads(fn.read_text())) for fn in sorted((run_dir / '2_primitives').glob('*.json'))
+               if not fn.name.endswith('.gds.json')]
+    layouts = [(name, d) for name, d in layouts if 'terminals' in d]
+    gds_jsons = [fn.read_text() for fn in sorted((run_dir / '2_primitives').glob('*.gds.json'))]
+
+    totals = {}
+    for label, inputs, old, new in [
+            ('layout', layouts, old_path, new_path),
+            ('gds.json', gds_jsons,
+             lambda s, ofp: convert_GDSjson_GDS_fps_gdsii(io.StringIO(s), ofp),
+             lambda s, ofp: convert_GDSjson_GDS_fps(io.StringIO(s), ofp))]:
+        t_old = t_new = 0
+        for d in inputs:
+            gds_old, t = timed(old, d)
+            t_old += t
+            gds_new, t = timed(new, d)
+            t_new += t
+            assert gds_old == gds_new
+        totals[label] = (len(inputs), t_old, t_new)
+
+    for label, (n, t_old, t_new) in totals.items():
+        print(f'\n{nm} {label} ({n} files): python-gdsii={t_old:0.2f}s streaming={t_new:0.2f}s')
+
+    os.chdir(ALIGN_HOME)
+    if CLEANUP:
+        shutil.rmtree(run_dir)
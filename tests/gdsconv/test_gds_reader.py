@@ -0,0 +1,54 @@
+import json
+import pathlib
+import struct
+
+import numpy as np
+import pytest
+
+from align.gdsconv.gds_reader import GDSReader
+from align.gdsconv.gds2json import convert_GDS_GDSjson
+
+mydir = pathlib.Path(__file__).resolve().parent
+
+
+def test_index():
+    with GDSReader(mydir / "file.gds") as reader:
+        assert len(reader.structures) == 11
+        assert reader.top_level() == ['cascode_current_mirror_ota_PL']
+        assert reader.references['CMC_NMOS_25_1x10_1556124376'] == ['M2_M1_CDNS_543798238350_1556124376']
+        assert reader.hierarchy('CMC_NMOS_25_1x10_1556124376') == ['M2_M1_CDNS_543798238350_1556124376',
+                                                                  'CMC_NMOS_25_1x10_1556124376']
+        assert reader.units == [0.00025, 2.5e-10]
+
+
+def test_cell():
+    with open(mydir / "file.json") as fp:
+        gold = {strct['strname']: strct for strct in json.load(fp)['bgnlib'][0]['bgnstr']}
+    with GDSReader(mydir / "file.gds") as reader:
+        for name in reader.structures:
+            strct = reader.cell(name)
+            assert len(strct['elements']) == len(gold[name]['elements'])
+            for elem, gold_elem in zip(strct['elements'], gold[name]['elements']):
+                assert elem['xy'].dtype == np.int32 and elem['xy'].shape[1] == 2
+                assert elem['xy'].ravel().tolist() == gold_elem['xy']
+                assert {k: v for k, v in elem.items() if k != 'xy'} == {k: v for k, v in gold_elem.items() if k != 'xy'}
+
+
+def test_extract(tmp_path):
+    top = 'CMC_NMOS_25_1x10_1556124376'
+    with GDSReader(mydir / "file.gds") as reader:
+        (tmp_path / "sub.gds").write_bytes(reader.extract(top))
+        full = reader.to_json(top)
+    with GDSReader(tmp_path / "sub.gds") as reader:
+        assert reader.top_level() == [top]
+        assert reader.to_json() == full
+    convert_GDS_GDSjson(mydir / "file.gds", tmp_path / "sub.json", top=top)
+    with open(tmp_path / "sub.json") as fp:
+        assert json.load(fp) == full
+
+
+def test_sname_outside_structure(tmp_path):
+    # an SREF name before any STRNAME, then ENDLIB
+    (tmp_path / "bad.gds").write_bytes(struct.pack('>HH', 8, 0x1206) + b'CELL' + struct.pack('>HH', 4, 0x0400))
+    with pytest.raises(ValueError, match='SNAME outside structure'):
+        GDSReader(tmp_path / "bad.gds")
@@ -162,3 +162,32 @@ def test_b4(name, params):
     if CLEANUP:
         shutil.rmtree(run_dir)
         shutil.rmtree(ckt_dir)
+
+
+@pytest.mark.skipif(not BENCHMARK, reason="Exclude from CI")
+@pytest.mark.parametrize("threads", [1, 2, 4, 8])
+def test_placer_threads(threads):
+    name = f'ckt_threads_{threads}'
+    netlist = circuits.comparator(name)
+    constraints = [
+        {"constraint": "ConfigureCompiler", "auto_constraint": False, "propagate": True},
+        {"constraint": "PowerPorts", "ports": ["vccx"]},
+        {"constraint": "GroundPorts", "ports": ["vssx"]},
+        {"constraint": "AspectRatio", "subcircuit": name, "ratio_low": 0.5, "ratio_high": 2}
+    ]
+    example = build_example(name, netlist, constraints)
+    s = time.time()
+    ckt_dir, run_dir = run_example(example, additional_args=["--router_mode", "no_op", "--placer_threads", f"{threads}"], cleanup=False)
+    elapsed_time = time.time() - s
+    cn = f'{name.upper()}_0'
+    with (run_dir / '3_pnr' / 'Results' / f'{cn}.scaled_placement_verilog.json').open('rt') as fp:
+        placement = json.load(fp)
+        assert standalone_overlap_checker(placement, cn)
+        nets = gen_netlist(placement, cn)
+        hpwl_new = calculate_HPWL_from_placement_verilog_d(placement, cn, nets)
+        x0, y0, x1, y1 = placement['modules'][0]['bbox']
+        area_new = (x1-x0)*(y1-y0)
+    print(f'\n{name}: THREADS={threads} AREA={area_new/1e8:0.2f} HPWL={hpwl_new/1e4:0.2f} TIME={elapsed_time:0.2f}')
+    if CLEANUP:
+        shutil.rmtree(run_dir)
+        shutil.rmtree(ckt_dir)
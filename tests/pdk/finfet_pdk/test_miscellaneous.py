@@ -1,8 +1,13 @@
+import json
+import pickle
 import textwrap
-from .utils import get_test_id, build_example, run_example
+import shutil
+from .utils import get_test_id, build_example, run_example, WORK_DIR, PDK_DIR
 import align.pdk.finfet
 import pathlib
 from align.compiler.read_library import read_lib
+from align.primitive import PrimitiveCache
+from align.batch import run_many
 
 
 CLEANUP = True
@@ -58,3 +63,113 @@ def test_floating_power_pin():
     ]
     example = build_example(name, netlist, constraints)
     run_example(example, cleanup=CLEANUP, n=1)
+
+
+def primitive_flow_example(name):
+    netlist = textwrap.dedent(f"""\
+    .subckt {name} d1 d2 g s vccx vssx
+    mn0 d1 g s vssx n m=1 nf=2 w=360e-9
+    mn1 d2 g s vssx n m=1 nf=4 w=720e-9
+    mp0 d1 g vccx vccx p m=1 nf=2 w=360e-9
+    mp1 d2 d2 vccx vccx p m=1 nf=6 w=1080e-9
+    .ends {name}
+    .END
+    """)
+    constraints = [
+        {"constraint": "PowerPorts", "ports": ["vccx"]},
+        {"constraint": "GroundPorts", "ports": ["vssx"]}
+    ]
+    return build_example(name, netlist, constraints)
+
+
+def run_primitives(name, additional_args):
+    example = primitive_flow_example(name)
+    _, run_dir = run_example(example, cleanup=False, n=1, additional_args=['--flow_stop', '2_primitives'] + additional_args)
+    primitive_dir = run_dir / '2_primitives'
+    with (primitive_dir / '__primitives__.json').open('rt') as fp:
+        primitives = json.load(fp)
+    return primitives, {f.name: f.read_bytes() for f in primitive_dir.iterdir()}
+
+
+def test_primitive_jobs():
+    name = f'ckt_{get_test_id()}'
+    results = [run_primitives(name, ['--primitive_jobs', str(jobs)]) for jobs in [1, 2]]
+    assert len(results[0][0]) > 1
+    assert results[0][0] == results[1][0]
+    (serial, parallel) = (results[0][1], results[1][1])
+    assert serial.keys() == parallel.keys()
+    for k, v in serial.items():
+        if k.endswith('.ckpt'):
+            # the same primitives, pickled with different object sharing
+            assert pickle.loads(parallel[k]) == pickle.loads(v), k
+        else:
+            assert parallel[k] == v, k
+
+
+def test_primitive_cache():
+    name = f'ckt_{get_test_id()}'
+    cache_dir = WORK_DIR / f'cache_{name}'
+    if cache_dir.exists():
+        shutil.rmtree(cache_dir)
+    miss = run_primitives(name, ['--primitive_cache', str(cache_dir)])
+    n_entries = len(list(cache_dir.iterdir()))
+    assert n_entries > 1
+    hit = run_primitives(name, ['--primitive_cache', str(cache_dir)])
+    assert len(list(cache_dir.iterdir())) == n_entries
+    assert hit[0] == miss[0]
+    for k, v in miss[1].items():
+        if not k.startswith('__primitives__.'):
+            assert hit[1][k] == v, k
+
+    cache = PrimitiveCache(cache_dir, max_size=0)
+    cache.evict()
+    assert len(list(cache_dir.iterdir())) == 0
+    shutil.rmtree(cache_dir)
+
+
+def test_router_jobs():
+    name = f'ckt_{get_test_id()}'
+    example = primitive_flow_example(name)
+    _, run_dir = run_example(example, cleanup=False, n=2, additional_args=['--nroutings', '2', '--router_jobs', '2'])
+    routing_dirs = list((run_dir / '3_pnr' / 'routing').iterdir())
+    assert len(routing_dirs) > 1
+    assert len(list(run_dir.glob(f'{name.upper()}_*.python.gds'))) == len(routing_dirs)
+    shutil.rmtree(run_dir)
+    shutil.rmtree(example)
+
+
+def run_placer(name, additional_args):
+    example = primitive_flow_example(name)
+    _, run_dir = run_example(example, cleanup=False, n=1, additional_args=['--flow_stop', '3_pnr:place'] + additional_args)
+    with (run_dir / '3_pnr' / '__placer_dump__.json').open('rt') as fp:
+        placer_dump = json.load(fp)
+    shutil.rmtree(run_dir)
+    shutil.rmtree(example)
+    return placer_dump[2]
+
+
+def test_placer_threads():
+    name = f'ckt_{get_test_id()}'
+    args = ['--placer_threads', '2', '--seed', '3', '--placer_sa_iterations', '200']
+    placements = [run_placer(name, args) for _ in range(2)]
+    assert len(placements[0]) > 0
+    assert placements[0] == placements[1]
+
+
+def test_run_many():
+    name = f'ckt_{get_test_id()}'
+    examples = [primitive_flow_example(f'{name}_{i}') for i in range(2)]
+    jobs = []
+    for example in examples:
+        run_dir = WORK_DIR / f'{example.name}_batch'
+        if run_dir.exists():
+            shutil.rmtree(run_dir)
+        run_dir.mkdir(parents=True)
+        jobs.append({'netlist_dir': example, 'pdk_dir': PDK_DIR, 'working_dir': run_dir, 'flow_stop': '2_primitives'})
+    summary = run_many(jobs, max_workers=2, executor='thread')
+    assert summary['completed'] == 2 and summary['failed'] == 0
+    assert summary['designs_per_hour'] > 0
+    for job, example in zip(jobs, examples):
+        assert (job['working_dir'] / '2_primitives' / '__primitives__.json').exists()
+        shutil.rmtree(job['working_dir'])
+        shutil.rmtree(example)
@@ -0,0 +1,105 @@
+import pathlib
+
+import numpy as np
+
+from align.cell_fabric import Canvas, Pdk, Wire, Via, UncoloredCenterLineGrid, EnclosureGrid
+from align.cell_fabric import transformation
+from align.cell_fabric.terminal_table import TerminalTable
+from align.pnr.checkers import cell_abstract, select_interactions, interaction_distances, _near
+
+mydir = pathlib.Path(__file__).resolve().parent
+pdkfile = mydir.parent.parent / 'pdks' / 'FinFET14nm_Mock_PDK' / 'layers.json'
+
+
+def canvas():
+    c = Canvas(Pdk().load(pdkfile), columnar=True)
+    c.m1 = c.addGen(Wire(nm='m1', layer='M1', direction='v',
+                         clg=UncoloredCenterLineGrid(width=32, pitch=80, repeat=2),
+                         spg=EnclosureGrid(pitch=84, stoppoint=42)))
+    c.m2 = c.addGen(Wire(nm='m2', layer='M2', direction='h',
+                         clg=UncoloredCenterLineGrid(width=32, pitch=84, repeat=2),
+                         spg=EnclosureGrid(pitch=80, stoppoint=40)))
+    c.v1 = c.addGen(Via(nm='v1', layer='V1', h_clg=c.m2.clg, v_clg=c.m1.clg))
+    return c
+
+
+def master():
+    """A 40 x 20 pitch cell: net a on columns 3 and 36 joined by an M2 spine, fingers b0..b11 in between
+
+    Only column 36 is a pin.
+    """
+    c = canvas()
+    for x in [3, 36]:
+        c.addWire(c.m1, 'a', x, (4, -1), (16, 1))
+        c.addVia(c.v1, 'a', x, 10)
+    c.terminals[-2]['netType'] = 'pin'
+    c.addWire(c.m2, 'a', 10, (3, -1), (36, 1))
+    for x in range(14, 26):
+        c.addWire(c.m1, f'b{x-14}', x, (6, -1), (12, 1))
+    c.bbox = transformation.Rect(0, 0, 40*80, 20*84)
+    d = c.gen_data(run_pex=False)
+    assert not c.rd.shorts and not c.rd.opens and not c.drc.errors
+    d['terminals'] = TerminalTable(d['terminals'])
+    return d
+
+
+def check(instances, routes, hierarchical):
+    c = canvas()
+    halo = interaction_distances(c.pdk)
+    terminals = TerminalTable(routes)
+    tbls = []
+    for tr in instances:
+        tbl = master()['terminals'].copy()
+        tbl.transform(tr)
+        tbl.rename('netName', lambda nm: nm if nm is None else ('a' if nm == 'a' else f'{tr.oX}/{nm}'))
+        tbls.append(tbl)
+    if hierarchical:
+        abstract = cell_abstract(canvas(), master(), halo)
+        (unchecked, known) = select_interactions(c, terminals, [(tbl, abstract) for tbl in tbls], halo)
+        assert len(unchecked) > 0
+        rects = terminals.rects.tolist()
+        c.known_connections = [[(terminals[i]['layer'], rects[i]) for i in group] for group in known]
+    else:
+        for tbl in tbls:
+            terminals.extend(tbl)
+    c.terminals = terminals
+    c.bbox = transformation.Rect(0, 0, 100*80, 20*84)
+    c.gen_data(run_pex=False)
+    return (len(c.rd.shorts), len(c.rd.opens), sorted(c.drc.errors))
+
+
+def test_near():
+    marks = np.array([[0, 0, 10, 10]])
+    query = np.array([[15, 0, 20, 10], [30, 0, 40, 10], [-40, -40, -30, -30], [5, 5, 6, 6]])
+    assert _near(query, marks, 5).tolist()[:3] == [True, False, False]
+    assert _near(query, marks, 0).tolist() == [False, False, False, True]
+
+
+def test_cell_abstract():
+    d = master()
+    (boundary, components) = cell_abstract(canvas(), d, {'M1': 200, 'M2': 200})
+    tbl = d['terminals']
+    # the pin column is in the abstract, the other column, the spine and the fingers aren't
+    assert boundary.tolist() == tbl.mask('netType', 'pin').tolist()
+    assert boundary.sum() == 1
+    # a is one component (through the M2 spine), each b finger its own
+    b = np.array([t['netName'].startswith('b') for t in tbl])
+    assert len(set(components[tbl.mask('netName', 'a')].tolist())) == 1
+    assert len(set(components[b].tolist())) == 12
+
+
+def test_matches_flat():
+    instances = [transformation.Transformation(oX=0), transformation.Transformation(oX=60*80)]
+    # net a routed in M2 between column 3 of both instances: the pins (column 36) only
+    # connect to it through the instances, which mustn't show up as opens
+    c = canvas()
+    c.addWire(c.m2, 'a', 16, (3, -1), (63, 1))
+    c.addVia(c.v1, 'a', 3, 16)
+    c.addVia(c.v1, 'a', 63, 16)
+    route = c.terminals.to_list()
+    assert check(instances, route, True) == check(instances, route, False) == (0, 0, [])
+    # an M1 route shorting to a b finger of the first instance
+    route = [{'layer': 'M1', 'netName': 'c', 'netType': 'drawing', 'rect': [20*80-16, 2*84, 20*80+16, 14*84]}]
+    flat = check(instances, route, False)
+    assert flat[0] > 0
+    assert check(instances, route, True) == flat
@@ -1,7 +1,11 @@
+import copy
 import json
 import pathlib
 
-from align.pnr.hpwl import gen_netlist, calculate_HPWL_from_placement_verilog_d, Interval, SemiPerimeter
+import numpy as np
+
+from align.pnr.hpwl import gen_netlist, calculate_HPWL_from_placement_verilog_d, FlatNetlist, Interval, SemiPerimeter, net_hpwls, transform_rects
+from align.cell_fabric.transformation import Transformation
 from align.pnr.render_placement import standalone_overlap_checker
 
 def test_interval():
@@ -24,6 +28,13 @@ def test_semiperimeter():
 
     assert 14 == sp.dist()
 
+def test_net_hpwls():
+    rects = transform_rects( np.array( [[3,7,3,7],[10,10,12,12],[0,0,4,2]]), Transformation( oX=20, sX=-1))
+    assert rects.tolist() == [[17,7,17,7],[8,10,10,12],[16,0,20,2]]
+    # second net has no rects
+    assert net_hpwls( rects, [0,2,2,3]).tolist() == [14, 0, 6]
+    assert net_hpwls( np.zeros( (0,4), dtype=int), [0,0]).tolist() == [0]
+
 
 def test_gen_netlist1():
     placement_verilog_d = {
@@ -122,6 +133,13 @@ def test_gen_netlist_flip():
     placement_verilog_d['modules'][0]['instances'][0]['transformation'] = { "oX": 0, "oY": 10, "sX":  1, "sY": -1}
     assert 35 == calculate_HPWL_from_placement_verilog_d( placement_verilog_d, 'top', nets_d)
 
+    # all alternatives at once
+    alternatives = []
+    for tr in [{ "oX": 0, "oY": 0, "sX": 1, "sY": 1}, { "oX": 10, "oY": 0, "sX": -1, "sY": 1}, { "oX": 10, "oY": 10, "sX": -1, "sY": -1}, { "oX": 0, "oY": 10, "sX":  1, "sY": -1}]:
+        alternatives.append( (copy.deepcopy( placement_verilog_d), 'top'))
+        alternatives[-1][0]['modules'][0]['instances'][0]['transformation'] = tr
+    assert [39, 33, 29, 35] == FlatNetlist( nets_d).hpwls( alternatives).tolist()
+
 
 def test_gen_netlist2():
     placement_verilog_d = {
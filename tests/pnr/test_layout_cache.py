@@ -0,0 +1,83 @@
+import concurrent.futures
+import json
+
+import pytest
+
+from align.cell_fabric import transformation
+from align.pnr.checkers import LayoutCache
+from align.utils.artifacts import ArtifactStore
+
+layout = {'bbox': [0, 0, 400, 600], 'terminals': [
+    {'layer': 'M1', 'netName': 'x', 'rect': [0, 0, 100, 300], 'netType': 'drawing', 'pin': 'x'},
+    {'layer': 'M2', 'netName': None, 'rect': [0, -50, 203, 50], 'netType': 'drawing'}]}
+
+
+def test_layout_cache(tmp_path):
+    (tmp_path / 'a.json').write_text(json.dumps(layout))
+    (tmp_path / 'b.json').write_text(json.dumps(layout))
+    store = ArtifactStore()
+    cache = LayoutCache(maxsize=1)
+
+    (d, errors) = cache.get(store, tmp_path / 'a.json', 10)
+    assert d['bbox'] == [0, 0, 80, 120]
+    assert d['terminals'][0]['rect'] == [0, 0, 20, 60]
+    assert len(errors) == 1 and '203' in errors[0]
+    assert cache.get(store, tmp_path / 'a.json', 10)[0] is d
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # the cached table is read-only; a copy isn't
+    with pytest.raises(ValueError):
+        d['terminals'].transform(transformation.Transformation(oX=10))
+    tbl = d['terminals'].copy()
+    tbl.transform(transformation.Transformation(oX=10))
+    del tbl[0]['pin']
+    assert tbl[0]['rect'] == [10, 0, 30, 60]
+    assert d['terminals'][0]['rect'] == [0, 0, 20, 60] and 'pin' in d['terminals'][0]
+
+    # a new version of the file, another scale or an evicted entry is a miss
+    store.put_json(tmp_path / 'a.json', dict(layout, bbox=[0, 0, 800, 600]))
+    assert cache.get(store, tmp_path / 'a.json', 10)[0]['bbox'] == [0, 0, 160, 120]
+    cache.get(store, tmp_path / 'a.json', 2)
+    cache.get(store, tmp_path / 'b.json', 10)
+    cache.get(store, tmp_path / 'a.json', 2)
+    assert (cache.hits, cache.misses) == (1, 5)
+    assert len(cache) == 1
+
+
+def test_layout_cache_derive(tmp_path):
+    (tmp_path / 'a.json').write_text(json.dumps(layout))
+    (tmp_path / 'b.json').write_text(json.dumps(layout))
+    store = ArtifactStore()
+    cache = LayoutCache(maxsize=1)
+    calls = []
+
+    def bbox(d):
+        calls.append(d)
+        return tuple(d['bbox'])
+
+    assert cache.derive(store, tmp_path / 'a.json', 10, 'pdk', bbox) == (0, 0, 80, 120)
+    assert cache.derive(store, tmp_path / 'a.json', 10, 'pdk', bbox) == (0, 0, 80, 120)
+    (d, _) = cache.get(store, tmp_path / 'a.json', 10)
+    assert calls == [d] and set(d) == {'bbox', 'terminals'}
+
+    # derived values go with their layout
+    cache.get(store, tmp_path / 'b.json', 10)
+    cache.derive(store, tmp_path / 'a.json', 10, 'pdk', bbox)
+    assert len(calls) == 2
+
+
+def test_layout_cache_threads(tmp_path):
+    for i in range(8):
+        (tmp_path / f'{i}.json').write_text(json.dumps(layout))
+    store = ArtifactStore()
+    cache = LayoutCache(maxsize=4)
+
+    def work(i):
+        pth = tmp_path / f'{i % 8}.json'
+        (d, _) = cache.get(store, pth, 10)
+        assert cache.derive(store, pth, 10, 'pdk', lambda d: len(d['terminals'])) == 2
+        return d['bbox']
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(bbox == [0, 0, 80, 120] for bbox in executor.map(work, range(200)))
+    assert cache.hits + cache.misses >= 200 and len(cache) == 4
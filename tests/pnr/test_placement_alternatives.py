@@ -0,0 +1,18 @@
+import json
+import pathlib
+
+from align.pnr.main import PlacementAlternatives
+from align.schema.hacks import VerilogJsonTop
+
+mydir = pathlib.Path(__file__).resolve().parent
+
+
+def test_placement_alternatives():
+    with open(mydir.parent / 'pdk' / 'finfet_pdk' / '_CKT_PLACE_CMP_1_0.placement_verilog.json') as fp:
+        d = json.load(fp)
+    alternatives = PlacementAlternatives([('top_0', d), ('top_1', {'modules': 'not a list'})])
+    assert len(alternatives) == 2 and list(alternatives) == ['top_0', 'top_1']
+    # only the placement looked up is parsed, once
+    top_0 = alternatives['top_0']
+    assert isinstance(top_0, VerilogJsonTop) and top_0.dict() == VerilogJsonTop.parse_obj(d).dict()
+    assert alternatives['top_0'] is top_0
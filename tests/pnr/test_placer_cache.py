@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from align.pnr.placer_cache import PlacerCache, hit_rate
+
+
+class FakeInstance:
+    def __init__(self, name, width):
+        (self.name, self.master, self.width, self.height) = (name, 'NMOS', width, 100)
+
+    def export_pin_rects(self):
+        return {'pins': ['D'], 'rects': np.array([[0, 0, self.width, 10]])}
+
+
+class FakePlacer:
+    def __init__(self, new_evaluations, hits, misses):
+        (self.new_evaluations, self.hits, self.misses) = (new_evaluations, hits, misses)
+
+    def getNewEvaluations(self):
+        return self.new_evaluations
+
+    def getCacheHits(self):
+        return self.hits
+
+    def getCacheMisses(self):
+        return self.misses
+
+
+def node(width=200):
+    return SimpleNamespace(name='TOP', Blocks=[SimpleNamespace(instance=[FakeInstance('M0', width)])])
+
+
+def hyper():
+    return SimpleNamespace(LAMBDA=1.0, ilp_solver=0, select_in_ILP=False, use_ILP_placer=False, place_on_grid_constraints_json='[]',
+                           use_external_placement_info=False, use_analytical_placer=False, use_sa_cache=False, sa_cache={})
+
+
+def test_placer_cache(tmp_path):
+    cache = PlacerCache(tmp_path / 'placer.db')
+    h = hyper()
+    signature = cache.prime(node(), h, {'name': 'TOP'})
+    assert h.use_sa_cache and h.sa_cache == {}
+    cache.record(signature, 3, FakePlacer({'0,1,;1,0,;0,0,;': '{"ret":1.5}'}, 0, 4))
+
+    # a second cache object stands in for a later run
+    h = hyper()
+    other = PlacerCache(tmp_path / 'placer.db')
+    assert other.prime(node(), h, {'name': 'TOP'}) == signature
+    assert h.sa_cache == {'0,1,;1,0,;0,0,;': '{"ret":1.5}'}
+    other.record(signature, 3, FakePlacer({}, 3, 1))
+    assert hit_rate(other.stats[3]) == {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+
+    assert cache.signature(node(width=300), hyper(), {'name': 'TOP'}) != signature
+    assert cache.signature(node(), hyper(), {'name': 'TOP', 'constraints': [{'constraint': 'Order'}]}) != signature
+
+    h = hyper()
+    h.use_external_placement_info = True
+    assert cache.prime(node(), h) is None and not h.use_sa_cache
+
+
+def test_placer_cache_evict(tmp_path):
+    cache = PlacerCache(tmp_path / 'placer.db', max_size=100)
+    cache.store('a', {'k': 'x' * 60})
+    cache.store('b', {'k': 'x' * 60})
+    assert cache.load('a') == {}
+    assert cache.load('b') == {'k': 'x' * 60}
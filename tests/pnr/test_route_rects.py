@@ -0,0 +1,25 @@
+import types
+
+import numpy as np
+
+from align.pnr.checkers import route_rects
+
+route_rect = np.dtype([(f, np.int32) for f in ['net', 'layer', 'tag', 'llx', 'lly', 'urx', 'ury']])
+
+
+def test_route_rects():
+    # what hierNode.export_route_rects returns
+    d = {'nets': ['x', 'vss', 'gnd', 'vdd'], 'layers': ['M1', 'M2', 'V1'],
+         'tags': ['blockPin', 'path_metal', 'path_via', 'intervia', 'power grid metal', 'power grid via'],
+         'rects': np.array([(0, 0, 0, 0, 0, 40, 400), (0, 1, 1, 0, 100, 800, 140), (1, 2, 2, 0, 100, 40, 140),
+                            (2, 1, 4, 0, 0, 1600, 40)], dtype=route_rect)}
+    hN = types.SimpleNamespace(export_route_rects=lambda: d)
+    assert list(route_rects(hN)) == [('x', 'M1', [0, 0, 40, 400], 'blockPin'),
+                                     ('x', 'M2', [0, 100, 800, 140], 'path_metal'),
+                                     ('vss', 'V1', [0, 100, 40, 140], 'path_via'),
+                                     ('gnd', 'M2', [0, 0, 1600, 40], 'power grid metal')]
+
+
+def test_route_rects_empty():
+    d = {'nets': [], 'layers': [], 'tags': [], 'rects': np.zeros(0, dtype=route_rect)}
+    assert list(route_rects(types.SimpleNamespace(export_route_rects=lambda: d))) == []
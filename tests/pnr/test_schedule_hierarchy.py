@@ -0,0 +1,136 @@
+import math
+import time
+from types import SimpleNamespace
+
+from align.pnr import placer
+from align.pnr.placer import schedule_hierarchy
+
+
+#        6
+#      /   \
+#     4     5
+#    / \    |
+#   0   1   2   3 (unused)
+tree = {0: [], 1: [], 2: [], 3: [], 4: [0, 1], 5: [2], 6: [4, 5]}
+order = [0, 1, 2, 3, 4, 5, 6]
+
+
+def run(max_workers, delay=0.0):
+    finished = []
+    seen_children = {}
+
+    def start(idx):
+        # children must be finished before the node is started
+        seen_children[idx] = set(finished)
+
+        def work():
+            time.sleep(delay)
+            return 10*idx
+        return work
+
+    def finish(idx, result):
+        assert result == 10*idx
+        finished.append(idx)
+
+    schedule_hierarchy(order, lambda idx: tree[idx], start, finish, max_workers=max_workers)
+    return finished, seen_children
+
+
+def test_dependencies():
+    for max_workers in [1, 2, 4]:
+        finished, seen_children = run(max_workers)
+        assert sorted(finished) == order
+        assert finished[-1] == 6
+        for idx, children in tree.items():
+            assert set(children) <= seen_children[idx]
+
+
+def test_siblings_run_concurrently():
+    s = time.time()
+    run(4, delay=0.2)
+    elapsed = time.time() - s
+    # three levels deep, so roughly three delays instead of seven
+    assert elapsed < 5*0.2
+
+
+class FakeNode:
+    def __init__(self, cost):
+        self.cost = cost
+
+
+class FakeHyper:
+    def __init__(self, seed):
+        self.SEED = seed
+
+
+class FakePnR:
+    class PlacerHyperparameters:
+        pass
+
+    class PlacerIfc:
+        # cost of the layouts found with each seed
+        costs = {0: [5.0, 9.0], 1: [3.0, 7.0], 2: [6.0, 5.0]}
+        opaths = {}
+
+        def __init__(self, current_node, numLayout, opath, effort, drc_info, hyper):
+            self.nodes = [FakeNode(c) for c in self.costs[hyper.SEED][:numLayout]]
+            self.opaths[hyper.SEED] = opath
+
+        def getNodeVecSize(self):
+            return len(self.nodes)
+
+        def getNode(self, idx):
+            return self.nodes[idx]
+
+        def getSAIterations(self):
+            return 50
+
+        def getSABudget(self):
+            return 100
+
+
+def test_run_placer_seeds(monkeypatch, tmp_path):
+    monkeypatch.setattr(placer, 'PnR', FakePnR)
+    opath = f'{tmp_path}/'
+
+    runs = [(None, FakeHyper(seed)) for seed in range(3)]
+    nodes, seeds, stats = placer.run_placer_seeds(runs=runs, numLayout=2, opath=opath, effort=0, drc_info=None)
+    assert [node.cost for node in nodes] == [3.0, 5.0]
+    assert seeds == [1, 0]
+    assert [(run['seed'], run['cost'], run['layouts']) for run in stats] == [(0, 5.0, 2), (1, 3.0, 2), (2, 5.0, 2)]
+    assert all(run['sa_iterations'] == 50 and run['sa_budget'] == 100 and run['time_saved'] == run['runtime'] for run in stats)
+    # each run writes its placer outputs to its own directory
+    assert FakePnR.PlacerIfc.opaths == {seed: f'{opath}seed_{seed}/' for seed in range(3)}
+    assert all((tmp_path / f'seed_{seed}').is_dir() for seed in range(3))
+
+    # a single run keeps the placer's order
+    nodes, seeds, stats = placer.run_placer_seeds(runs=runs[2:], numLayout=2, opath=opath, effort=0, drc_info=None)
+    assert [node.cost for node in nodes] == [6.0, 5.0]
+    assert seeds == [2, 2]
+    assert FakePnR.PlacerIfc.opaths[2] == opath
+
+
+class FakeDB:
+    def __init__(self, nblocks):
+        self.node = SimpleNamespace(Blocks=[None]*nblocks)
+        self.hierTree = [SimpleNamespace(name='TOP')]
+
+    def CheckoutHierNode(self, idx, sel):
+        return self.node
+
+    def AddingPowerPins(self, node):
+        pass
+
+
+def test_setup_placer_block_iterations(monkeypatch):
+    monkeypatch.setattr(placer, 'PnR', FakePnR)
+
+    def alpha(nblocks, **kwargs):
+        _, hyper = placer.setup_placer(DB=FakeDB(nblocks), idx=0, lambda_coeff=1.0, select_in_ILP=False, place_using_ILP=False, seed=0,
+                                       use_analytical_placer=False, ilp_solver='symphony', place_on_grid_constraints_json='[]',
+                                       placer_sa_iterations=1000, **kwargs)
+        return round(math.log(hyper.T_MIN/hyper.T_INT)/math.log(hyper.ALPHA))
+
+    assert alpha(2) == 1000
+    assert alpha(2, placer_sa_block_iterations=100) == 200
+    assert alpha(40, placer_sa_block_iterations=100) == 1000
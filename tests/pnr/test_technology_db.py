@@ -0,0 +1,165 @@
+import concurrent.futures
+import json
+
+from align.pnr import build_pnr_model, placer, router
+from align.utils.artifacts import ArtifactStore
+
+
+class FakeDB:
+    reads = 0
+
+    def __init__(self, other=None):
+        self.lef = None if other is None else other.lef
+
+    def ReadPDKJSON(self, fn):
+        FakeDB.reads += 1
+
+    def ReadLEFFromString(self, s):
+        self.lef = s
+
+
+def test_technology_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_pnr_model.PnR, 'PnRdatabase', FakeDB)
+    monkeypatch.setattr(build_pnr_model, '_technology', {})
+    monkeypatch.setattr(FakeDB, 'reads', 0)
+    store = ArtifactStore()
+    pdkfile = str(tmp_path / 'layers.json')
+    store.put(pdkfile, '{}')
+
+    db0 = build_pnr_model._technology_DB(pdkfile, 'MACRO a', store)
+    db1 = build_pnr_model._technology_DB(pdkfile, 'MACRO a', store)
+    assert FakeDB.reads == 1
+    assert db0 is not db1 and db1.lef == 'MACRO a'
+
+    assert build_pnr_model._technology_DB(pdkfile, 'MACRO b', store).lef == 'MACRO b'
+    assert FakeDB.reads == 2
+
+    store.put(pdkfile, '{"ScaleFactor": 2}')
+    build_pnr_model._technology_DB(pdkfile, 'MACRO b', store)
+    assert FakeDB.reads == 3
+
+
+def test_technology_db_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_pnr_model.PnR, 'PnRdatabase', FakeDB)
+    monkeypatch.setattr(build_pnr_model, '_technology', {})
+    monkeypatch.setattr(FakeDB, 'reads', 0)
+    store = ArtifactStore()
+    pdkfile = str(tmp_path / 'layers.json')
+    store.put(pdkfile, '{}')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        dbs = list(executor.map(lambda i: build_pnr_model._technology_DB(pdkfile, 'MACRO a', store), range(32)))
+    assert FakeDB.reads == 1
+    assert all(db.lef == 'MACRO a' for db in dbs)
+
+
+class FakeVerilog(dict):
+    def json(self, **kwargs):
+        return json.dumps(self, **kwargs)
+
+
+def test_routing_db_copy(tmp_path, monkeypatch):
+    parses = []
+
+    def fake_PnRdatabase(*args, verilog_d_in, **kwargs):
+        parses.append(args)
+        return FakeDB(), verilog_d_in
+
+    monkeypatch.setattr(router, 'PnRdatabase', fake_PnRdatabase)
+    monkeypatch.setattr(router.PnR, 'PnRdatabase', FakeDB)
+    monkeypatch.setattr(router, '_routing_DB', {})
+    store = ArtifactStore()
+    store.put(tmp_path / 'layers.json', '{}')
+    store.put(tmp_path / 'top.pnr.const.json', '[]')
+    toplevel_args_d = {'input_dir': str(tmp_path), 'subckt': 'top', 'verilog_file': 'top.verilog.json',
+                       'lef_file': 'top.lef', 'map_file': 'top.map', 'pdk_file': 'layers.json'}
+    abstract_verilog_d = FakeVerilog(modules=[{'name': 'top'}])
+
+    def copy():
+        return router._routing_DB_copy(toplevel_args_d, abstract_verilog_d=abstract_verilog_d, map_d_in=[],
+                                       lef_s_in='MACRO a', store=store)
+
+    db0, placed_nodes0 = copy()
+    db1, placed_nodes1 = copy()
+    assert len(parses) == 1
+    assert db0 is not db1 and placed_nodes0 is placed_nodes1
+
+    store.put(tmp_path / 'top.pnr.const.json', '[{"constraint": "Order"}]')
+    _, placed_nodes2 = copy()
+    assert len(parses) == 2
+    assert placed_nodes2 is not placed_nodes0
+
+
+class FakeBlock:
+    def __init__(self, child):
+        self.child = child
+
+
+class FakeNode:
+    def __init__(self, name, children=()):
+        self.name = name
+        self.Blocks = [FakeBlock(child) for child in children]
+        self.numPlacement = 0
+
+
+class FakeHierDB:
+    def __init__(self):
+        self.hierTree = [FakeNode('sub'), FakeNode('top', [0])]
+        self.checkins = []
+
+    def TraverseHierTree(self):
+        return [0, 1]
+
+    def CheckinHierNode(self, idx, node):
+        self.checkins.append((idx, node))
+
+    def getDrc_info(self):
+        return None
+
+
+def test_replay_placement(monkeypatch):
+    placed = []
+
+    class FakePlacerIfc:
+        def __init__(self, node, numLayout, opath, effort, drc_info, hyper):
+            placed.append(node)
+            self.node = node
+
+        def getNodeVecSize(self):
+            return 1
+
+        def getNode(self, lidx):
+            return self.node
+
+    def fake_checkin_placements(*, DB, fpath, numLayout, idx, nodes):
+        for node in nodes:
+            DB.CheckinHierNode(idx, node)
+        DB.hierTree[idx].numPlacement = len(nodes)
+
+    monkeypatch.setattr(placer, 'scale_placement_verilog', lambda d, scale_factor, invert: d)
+    monkeypatch.setattr(placer, 'setup_placer', lambda *, DB, idx, **kwargs: (DB.hierTree[idx].name, None))
+    monkeypatch.setattr(placer.PnR, 'PlacerIfc', FakePlacerIfc)
+    monkeypatch.setattr(placer.PnR, 'hierNode', lambda node: node)
+    monkeypatch.setattr(placer, 'checkin_placements', fake_checkin_placements)
+    monkeypatch.setattr(placer, 'update_grid_constraints', lambda *args: None)
+
+    def replay(sub_x, top_x, placed_nodes):
+        DB = FakeHierDB()
+        placement_verilog_d = {'modules': [{'abstract_name': 'sub', 'x': sub_x}, {'abstract_name': 'top', 'x': top_x}]}
+        placer.replay_placement(DB=DB, opath='', fpath='', effort=0, verilog_d=None, scale_factor=1,
+                                placement_verilog_d=placement_verilog_d, primitives={}, placed_nodes=placed_nodes)
+        return DB
+
+    placed_nodes = {}
+    DB = replay(0, 0, placed_nodes)
+    assert placed == ['sub', 'top']
+    assert DB.checkins == [(0, 'sub'), (1, 'top')]
+
+    # Only the module whose placement differs is placed again
+    DB = replay(0, 1, placed_nodes)
+    assert placed == ['sub', 'top', 'top']
+    assert DB.checkins == [(0, 'sub'), (1, 'top')] and DB.hierTree[0].numPlacement == 1
+
+    # A different sub-hierarchy invalidates its ancestors
+    replay(1, 1, placed_nodes)
+    assert placed == ['sub', 'top', 'top', 'sub', 'top']